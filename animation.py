@@ -0,0 +1,59 @@
+import asyncio
+import random
+
+from ratelimit import TokenBucket
+
+# Animation modes
+FULL = "full"  # Every frame
+REDUCED = "reduced"  # One spinning frame, then the result
+INSTANT = "instant"  # Result right away
+FRAME_COUNTS = {FULL: 3, REDUCED: 1, INSTANT: 0}
+
+FRAME_DELAY = 0.4  # Seconds between frames
+ANIMATION_EDITS_PER_SECOND = 20  # Message edits animations may use, Discord allows about 50 requests/sec per bot
+LOW_BUDGET = 0.25  # Below this share of the bucket only one frame is shown
+
+
+# Frames are rendered once at startup instead of on every spin
+def render_spin_frames(symbols, count=64, prefix="🎰 "):
+    return [prefix + " | ".join(random.choices(symbols, k=3)) for _ in range(count)]
+
+
+# Plays a spin animation and then shows the result
+# The outcome is settled before this is called, so skipped frames only make the
+# animation shorter, they never hold back the result.
+class Animator:
+    def __init__(self, frames, mode=FULL, budget=None, frame_delay=FRAME_DELAY):
+        if mode not in FRAME_COUNTS:
+            raise ValueError(f"Unknown animation mode {mode!r}")
+        self.frames = frames
+        self.mode = mode
+        # Message edits shared by every animation: frames only go out when a token is
+        # free, the result edit always does (and may put the bucket into debt)
+        self.budget = budget or TokenBucket(ANIMATION_EDITS_PER_SECOND)
+        self.frame_delay = frame_delay
+
+    def frame_count(self):
+        count = FRAME_COUNTS[self.mode]
+        if count > 1 and self.budget.level < LOW_BUDGET:
+            count = 1  # Busy: the first frame is the interaction response, which needs no edit
+        return count
+
+    # respond(**kwargs) sends the interaction response, edit(**kwargs) edits it afterwards
+    async def play(self, respond, edit, **result):
+        count = self.frame_count()
+        if count == 0:
+            await respond(**result)
+            return
+
+        frames = random.sample(self.frames, count)
+        await respond(content=frames[0])
+        for frame in frames[1:]:
+            await asyncio.sleep(self.frame_delay)
+            if not self.budget.try_take():
+                break  # Out of edits, skip the rest and go straight to the result
+            await edit(content=frame)
+
+        await asyncio.sleep(self.frame_delay)
+        self.budget.take()
+        await edit(**result)
@@ -0,0 +1,36 @@
+# Benchmark: headless blackjack rounds from one shoe
+# Plays the engine behind /blackjack with a fixed simple strategy and reports
+# rounds/sec and the house edge (expected loss per unit bet) it measured.
+#
+#   python benchmarks/bench_blackjack.py --rounds 500000 --decks 6
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from blackjack import Shoe, play_round
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless blackjack throughput and house edge")
+    parser.add_argument("--rounds", type=int, default=500000)
+    parser.add_argument("--decks", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    shoe = Shoe(args.decks, rng=random.Random(args.seed))
+    returned = 0.0
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        returned += play_round(shoe)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.rounds} rounds in {elapsed:.2f}s ({args.rounds / elapsed:,.0f} rounds/sec)")
+    print(f"house edge: {1 - returned / args.rounds:.3%}")
+
+
+if __name__ == "__main__":
+    main()
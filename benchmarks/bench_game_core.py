@@ -0,0 +1,53 @@
+# Benchmark: headless game rounds through game_core
+# Plays every button game the way the views do (same classes, same settlement)
+# without Discord, and reports rounds/sec and the measured return to player.
+#
+#   python benchmarks/bench_game_core.py --rounds 200000
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import game_core
+
+
+def play_rps(bet, rng):
+    return game_core.RPSRound(bet, rng).play(rng.choice(game_core.RPS_CHOICES))
+
+
+def play_highlow(bet, rng):
+    return game_core.HighLowRound(bet, rng).guess(rng.choice(game_core.HIGHLOW_CHOICES))
+
+
+GAMES = {
+    "roll_dice": lambda bet, rng: game_core.roll_dice(bet, rng),
+    "coinflip": lambda bet, rng: game_core.coinflip(bet, rng.choice(game_core.COINFLIP_SIDES), rng),
+    "slots": lambda bet, rng: game_core.spin_slots(bet, rng=rng),
+    "rps": play_rps,
+    "highlow": play_highlow,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless game_core throughput")
+    parser.add_argument("--rounds", type=int, default=200000)
+    parser.add_argument("--bet", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for name, play in GAMES.items():
+        paid = 0
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            paid += play(args.bet, rng).payout
+        elapsed = time.perf_counter() - start
+        rtp = paid / (args.rounds * args.bet)
+        print(f"{name:<10} {args.rounds / elapsed:>12,.0f} rounds/sec   RTP {rtp:.2%}")
+
+
+if __name__ == "__main__":
+    main()
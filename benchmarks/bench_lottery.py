@@ -0,0 +1,74 @@
+# Benchmark: lottery ticket purchases and draws
+# Compares the old list with one entry per ticket (rewritten as JSON on every
+# purchase) with per-player counts in a Fenwick tree.
+#
+#   python benchmarks/bench_lottery.py --players 2000 --purchases 5000 --tickets 100
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lottery import LotteryTickets
+
+
+def bench_list(purchases):
+    entries = []
+    start = time.perf_counter()
+    for user_id, quantity in purchases:
+        entries.extend([user_id] * quantity)
+        json.dumps(entries)  # What the saver wrote after every purchase
+    bought = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        random.choice(entries)
+    return bought, time.perf_counter() - start, len(json.dumps(entries))
+
+
+def bench_counts(purchases):
+    tickets = LotteryTickets()
+    start = time.perf_counter()
+    for user_id, quantity in purchases:
+        tickets.add(user_id, quantity)
+        json.dumps(tickets.counts)
+    bought = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        tickets.draw()
+    return bought, time.perf_counter() - start, len(json.dumps(tickets.counts))
+
+
+def check_fairness(players):
+    tickets = LotteryTickets({str(i): i + 1 for i in range(players)})
+    wins = Counter(tickets.draw() for _ in range(200000))
+    worst = max(abs(wins[str(i)] / 200000 - (i + 1) / tickets.total) for i in range(players))
+    print(f"fairness: largest deviation from the ticket share over 200k draws is {worst:.4%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare lottery ticket stores")
+    parser.add_argument("--players", type=int, default=2000)
+    parser.add_argument("--purchases", type=int, default=5000)
+    parser.add_argument("--tickets", type=int, default=100, help="Largest purchase size")
+    args = parser.parse_args()
+
+    user_ids = [str(100000 + i) for i in range(args.players)]
+    purchases = [(random.choice(user_ids), random.randint(1, args.tickets)) for _ in range(args.purchases)]
+    print(f"{args.purchases} purchases, {sum(q for _, q in purchases)} tickets, {args.players} players")
+
+    for name, bench in [("list", bench_list), ("counts", bench_counts)]:
+        bought, drawn, size = bench(purchases)
+        print(f"{name:>7}: {args.purchases / bought:>12,.0f} purchases/sec, {1000 / drawn:>12,.0f} draws/sec, "
+              f"{size / 1024:,.0f} KiB saved")
+
+    check_fairness(20)
+
+
+if __name__ == "__main__":
+    main()
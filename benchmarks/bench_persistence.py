@@ -0,0 +1,114 @@
+# Benchmark: interactions/sec under concurrent bet load
+# "before" rewrites balances.json and transactions.json on every bet like the old
+# update_balance/log_transaction did, "after" uses the ledger + write-behind saver.
+#
+#   python benchmarks/bench_persistence.py --users 5000 --players 200 --bets 20
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ledger import BalanceLedger
+from persistence import WriteBehind, json_file_writer
+
+
+def make_state(num_users):
+    balances = {str(100000 + i): random.randint(0, 10000) for i in range(num_users)}
+    transactions = {uid: [f"Lost in slots: -${random.randint(1, 500)}" for _ in range(10)] for uid in balances}
+    return balances, transactions
+
+
+async def run_players(num_players, bets_per_player, user_ids, place_bet):
+    async def player(uid):
+        for _ in range(bets_per_player):
+            await asyncio.sleep(0)  # Stand-in for awaiting Discord between interactions
+            delta = random.choice([-50, 50])
+            place_bet(uid, delta)
+
+    players = [player(random.choice(user_ids)) for _ in range(num_players)]
+    await asyncio.gather(*players)
+
+
+async def bench_before(workdir, balances, transactions, num_players, bets_per_player):
+    balances_file = os.path.join(workdir, "balances.json")
+    transactions_file = os.path.join(workdir, "transactions.json")
+
+    def save_data(file_path, data):
+        with open(file_path, "w") as file:
+            json.dump(data, file, indent=4)
+
+    def place_bet(uid, delta):
+        balances[uid] = balances.get(uid, 0) + delta
+        save_data(balances_file, balances)
+        transactions.setdefault(uid, []).append(f"Bet {delta}")
+        save_data(transactions_file, transactions)
+
+    start = time.perf_counter()
+    await run_players(num_players, bets_per_player, list(balances), place_bet)
+    return time.perf_counter() - start
+
+
+async def bench_after(workdir, balances, transactions, num_players, bets_per_player, interval, max_pending):
+    legacy_file = os.path.join(workdir, "balances.json")
+    with open(legacy_file, "w") as f:
+        json.dump(balances, f)
+    transactions_file = os.path.join(workdir, "transactions.json")
+
+    ledger = BalanceLedger(os.path.join(workdir, "snapshot.json"), os.path.join(workdir, "ledger.jsonl"), legacy_file)
+    ledger.load()
+    saver = WriteBehind(interval=interval, max_pending=max_pending)
+    saver.register("ledger", ledger.prepare_flush, ledger.flush_done)
+    saver.register("transactions", json_file_writer(transactions_file, lambda: transactions))
+    saver.start()
+
+    def place_bet(uid, delta):
+        ledger.apply(uid, delta)
+        saver.mark_dirty("ledger")
+        transactions.setdefault(uid, []).append(f"Bet {delta}")
+        saver.mark_dirty("transactions")
+
+    start = time.perf_counter()
+    await run_players(num_players, bets_per_player, list(ledger.balances), place_bet)
+    await saver.stop()  # Count the final flush too, nothing is left unsaved
+    elapsed = time.perf_counter() - start
+
+    # Sanity check: a fresh load reproduces the in-memory balances
+    reloaded = BalanceLedger(os.path.join(workdir, "snapshot.json"), os.path.join(workdir, "ledger.jsonl"), legacy_file)
+    assert reloaded.load() == ledger.balances, "ledger replay does not match memory"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-bet JSON rewrites with the write-behind saver")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--players", type=int, default=200)
+    parser.add_argument("--bets", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=2.0)
+    parser.add_argument("--max-pending", type=int, default=500)
+    args = parser.parse_args()
+
+    total = args.players * args.bets
+    random.seed(1)
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        balances, transactions = make_state(args.users)
+        results["before"] = asyncio.run(bench_before(workdir, balances, transactions, args.players, args.bets))
+    with tempfile.TemporaryDirectory() as workdir:
+        balances, transactions = make_state(args.users)
+        results["after"] = asyncio.run(bench_after(workdir, balances, transactions, args.players, args.bets,
+                                                   args.interval, args.max_pending))
+
+    print(f"{args.users} users, {args.players} concurrent players, {total} bets")
+    for name, elapsed in results.items():
+        print(f"  {name:<6} {elapsed:8.3f}s  {total / elapsed:10.1f} interactions/sec")
+    print(f"  speedup {results['before'] / results['after']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
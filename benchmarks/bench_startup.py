@@ -0,0 +1,126 @@
+# Benchmark: bot startup, import breakdown and time to ready
+# Runs the bot's startup in a fresh interpreter with -X importtime, the way the
+# worker dyno starts it minus the Discord connection: import casino_bot, then
+# load_state() like setup_hook. Reports the slowest imports of casino_bot, time
+# to ready, peak memory and which optional heavy modules got imported anyway.
+#
+#   python benchmarks/bench_startup.py --runs 5 --data /path/to/bot/data
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Only needed by reports, tools or other backends, startup shouldn't import them
+LAZY_MODULES = ("xlsxwriter", "openpyxl", "numpy", "pandas", "pymongo", "simulation", "excel_export")
+
+
+# Runs inside the measured interpreter, in a scratch directory holding the data files
+def child():
+    sys.path.insert(0, ROOT)
+    start = time.perf_counter()
+    import casino_bot
+    imported = time.perf_counter()
+    casino_bot.load_state()
+    loaded = time.perf_counter()
+
+    try:
+        import resource
+        max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        max_rss_kb = None
+    print(json.dumps({
+        "import": imported - start,
+        "load_state": loaded - imported,
+        "max_rss_kb": max_rss_kb,
+        "lazy_loaded": [name for name in LAZY_MODULES if name in sys.modules],
+    }))
+
+
+# {module: cumulative seconds} of the modules casino_bot imports directly
+def parse_importtime(stderr):
+    direct = {}
+    children = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, raw = line[len("import time:"):].split("|")
+        name = raw[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 1:
+            children[name.strip()] = int(cumulative) / 1e6
+        elif depth == 0:
+            if name.strip() == "casino_bot":
+                direct = children
+            children = {}
+    return direct
+
+
+def run_once(data_dir):
+    workdir = tempfile.mkdtemp(prefix="casino-startup-")
+    try:
+        if data_dir:
+            for name in os.listdir(data_dir):
+                path = os.path.join(data_dir, name)
+                if os.path.isfile(path) and name.endswith((".json", ".jsonl", ".idx", ".db", ".sha256")):
+                    shutil.copy(path, workdir)
+
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child"],
+                              cwd=workdir, capture_output=True, text=True)
+        total = time.perf_counter() - start
+        if proc.returncode != 0:
+            sys.exit(f"Startup failed:\n{proc.stderr[-2000:]}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result["process"] = total
+        result["imports"] = parse_importtime(proc.stderr)
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bot startup time and import breakdown")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="Slowest direct imports of casino_bot to list")
+    parser.add_argument("--data", help="Directory with the bot's data files to start with (default: none)")
+    parser.add_argument("--out", help="Also save the results as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    runs = [run_once(args.data) for _ in range(args.runs)]
+    median = {key: statistics.median(run[key] for run in runs) for key in ("process", "import", "load_state")}
+    imports = {name: statistics.median(run["imports"].get(name, 0) for run in runs) for name in runs[0]["imports"]}
+    max_rss_kb = runs[-1]["max_rss_kb"]
+
+    print(f"Median of {args.runs} run(s)")
+    print(f"  import casino_bot  {median['import'] * 1000:8.1f} ms")
+    print(f"  load_state         {median['load_state'] * 1000:8.1f} ms")
+    print(f"  whole process      {median['process'] * 1000:8.1f} ms  (interpreter start to ready, no Discord)")
+    if max_rss_kb is not None:
+        print(f"  peak memory        {max_rss_kb / 1024:8.1f} MB")
+    lazy = runs[-1]["lazy_loaded"]
+    print(f"  heavy modules loaded at startup: {', '.join(lazy) if lazy else 'none'}")
+
+    print("\nSlowest imports of casino_bot (cumulative)")
+    for name, seconds in sorted(imports.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<28} {seconds * 1000:8.1f} ms")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"median": median, "max_rss_kb": max_rss_kb, "lazy_loaded": lazy, "imports": imports, "runs": runs}, f, indent=4)
+        print(f"\n💾 Results saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
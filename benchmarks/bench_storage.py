@@ -0,0 +1,80 @@
+# Benchmark: bet throughput of each storage backend
+# Every bet is one balance change plus one transaction record, flushed by the
+# backend's write-behind saver like in the bot. Mongo uses MONGO_URI when set,
+# otherwise mongomock if it is installed (numbers are then only a rough guide).
+#
+#   python benchmarks/bench_storage.py --users 5000 --bets 20000
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from storage import JsonStorage, SqliteStorage
+from transaction_history import TransactionRecord
+
+
+def make_mongo():
+    if os.getenv("MONGO_URI"):
+        from mongo_storage import MongoStorage
+        return MongoStorage(), "mongo"
+    try:
+        import mongomock
+    except ImportError:
+        return None, None
+    from mongo_storage import MongoStorage
+    return MongoStorage(mongomock.MongoClient()), "mongo (mongomock)"
+
+
+async def run_bets(storage, user_ids, bets, flush_every):
+    storage.start()
+    start = time.perf_counter()
+    for i in range(bets):
+        user_id = random.choice(user_ids)
+        delta = random.choice([-50, 50])
+        balance = storage.add_balance(user_id, delta)
+        storage.append_transaction(TransactionRecord.create(user_id, "Bench bet", game="bench", bet=50,
+                                                            delta=delta, balance_after=balance))
+        if i % flush_every == 0:
+            await asyncio.sleep(0)  # Let the saver run like it would between interactions
+    await storage.close()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare storage backends under bet load")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--bets", type=int, default=20000)
+    parser.add_argument("--yield-every", type=int, default=10)
+    args = parser.parse_args()
+
+    user_ids = [str(100000 + i) for i in range(args.users)]
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)  # JSON backend writes next to the working directory
+        backends = [("json", JsonStorage), ("sqlite", lambda: SqliteStorage("bench.db"))]
+        mongo, mongo_name = make_mongo()
+        if mongo is None:
+            print("  skipping mongo (set MONGO_URI or install mongomock)")
+        else:
+            backends.append((mongo_name, lambda: mongo))
+
+        for name, factory in backends:
+            storage = factory()
+            storage.load()
+            random.seed(1)
+            elapsed = asyncio.run(run_bets(storage, user_ids, args.bets, args.yield_every))
+            results.append((name, elapsed))
+        os.chdir("/")
+
+    print(f"{args.bets} bets across {args.users} users")
+    for name, elapsed in results:
+        print(f"  {name:<18} {elapsed:8.3f}s  {args.bets / elapsed:10.1f} bets/sec")
+
+
+if __name__ == "__main__":
+    main()
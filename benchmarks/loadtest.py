@@ -0,0 +1,408 @@
+# Load test: thousands of simulated players against casino_bot.py, no Discord
+# casino_bot is imported inside a scratch directory (its data files start empty)
+# and its slash commands and buttons are called with fake interactions. Every
+# player registers, then plays random games, deposits, withdraws and buys
+# lottery tickets concurrently. Reports per command latency percentiles (time
+# until the interaction is answered, the 3 second Discord deadline), event loop
+# lag percentiles and bytes written to disk per interaction, and saves the results as
+# JSON so runs can be compared.
+#
+#   python benchmarks/loadtest.py --players 2000 --actions 10
+#   python benchmarks/loadtest.py --players 2000 --actions 10 --compare loadtest_results/<earlier run>.json
+#
+# Command checks (registered_only) run like in Discord, option transformers
+# don't (the harness only sends valid bets). Outbox messages are queued and
+# saved but never delivered since there is no connection.
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import types
+from collections import defaultdict
+from datetime import datetime, timezone
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import discord
+
+RESULTS_DIR = "loadtest_results"
+LAG_INTERVAL = 0.005  # Event loop ticker period in seconds
+
+# What players do after registering, and how often
+ACTIONS = {
+    "roll_dice": 10,
+    "coinflip": 10,
+    "slots": 15,
+    "rps": 10,
+    "highlow": 10,
+    "blackjack": 15,
+    "balance": 10,
+    "transactions": 5,
+    "buy_ticket": 5,
+    "deposit": 5,
+    "withdraw": 5,
+}
+
+_interaction_ids = itertools.count(1)
+
+
+class FakeMessage:
+    def __init__(self, content=None, embed=None, view=None):
+        self.content = content
+        self.embed = embed
+        self.view = view
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    def _respond(self):
+        if self._done:
+            raise RuntimeError("This interaction has already been responded to")
+        self._done = True
+        self._interaction.answered_at = time.perf_counter()
+
+    async def send_message(self, content=None, *, embed=None, view=None, **kwargs):
+        self._respond()
+        self._interaction.message = FakeMessage(content, embed, view)
+
+    async def edit_message(self, *, content=None, embed=None, view=None, **kwargs):
+        self._respond()
+        self._interaction.message = FakeMessage(content, embed, view)
+
+    async def defer(self, **kwargs):
+        self._respond()
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, content=None, *, embed=None, view=None, **kwargs):
+        self._interaction.message = FakeMessage(content, embed, view)
+
+
+# Just enough of discord.Interaction for the bot's handlers
+class FakeInteraction:
+    def __init__(self, user, channel_id):
+        self.id = next(_interaction_ids)
+        self.user = user
+        self.channel_id = channel_id
+        self.extras = {}
+        self.message = None
+        self.answered_at = None
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+    async def edit_original_response(self, *, content=None, embed=None, view=None, **kwargs):
+        self.message = FakeMessage(content, embed, view)
+
+    @property
+    def view(self):
+        return self.message.view if self.message is not None else None
+
+
+def fake_user(user_id):
+    permissions = types.SimpleNamespace(administrator=False, manage_guild=False)
+    return types.SimpleNamespace(id=user_id, name=f"player{user_id}", mention=f"<@{user_id}>", guild_permissions=permissions)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def disk_bytes_written():
+    # Bytes passed to write() by this process, Linux only
+    try:
+        with open("/proc/self/io", "r") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)  # name -> seconds until answered
+        self.durations = defaultdict(list)  # name -> seconds until the handler returned
+        self.errors = defaultdict(int)
+        self.rejected = defaultdict(int)  # Failed a command check
+
+    @property
+    def interactions(self):
+        return sum(len(v) for v in self.durations.values()) + sum(self.errors.values()) + sum(self.rejected.values())
+
+    def summary(self):
+        commands = {}
+        for name in sorted(set(self.durations) | set(self.errors) | set(self.rejected)):
+            latencies = sorted(self.latencies[name])
+            commands[name] = {
+                "count": len(self.durations[name]),
+                "errors": self.errors[name],
+                "rejected": self.rejected[name],
+                "p50_ms": _ms(percentile(latencies, 0.50)),
+                "p95_ms": _ms(percentile(latencies, 0.95)),
+                "p99_ms": _ms(percentile(latencies, 0.99)),
+                "max_ms": _ms(latencies[-1] if latencies else None),
+                "max_handler_ms": _ms(max(self.durations[name], default=None)),
+            }
+        return commands
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+# Event loop lag: a ticker task sleeps LAG_INTERVAL at a time next to the load
+# and records how much later than scheduled each wake-up came. Scheduling the
+# ready players shows up as a steady p50, a callback that blocks the loop as a
+# jump in p99 and max.
+class LoopMonitor:
+    def __init__(self):
+        self.lags = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + LAG_INTERVAL
+            await asyncio.sleep(LAG_INTERVAL)
+            self.lags.append(max(loop.time() - scheduled, 0.0))
+
+    def summary(self):
+        lags = sorted(self.lags)
+        return {
+            "ticks": len(lags),
+            "p50_ms": _ms(percentile(lags, 0.50)),
+            "p95_ms": _ms(percentile(lags, 0.95)),
+            "p99_ms": _ms(percentile(lags, 0.99)),
+            "max_ms": _ms(lags[-1] if lags else None),
+        }
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+class Player:
+    def __init__(self, bot_module, stats, user_id, rng, max_bet):
+        self.cb = bot_module
+        self.stats = stats
+        self.user = fake_user(user_id)
+        self.channel_id = 1000 + user_id % 20  # A few tables share a blackjack shoe
+        self.rng = rng
+        self.max_bet = max_bet
+
+    async def _timed(self, name, interaction, handler):
+        start = time.perf_counter()
+        try:
+            await handler
+        except Exception as e:
+            self.stats.errors[name] += 1
+            if self.stats.errors[name] == 1:
+                print(f"⚠️ {name} failed: {type(e).__name__}: {e}")
+            return interaction
+        end = time.perf_counter()
+        self.stats.durations[name].append(end - start)
+        self.stats.latencies[name].append((interaction.answered_at or end) - start)
+        return interaction
+
+    async def command(self, name, **options):
+        command = self.cb.tree.get_command(name)
+        interaction = FakeInteraction(self.user, self.channel_id)
+        try:
+            for check in command.checks:
+                if not await discord.utils.maybe_coroutine(check, interaction):
+                    raise discord.app_commands.CheckFailure()
+        except discord.app_commands.AppCommandError:
+            self.stats.rejected[name] += 1
+            return interaction
+        return await self._timed(name, interaction, command.callback(interaction, **options))
+
+    # Press the button with this label on the view the last response showed
+    async def click(self, view, label, name):
+        for item in view.children if view is not None else ():
+            if isinstance(item, discord.ui.Button) and item.label == label:
+                interaction = FakeInteraction(self.user, self.channel_id)
+                return await self._timed(name, interaction, item.callback(interaction))
+        return None
+
+    def bet(self):
+        return self.rng.randint(1, self.max_bet)
+
+    async def register(self):
+        interaction = await self.command("register")
+        await self.click(interaction.view, "✅ Accept ToS", "register:accept")
+
+    async def act(self, action):
+        rng = self.rng
+        if action == "coinflip":
+            await self.command("coinflip", bet=self.bet(), choice=rng.choice(["heads", "tails"]))
+        elif action == "slots":
+            interaction = await self.command("slots", bet=self.bet())
+            if rng.random() < 0.5:
+                await self.click(interaction.view, "Play Again", "slots:play_again")
+        elif action == "rps":
+            interaction = await self.command("rps", bet=self.bet())
+            await self.click(interaction.view, rng.choice(["🪨", "📄", "✂️"]), "rps:throw")
+        elif action == "highlow":
+            interaction = await self.command("highlow", bet=self.bet())
+            await self.click(interaction.view, rng.choice(["Higher", "Lower"]), "highlow:guess")
+        elif action == "blackjack":
+            interaction = await self.command("blackjack", bet=self.bet())
+            view = interaction.view
+            for _ in range(10):
+                clicked = await self.click(view, "Hit" if rng.random() < 0.4 else "Stand", "blackjack:hit_stand")
+                if clicked is None:
+                    break  # Round over, the view is the Play Again one
+                view = clicked.view
+        elif action == "buy_ticket":
+            await self.command("buy_ticket", quantity=rng.randint(1, 5))
+        elif action == "deposit":
+            proof = types.SimpleNamespace(url="https://example.com/proof.png")
+            await self.command("deposit", amount=rng.randint(100, 5000), proof=proof)
+        elif action == "withdraw":
+            await self.command("withdraw", amount=rng.randint(100, 5000), ign=f"ign{self.user.id}")
+        else:
+            await self.command(action, **({"bet": self.bet()} if action == "roll_dice" else {}))
+
+    async def run(self, actions, think):
+        await self.register()
+        names = list(ACTIONS)
+        weights = list(ACTIONS.values())
+        for action in self.rng.choices(names, weights, k=actions):
+            if think:
+                await asyncio.sleep(self.rng.uniform(0, think))
+            await self.act(action)
+
+
+async def run_load(cb, args):
+    cb.slots_animator.frame_delay = args.frame_delay
+    cb.load_state()  # What setup_hook does when the bot really starts
+    cb.storage.start()
+    for n in range(args.players):
+        cb.storage.add_balance(str(10**17 + n), args.balance)  # Setup, not measured
+
+    stats = Stats()
+    monitor = LoopMonitor()
+    rng = random.Random(args.seed)
+    players = [Player(cb, stats, 10**17 + n, random.Random(rng.random()), args.max_bet) for n in range(args.players)]
+
+    written_before = disk_bytes_written()
+    monitor.start()
+    start = time.perf_counter()
+    await asyncio.gather(*[player.run(args.actions, args.think) for player in players])
+    await cb.storage.close()  # Final save is part of what the run wrote
+    elapsed = time.perf_counter() - start
+    await monitor.stop()
+    written_after = disk_bytes_written()
+
+    written = None if written_before is None else written_after - written_before
+    interactions = stats.interactions
+    return {
+        "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "backend": type(cb.storage).__name__,
+        "players": args.players,
+        "actions": args.actions,
+        "seed": args.seed,
+        "seconds": round(elapsed, 3),
+        "interactions": interactions,
+        "interactions_per_second": round(interactions / elapsed, 1),
+        "loop_lag": monitor.summary(),
+        "disk_bytes": written,
+        "disk_bytes_per_interaction": None if written is None else round(written / max(interactions, 1), 1),
+        "commands": stats.summary(),
+    }
+
+
+def print_report(result, previous=None):
+    print(f"{result['interactions']:,} interactions from {result['players']:,} players in {result['seconds']}s "
+          f"({result['interactions_per_second']:,}/s, {result['backend']})")
+    header = f"{'command':<22} {'count':>7} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    if previous:
+        header += f" {'p95 was':>9}"
+    print(header)
+    for name, row in result["commands"].items():
+        line = (f"{name:<22} {row['count']:>7} {row['errors'] + row['rejected']:>5} {_fmt(row['p50_ms'])} "
+                f"{_fmt(row['p95_ms'])} {_fmt(row['p99_ms'])} {_fmt(row['max_ms'])}")
+        if previous:
+            line += " " + _fmt(previous["commands"].get(name, {}).get("p95_ms"))
+        print(line)
+
+    lag = result["loop_lag"]
+    print(f"\nevent loop lag over {lag['ticks']:,} ticks: p50 {_fmt(lag['p50_ms']).strip()} ms, "
+          f"p95 {_fmt(lag['p95_ms']).strip()} ms, p99 {_fmt(lag['p99_ms']).strip()} ms, max {_fmt(lag['max_ms']).strip()} ms")
+    if result["disk_bytes"] is not None:
+        print(f"disk: {result['disk_bytes']:,} bytes written, {result['disk_bytes_per_interaction']:,} per interaction")
+    if previous:
+        print(f"previous run ({previous['started']}): {previous['interactions_per_second']:,}/s, "
+              f"loop lag p99 {_fmt(previous.get('loop_lag', {}).get('p99_ms')).strip()} ms, "
+              f"{previous['disk_bytes_per_interaction']} bytes per interaction")
+
+
+def _fmt(value):
+    return f"{value:>9.2f}" if value is not None else f"{'-':>9}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic load test for casino_bot.py")
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--actions", type=int, default=10, help="Actions per player after registering")
+    parser.add_argument("--think", type=float, default=0.05, help="Max random pause between a player's actions (s)")
+    parser.add_argument("--balance", type=int, default=1_000_000, help="Starting balance of every player")
+    parser.add_argument("--max-bet", type=int, default=1000)
+    parser.add_argument("--frame-delay", type=float, default=0.0, help="Slots animation frame delay (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=None, help=f"Results file (default: {RESULTS_DIR}/<time>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare with")
+    args = parser.parse_args()
+
+    out = args.out or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    out = os.path.abspath(out)
+    previous = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            previous = json.load(f)
+
+    # The bot keeps its data files in the working directory
+    workdir = tempfile.mkdtemp(prefix="casino-loadtest-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import casino_bot
+        result = asyncio.run(run_load(casino_bot, args))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(result, previous)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=4)
+    print(f"\n💾 Results saved to {out}")
+
+
+if __name__ == "__main__":
+    main()
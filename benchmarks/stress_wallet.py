@@ -0,0 +1,157 @@
+# Stress test: thousands of concurrent bets against the wallet
+# Every simulated round reserves a bet, waits a random amount of time like a
+# player clicking buttons, then settles (sometimes twice, like a double click).
+# Withdrawals and deposits run in between. No balance may ever go negative and
+# the money has to add up. Two phases:
+#   roomy: players can afford all of their bets at once, so nearly every round
+#          reserves and settles concurrently (settle and double click races)
+#   tight: players hold one or two max bets and press many times at once, so
+#          most reserves must be turned down (overspending races)
+#
+#   python benchmarks/stress_wallet.py --users 50 --rounds 20000
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from storage import JsonStorage
+from wallet import InsufficientFunds, Wallet
+
+MAX_BET = 200
+MAX_TRANSFER = 500
+
+
+class Totals:
+    def __init__(self):
+        self.reserved = 0
+        self.paid_out = 0
+        self.debited = 0
+        self.credited = 0
+        self.rejected = 0
+        self.settled = 0
+        self.double_settles = 0
+        self.went_negative = 0  # Balances seen below zero right after taking money
+
+
+async def play_round(wallet, totals, user_id):
+    bet = random.randint(1, MAX_BET)
+    try:
+        reservation = await wallet.reserve(user_id, bet)
+    except InsufficientFunds:
+        totals.rejected += 1
+        return
+    totals.reserved += bet
+    if wallet.balance(user_id) < 0:
+        totals.went_negative += 1
+
+    await asyncio.sleep(random.random() * 0.01)
+    payout = random.choice([0, 0, bet, bet * 2, int(bet * 2.5)])
+
+    # Sometimes both buttons land at once, only one of them may pay
+    clicks = 2 if random.random() < 0.2 else 1
+    results = await asyncio.gather(*[wallet.settle(reservation, payout) for _ in range(clicks)])
+    if results.count(True) != 1:
+        raise AssertionError(f"Round settled {results.count(True)} times")
+    totals.paid_out += payout
+    totals.settled += 1
+    totals.double_settles += clicks - 1
+
+
+async def move_money(wallet, totals, user_id):
+    await asyncio.sleep(random.random() * 0.01)
+    amount = random.randint(1, MAX_TRANSFER)
+    if random.random() < 0.5:
+        await wallet.credit(user_id, amount)
+        totals.credited += amount
+        return
+    try:
+        await wallet.debit(user_id, amount)
+    except InsufficientFunds:
+        totals.rejected += 1
+        return
+    totals.debited += amount
+    if wallet.balance(user_id) < 0:
+        totals.went_negative += 1
+
+
+# One phase, seed(per_user) is a player's starting balance given their number of operations
+async def run(name, users, rounds, seed):
+    os.mkdir(name)
+    os.chdir(name)  # JSON backend writes next to the working directory, each phase starts empty
+    storage = JsonStorage()
+    storage.load()
+    storage.start()
+    wallet = Wallet(storage)
+
+    user_ids = [str(100000 + i) for i in range(users)]
+    per_user = -(-rounds // users)
+    for user_id in user_ids:
+        storage.add_balance(user_id, seed(per_user))
+    initial = sum(storage.balances.values())
+
+    # Every task starts at once, so a player has all of their rounds open together
+    totals = Totals()
+    tasks = []
+    bets = 0
+    for _ in range(rounds):
+        user_id = random.choice(user_ids)
+        if random.random() < 0.1:
+            tasks.append(move_money(wallet, totals, user_id))
+        else:
+            tasks.append(play_round(wallet, totals, user_id))
+            bets += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    await storage.close()
+    os.chdir("..")
+
+    final = sum(storage.balances.values())
+    expected = initial - totals.reserved + totals.paid_out - totals.debited + totals.credited
+    negative = [user_id for user_id, balance in storage.balances.items() if balance < 0]
+
+    print(f"[{name}] {rounds} operations for {users} players in {elapsed:.2f}s")
+    print(f"  bets settled: {totals.settled} of {bets}, rejected for missing funds: {totals.rejected}, "
+          f"double clicks: {totals.double_settles}")
+    print(f"  money: expected {expected}, found {final}")
+    print(f"  locks left: {len(wallet._locks)}")
+    if negative or totals.went_negative:
+        raise AssertionError(f"Negative balances: {negative[:10]} ({totals.went_negative} seen during the run)")
+    if final != expected:
+        raise AssertionError("Money was created or lost")
+    return totals, bets
+
+
+async def run_all(users, rounds, min_settled):
+    # Enough for every bet of a player at once (payouts come back later)
+    totals, bets = await run("roomy", users, rounds, lambda per_user: per_user * MAX_BET * 2)
+    if totals.settled < bets * min_settled:
+        raise AssertionError(f"Only {totals.settled} of {bets} bets settled, too few to say anything about the locks")
+
+    # One or two max bets against hundreds of presses at once
+    totals, bets = await run("tight", users, rounds, lambda per_user: random.randint(MAX_BET, MAX_BET * 2))
+    if not totals.rejected:
+        raise AssertionError("No bet was turned down, the balances weren't tight enough to test overspending")
+    print("✅ No balance ever went negative and every dollar is accounted for")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the wallet under concurrent bets")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=20000)
+    parser.add_argument("--min-settled", type=float, default=0.95, help="Share of bets that must settle in the roomy phase")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)  # JSON backend writes next to the working directory
+        asyncio.run(run_all(args.users, args.rounds, args.min_settled))
+
+
+if __name__ == "__main__":
+    main()
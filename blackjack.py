@@ -0,0 +1,163 @@
+import random
+
+# Cards are ints 0..51: rank = card % 13 (0 = ace ... 12 = king), suit = card // 13.
+# A shoe is a bytearray of them, so a 6-deck shoe is 312 bytes.
+SUITS = ["♠", "♥", "♦", "♣"]
+RANKS = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
+CARD_VALUES = bytes(min(card % 13 + 1, 10) for card in range(52))  # Aces count 1, hand_value adds the soft 10
+
+DECKS = 6
+PENETRATION = 0.75  # Share of the shoe dealt before it is reshuffled
+HIT_SOFT_17 = False  # Dealer stands on all 17s
+BLACKJACK_PAYOUT = 2.5  # Returned for a natural, stake included (3:2)
+
+# Round outcomes
+BLACKJACK = "blackjack"
+PLAYER = "player"
+DEALER = "bot"
+PUSH = "tie"
+PAYOUTS = {BLACKJACK: BLACKJACK_PAYOUT, PLAYER: 2, PUSH: 1, DEALER: 0}  # Multiples of the bet returned
+
+
+def card_name(card):
+    return RANKS[card % 13] + SUITS[card // 13]
+
+
+def format_hand(hand):
+    return " ".join(card_name(card) for card in hand)
+
+
+# Best total of a hand and whether an ace is counted as 11 (a soft hand)
+def hand_value(hand):
+    total = 0
+    ace = False
+    for card in hand:
+        value = CARD_VALUES[card]
+        total += value
+        if value == 1:
+            ace = True
+    if ace and total <= 11:
+        return total + 10, True
+    return total, False
+
+
+def is_blackjack(hand):
+    return len(hand) == 2 and hand_value(hand)[0] == 21
+
+
+# Multi-deck shoe, reshuffled once the cut card (penetration) is reached
+# Keep one shoe per table and deal round after round from it, like a real table.
+class Shoe:
+    def __init__(self, decks=DECKS, penetration=PENETRATION, rng=None):
+        self.rng = rng or random.Random()
+        self.cards = bytearray(range(52)) * decks
+        self.cut = int(len(self.cards) * penetration)
+        self.shuffle()
+
+    def shuffle(self):
+        self.rng.shuffle(self.cards)
+        self.position = 0
+
+    @property
+    def needs_shuffle(self):
+        return self.position >= self.cut
+
+    def draw(self):
+        if self.position >= len(self.cards):
+            self.shuffle()  # Only happens if one round runs past the end of the shoe
+        card = self.cards[self.position]
+        self.position += 1
+        return card
+
+
+# One round of player vs dealer, no Discord involved
+# Naturals are checked right after the deal (dealer peeks), so the round can be
+# over before the player acts. hands=(player, dealer) continues a saved round.
+class BlackjackRound:
+    def __init__(self, shoe, hit_soft_17=HIT_SOFT_17, hands=None):
+        if shoe.needs_shuffle:
+            shoe.shuffle()
+        self.shoe = shoe
+        self.hit_soft_17 = hit_soft_17
+        if hands is not None:
+            self.player_hand, self.dealer_hand = list(hands[0]), list(hands[1])
+        else:
+            draw = shoe.draw
+            self.player_hand = [draw(), draw()]
+            self.dealer_hand = [draw(), draw()]
+        self.game_over = is_blackjack(self.player_hand) or is_blackjack(self.dealer_hand)
+
+    @property
+    def player_total(self):
+        return hand_value(self.player_hand)[0]
+
+    @property
+    def dealer_total(self):
+        return hand_value(self.dealer_hand)[0]
+
+    def hit(self):
+        self.player_hand.append(self.shoe.draw())
+        total = self.player_total
+        if total > 21:
+            self.game_over = True
+        elif total == 21:
+            self.stand()  # Nothing left to decide
+        return self.player_hand
+
+    def stand(self):
+        while True:
+            total, soft = hand_value(self.dealer_hand)
+            if total > 17 or (total == 17 and not (soft and self.hit_soft_17)):
+                break
+            self.dealer_hand.append(self.shoe.draw())
+        self.game_over = True
+        return self.dealer_hand
+
+    def outcome(self):
+        player_natural = is_blackjack(self.player_hand)
+        dealer_natural = is_blackjack(self.dealer_hand)
+        if player_natural or dealer_natural:
+            if player_natural and dealer_natural:
+                return PUSH
+            return BLACKJACK if player_natural else DEALER
+
+        player_total = self.player_total
+        dealer_total = self.dealer_total
+        if player_total > 21:
+            return DEALER
+        if dealer_total > 21 or player_total > dealer_total:
+            return PLAYER
+        if player_total < dealer_total:
+            return DEALER
+        return PUSH
+
+    # Amount returned to the player, stake included (0 for a loss)
+    def payout(self, bet):
+        return int(bet * PAYOUTS[self.outcome()])
+
+
+# Simple fixed strategy for headless play: stand on 17+, on 12-16 against a
+# dealer 2-6, on soft 18+ (no doubling or splitting)
+def basic_should_hit(total, soft, dealer_up):
+    if soft:
+        return total < 18
+    if total >= 17:
+        return False
+    if total >= 12 and 2 <= dealer_up <= 6:
+        return False
+    return True
+
+
+# Play one whole round headless, returns the payout multiplier (0, 1, 2 or 2.5)
+def play_round(shoe, should_hit=basic_should_hit, hit_soft_17=HIT_SOFT_17):
+    game = BlackjackRound(shoe, hit_soft_17)
+    if not game.game_over:
+        dealer_up = CARD_VALUES[game.dealer_hand[0]]
+        dealer_up = 11 if dealer_up == 1 else dealer_up
+        while not game.game_over:
+            total, soft = hand_value(game.player_hand)
+            if should_hit(total, soft, dealer_up):
+                game.hit()
+            else:
+                game.stand()
+    return PAYOUTS[game.outcome()]
@@ -0,0 +1,75 @@
+import csv
+import io
+import re
+
+BULK_ADJUST_MAX_ROWS = 5000
+BULK_ADJUST_MAX_BYTES = 512 * 1024
+
+_MENTION = re.compile(r"^<@!?(\d+)>$")
+
+
+class Adjustment:
+    __slots__ = ("line", "user_id", "delta", "note")
+
+    def __init__(self, line, user_id, delta, note):
+        self.line = line
+        self.user_id = user_id
+        self.delta = delta
+        self.note = note
+
+
+def _parse_user_id(cell):
+    cell = cell.strip()
+    match = _MENTION.match(cell)
+    if match:
+        return match.group(1)
+    return cell if cell.isdigit() else None
+
+
+# Parse a CSV of "user_id,delta[,note]" rows (a header row is optional, user ids
+# may be mentions). Returns (adjustments, errors), errors are "line N: ..." strings.
+def parse_adjustments(text, max_rows=BULK_ADJUST_MAX_ROWS):
+    adjustments = []
+    errors = []
+    for line, row in enumerate(csv.reader(io.StringIO(text)), start=1):
+        if not row or all(not cell.strip() for cell in row):
+            continue
+        if line == 1 and _parse_user_id(row[0]) is None and row[0].strip().lower() in ("user_id", "user", "id"):
+            continue  # Header
+        if len(row) < 2:
+            errors.append(f"line {line}: expected user_id,delta[,note]")
+            continue
+
+        user_id = _parse_user_id(row[0])
+        try:
+            delta = int(row[1].strip().replace("+", "", 1))
+        except ValueError:
+            delta = None
+        if user_id is None:
+            errors.append(f"line {line}: {row[0].strip()!r} is not a user id")
+        elif delta is None or delta == 0:
+            errors.append(f"line {line}: {row[1].strip()!r} is not a whole non-zero amount")
+        else:
+            adjustments.append(Adjustment(line, user_id, delta, row[2].strip() if len(row) > 2 else ""))
+
+        if len(adjustments) > max_rows:
+            errors.append(f"more than {max_rows} rows, split the file")
+            break
+    return adjustments, errors
+
+
+def decode_csv(data):
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("latin-1")
+
+
+# Per-row report with the balance each player ended up with
+def report_csv(adjustments, balances):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["line", "user_id", "delta", "note", "new_balance"])
+    for a in adjustments:
+        writer.writerow([a.line, a.user_id, a.delta, a.note, balances.get(a.user_id, 0)])
+    return out.getvalue()
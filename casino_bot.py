@@ -1,14 +1,32 @@
+import time
+startup_started = time.perf_counter()  # Taken before the other imports for the startup report
 import discord
-import random
 import os
-import json
-import openpyxl
 import asyncio
+import io
+import tempfile
 from dotenv import load_dotenv
 from discord import app_commands
 from discord.ext import commands
-from datetime import datetime, timezone
-from datetime import datetime, timedelta
+from storage import open_storage, load_storage
+from transaction_history import TransactionRecord
+from wallet import Wallet, InsufficientFunds
+from players import PlayerCache, BetTransformer, NotRegistered, InvalidBet
+from scheduler import Scheduler, weekly
+from user_names import UserNameCache
+from animation import Animator, render_spin_frames
+from outbox import Outbox, URGENT, LOW
+from blackjack import BlackjackRound, Shoe, format_hand, BLACKJACK, PLAYER, PUSH
+from paytables import SLOT_SYMBOLS, SLOTS_MULTIPLIER, LOTTERY_TICKET_PRICE, LOTTERY_PRIZE_TIERS
+import game_core
+from game_core import WIN, LOSE, COINFLIP_SIDES
+from sessions import SessionStore, SESSION_TTL, AUTO_STAND
+from bulk_adjust import parse_adjustments, decode_csv, report_csv, BULK_ADJUST_MAX_BYTES
+from staff_requests import StaffRequests, custom_id, DEPOSIT, WITHDRAWAL, PENDING, ACCEPTED, REJECTED
+from leaderboard import Leaderboard, ALL_GAMES, ALL_TIME, WEEK
+from player_stats import PlayerStats
+from house_stats import HouseStats, MINUTE, HOUR, DAY, HANDLE, PAYOUTS, ROUNDS, PLAYERS
+from startup import StartupTimer, sync_commands_if_changed
 
 # Bot setup
 intents = discord.Intents.default()
@@ -17,107 +35,120 @@ intents.guilds = True
 intents.members = True  # Enable members intent
 bot = commands.Bot(command_prefix="/", intents=intents)
 
-# File paths
-BALANCES_FILE = "balances.json"
-TRANSACTIONS_FILE = "transactions.json"
+# Settings (data file paths live in storage.py)
+TRANSACTIONS_PAGE_SIZE = 10
+LOTTERY_STATUS_PAGE_SIZE = 25
 STAFF_CHANNEL_ID = 1358055200748998816
 LOTTERY_ANNOUNCE_CHANNEL_ID = 1362495523273310218
-LOTTERY_FILE = "lottery_entries.json"
 TOS_LINK = "https://docs.google.com/document/d/19KVZPvkb16YrnA7qi1x0DH9kojpRHh0LzoLjcwAAzpU/edit?usp=sharing"
 MAX_BET = 10000
-REGISTERED_USERS_FILE = "registered_users.json"
-LOTTERY_TICKET_PRICE = 100
+SLOTS_ANIMATION = "full"  # full, reduced (one frame) or instant (no animation)
+BLACKJACK_TIMEOUT_POLICY = "stand"  # stand (the dealer plays the hand out) or refund, for abandoned games
+# Pay tables and the lottery price live in paytables.py
 DRAW_DAY = 6
 DRAW_HOUR = 0
 DRAW_MINUTE = 0
+PERSIST_INTERVAL = 2.0  # Seconds between background saves
+PERSIST_MAX_PENDING = 500  # Save early once this many changes are waiting
 
-#Lottery load & Save data
-def load_lottery_entries():
-    if os.path.exists(LOTTERY_FILE):
-        with open(LOTTERY_FILE, "r") as f:
-            return json.load(f)
-    return []
-def save_lottery_entries(entries):
-    with open(LOTTERY_FILE, "w") as f:
-        json.dump(entries, f, indent=4)
-lottery_entries = load_lottery_entries()
-
-
-# Load and save registered users
-def load_registered_users():
-    if os.path.exists(REGISTERED_USERS_FILE):
-        with open(REGISTERED_USERS_FILE, "r") as f:
-            return json.load(f)
-    return []
-def save_registered_users(users):
-    with open(REGISTERED_USERS_FILE, "w") as f:
-        json.dump(users, f, indent=4)
-registered_users = load_registered_users()
-def is_registered(user_id):
-    return str(user_id) in registered_users
+# Load environment variables from a .env file
+load_dotenv()
+BOT_KEY = os.getenv("BOT_TOKEN")
 
+# Storage backend (STORAGE_BACKEND env var: json or sqlite). It owns all state below and
+# saves every change in the background instead of inside the commands.
+# Nothing is read here, load_state() does it once from setup_hook.
+storage = open_storage(interval=PERSIST_INTERVAL, max_pending=PERSIST_MAX_PENDING, load=False)
+balances = storage.balances
+lottery = storage.lottery  # Ticket counts per player
 
+# User names for logs and lottery status (gateway cache first, REST lookups cached with a TTL)
+user_names = UserNameCache(bot)
 
-# Load data from file
-def load_data(file_path):
-    try:
-        if os.path.exists(file_path) and os.path.getsize(file_path) > 0:  # Ensure file exists & has content
-            with open(file_path, "r") as file:
-                data = json.load(file)
-                if isinstance(data, dict):  # Ensure the loaded data is a dictionary
-                    return data
-        print(f"⚠️ Warning: {file_path} is empty or invalid. Using default values.")
-        return {}  # Return empty dictionary if the file is empty or corrupted
-    except (FileNotFoundError, json.JSONDecodeError):
-        print(f"⚠️ Error loading {file_path}. Using default values.")
-        return {}
-def save_data(file_path, data):
-    with open(file_path, "w") as file:
-        json.dump(data, file, indent=4)
+# Staff-channel posts and DMs go through the outbox, handlers never wait on them
+outbox = Outbox(bot, storage.saver)
 
+# Deposit/withdrawal requests waiting on staff (pending_requests.json)
+staff_requests = StaffRequests(storage.saver)
 
-# Load environment variables from a .env file
-load_dotenv()
-BOT_KEY = os.getenv("BOT_TOKEN")
+# Games waiting on a click (bets already taken), resolved by their timeout policy when abandoned
+sessions = SessionStore(storage.saver)
 
-tree = bot.tree
+# Running totals per player and game for /stats (player_stats.json, counted from the history on the first start)
+player_stats = PlayerStats(storage.saver)
 
-# User balances and transactions
-balances = load_data(BALANCES_FILE)  # Ensure it loads
-transactions = load_data(TRANSACTIONS_FILE)  # Ensure it loads
+# Net winnings rankings, built from player_stats and this week's totals the first time /leaderboard is used
+leaderboard = Leaderboard(storage.saver, player_stats)
 
-# Log transactions to excel
-def log_transaction_to_excel(user_id, description):
-    file_name = "transaction_log.xlsx"
+# House totals per game in minute/hour/day buckets for /house_report (house_stats.json)
+house_stats = HouseStats(storage.saver)
 
-    # Load existing workbook or create a new one
-    if os.path.exists(file_name):
-        workbook = openpyxl.load_workbook(file_name)
-        sheet = workbook.active
-    else:
-        workbook = openpyxl.Workbook()
-        sheet = workbook.active
-        sheet.append(["Timestamp", "User ID", "Username", "Description"])  # Header
+# Timed jobs (one timer for all of them, last runs saved in scheduler_state.json)
+scheduler = Scheduler()
 
-    # Get username (fallback to Unknown)
-    user = bot.get_user(int(user_id))
-    username = user.name if user else "Unknown"
+# Every balance change goes through the wallet (per-user locks, bets reserved up front)
+wallet = Wallet(storage)
+
+# Player profiles for the shared command gate: @registered_only resolves the
+# player once per interaction (interaction.extras["player"]) and Bet validates bets
+players = PlayerCache(storage, MAX_BET)
+registered_only = players.registered_only()
+Bet = app_commands.Transform[int, BetTransformer(players)]
+
+def is_registered(user_id):
+    return players.get(user_id).registered
 
-    # Timestamp
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+startup = StartupTimer(startup_started)
 
-    # Append the log entry
-    sheet.append([timestamp, user_id, username, description])
+# Read every saved state into memory, once per process (setup_hook)
+def load_state():
+    global balances, lottery
+    load_storage(storage)
+    balances = storage.balances
+    lottery = storage.lottery
+    print(f"✅ Balances loaded from {type(storage).__name__} ({len(balances)} users).")
 
-    # Save the file
-    workbook.save(file_name)
+    outbox.load()
+    staff_requests.load()
+    player_stats.load(history=storage.iter_transactions)
+    leaderboard.load()
+    house_stats.load()
+
+
+tree = bot.tree
+
+# Replies for commands stopped by the gate
+@tree.error
+async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    if isinstance(error, NotRegistered):
+        message = "🚫 You need to `/register` and accept the ToS before using this command."
+    elif isinstance(error, InvalidBet):
+        message = f"❌ Invalid bet amount! \n Bet must be between 1 and ${error.max_bet}."
+    else:
+        await app_commands.CommandTree.on_error(tree, interaction, error)  # Default logging
+        return
+
+    if interaction.response.is_done():
+        await interaction.followup.send(message, ephemeral=True)
+    else:
+        await interaction.response.send_message(message, ephemeral=True)
 
 # Log transactions for each user
-def log_transaction(user_id, description):
+# delta is the net change of the whole round (a lost bet is -bet even if it was taken up front)
+# A refunded round is logged with bet=0 and delta=0, void, so stats don't count it as played
+def log_transaction(user_id, description, game="other", bet=0, delta=0):
     user_id = str(user_id)
-    transactions.setdefault(user_id, []).append(description)
-    save_data(TRANSACTIONS_FILE, transactions)
-    log_transaction_to_excel(user_id, description)
+
+    # Get username (fallback to Unknown)
+    username = user_names.name(user_id)
+
+    record = TransactionRecord.create(user_id, description, game=game, bet=bet, delta=delta,
+                                      balance_after=get_balance(user_id), username=username)
+    storage.append_transaction(record)
+    leaderboard.add(record)
+    player_stats.add(record)
+    house_stats.add(record, pot=lottery.total * LOTTERY_TICKET_PRICE)
+    return record
 
 
 # Helper function to get balance
@@ -126,22 +157,11 @@ def get_balance(user_id):
     return balances.get(user_id_str, 0)  # Fetch using string key
 
 
-# Helper function to update balance
-def update_balance(user_id, amount):
-    user_id_str = str(user_id)  # Convert user ID to string for consistency
-    balances[user_id_str] = get_balance(user_id_str) + amount
-    save_data(BALANCES_FILE, balances)
-
-
 # Command to check balance
 @bot.tree.command(name="balance", description="Check your balance")
+@registered_only
 async def balance(interaction: discord.Interaction):
-    if not is_registered(interaction.user.id):
-        await interaction.response.send_message("🚫 You need to `/register` and accept the ToS before using this command.", ephemeral=True)
-        return
-
-    user_id = interaction.user.id
-    balance = get_balance(user_id)
+    balance = players.for_interaction(interaction).balance
     await interaction.response.send_message(f"💰 Your balance is `${balance}` Redmont Dollars.", ephemeral=True)
 
 
@@ -159,10 +179,8 @@ async def balance(interaction: discord.Interaction):
         app_commands.Choice(name="Decrease", value="decrease")
     ]
 )
+@registered_only
 async def adjust_balance(interaction: discord.Interaction, member: discord.Member, action: app_commands.Choice[str], amount: int):
-    if not is_registered(interaction.user.id):
-        await interaction.response.send_message("🚫 You need to `/register` and accept the ToS before using this command.", ephemeral=True)
-        return
     if not interaction.user.guild_permissions.administrator:
         return await interaction.response.send_message("🚫 You must be an admin to use this command.", ephemeral=True)
 
@@ -171,216 +189,298 @@ async def adjust_balance(interaction: discord.Interaction, member: discord.Membe
 
     modifier = amount if action.value == "increase" else -amount
 
-    # Update balance
-    update_balance(member.id, modifier)
-    new_balance = get_balance(member.id)
+    # Update balance (admins may take a balance below zero, so no balance check here)
+    new_balance = await wallet.credit(member.id, modifier)
 
-    # Log to transactions.json
-    try:
-        with open("transactions.json", "r") as f:
-            transactions = json.load(f)
-    except FileNotFoundError:
-        transactions = {}
-
-    user_id = str(member.id)
-    if user_id not in transactions:
-        transactions[user_id] = []
-
-    transactions[user_id].append(
-        f"[ADMIN] {'Increased' if modifier > 0 else 'Decreased'} ${abs(modifier)} | New Balance: ${new_balance}"
+    log_transaction(
+        member.id,
+        f"[ADMIN] {'Increased' if modifier > 0 else 'Decreased'} ${abs(modifier)} | New Balance: ${new_balance}",
+        game="admin", delta=modifier
     )
 
-    with open("transactions.json", "w") as f:
-        json.dump(transactions, f, indent=4)
-
     await interaction.response.send_message(
         f"✅ {'Increased' if modifier > 0 else 'Decreased'} `${abs(modifier)}` from {member.mention}'s balance.\n📦 New balance: `${new_balance}`",
         ephemeral=True
     )
 
 
+# Admin command to adjust many balances at once from a CSV attachment
+# The whole file is checked first and applied as one wallet batch (nothing at all
+# if any row is invalid or would overdraw), then logged and saved with one flush.
+@app_commands.default_permissions(administrator=True)
+@bot.tree.command(name="bulk_adjust", description="Admins can adjust many balances at once from a CSV file.")
+@app_commands.describe(
+    file="CSV with user_id,amount[,note] rows, negative amounts take money away",
+    dry_run="Only check the file and show what would change",
+    allow_negative="Let decreases take a balance below zero"
+)
+@registered_only
+async def bulk_adjust(interaction: discord.Interaction, file: discord.Attachment, dry_run: bool = False, allow_negative: bool = False):
+    if not interaction.user.guild_permissions.administrator:
+        return await interaction.response.send_message("🚫 You must be an admin to use this command.", ephemeral=True)
+
+    if file.size > BULK_ADJUST_MAX_BYTES:
+        return await interaction.response.send_message(f"❌ The file is too large (max {BULK_ADJUST_MAX_BYTES // 1024} KB).", ephemeral=True)
+
+    await interaction.response.defer(ephemeral=True)
+
+    adjustments, errors = parse_adjustments(decode_csv(await file.read()))
+    errors += [f"line {a.line}: <@{a.user_id}> isn't registered" for a in adjustments if not is_registered(a.user_id)]
+    if not errors and not adjustments:
+        errors.append("the file has no rows")
+    if not errors:
+        ok = await wallet.apply_batch([(a.user_id, a.delta) for a in adjustments], atomic=True,
+                                      allow_negative=allow_negative, dry_run=dry_run)
+        errors += [f"line {a.line}: <@{a.user_id}> doesn't have ${-a.delta}" for a, fits in zip(adjustments, ok) if not fits]
+
+    if errors:
+        shown = "\n".join(errors[:20]) + (f"\n... and {len(errors) - 20} more" if len(errors) > 20 else "")
+        return await interaction.followup.send(f"❌ Nothing was changed, fix these and try again:\n{shown}", ephemeral=True)
+
+    if not dry_run:
+        for a in adjustments:
+            log_transaction(a.user_id, f"[ADMIN] Bulk adjustment {'+' if a.delta > 0 else '-'}${abs(a.delta)}" + (f": {a.note}" if a.note else ""),
+                            game="admin", delta=a.delta)
+        await storage.flush()
+
+    credited = sum(a.delta for a in adjustments if a.delta > 0)
+    debited = -sum(a.delta for a in adjustments if a.delta < 0)
+    embed = discord.Embed(title="🧮 Bulk Adjustment" + (" (dry run, nothing changed)" if dry_run else ""),
+                          color=discord.Color.blue() if dry_run else discord.Color.green())
+    embed.add_field(name="Rows", value=str(len(adjustments)), inline=True)
+    embed.add_field(name="Players", value=str(len({a.user_id for a in adjustments})), inline=True)
+    embed.add_field(name="Increased", value=f"${credited}", inline=True)
+    embed.add_field(name="Decreased", value=f"${debited}", inline=True)
+    embed.add_field(name="Net", value=f"{'-' if debited > credited else ''}${abs(credited - debited)}", inline=True)
+
+    if dry_run:
+        final = {}
+        for a in adjustments:
+            final[a.user_id] = final.get(a.user_id, get_balance(a.user_id)) + a.delta
+    else:
+        final = {a.user_id: get_balance(a.user_id) for a in adjustments}
+    report = discord.File(io.BytesIO(report_csv(adjustments, final).encode("utf-8")), filename="bulk_adjust_report.csv")
+    await interaction.followup.send(embed=embed, file=report, ephemeral=True)
+
+
+# Admin command to export the transaction log as a spreadsheet
+@app_commands.default_permissions(administrator=True)
+@bot.tree.command(name="export_transactions", description="Admins can export the transaction log to Excel.")
+@app_commands.describe(
+    start="First day to include (YYYY-MM-DD), leave empty for everything",
+    end="Last day to include (YYYY-MM-DD), leave empty for everything"
+)
+async def export_transactions_command(interaction: discord.Interaction, start: str = None, end: str = None):
+    if not interaction.user.guild_permissions.administrator:
+        return await interaction.response.send_message("🚫 You must be an admin to use this command.", ephemeral=True)
+
+    from excel_export import export_transactions, parse_date  # xlsxwriter is only imported when it is used
+
+    try:
+        start_date = parse_date(start)
+        end_date = parse_date(end)
+    except ValueError:
+        return await interaction.response.send_message("❌ Dates must look like `2025-04-30`.", ephemeral=True)
+
+    await interaction.response.defer(ephemeral=True)
+    await storage.flush()  # Make sure the newest rows are on disk before reading them
+
+    out_file = os.path.join(tempfile.gettempdir(), f"transaction_log_{interaction.id}.xlsx")
+    try:
+        count = await asyncio.to_thread(export_transactions, out_file, storage.iter_transactions(), start_date, end_date)
+        await interaction.followup.send(
+            f"📊 Exported **{count}** transactions (one sheet per month).",
+            file=discord.File(out_file, filename="transaction_log.xlsx"),
+            ephemeral=True
+        )
+    finally:
+        if os.path.exists(out_file):
+            os.remove(out_file)
+
+
 # Roll Dice game
 @bot.tree.command(name="roll_dice", description="Roll a dice against the bot. If both rolls match, you win 3x your bet!")
-async def roll_dice(interaction: discord.Interaction, bet: int):
-    if not is_registered(interaction.user.id):
-        await interaction.response.send_message("🚫 You need to `/register` and accept the ToS before using this command.", ephemeral=True)
-        return
-
-    if bet <= 0 or bet > MAX_BET:
-        await interaction.response.send_message(f"❌ Invalid bet amount! \n Bet must be between 1 and ${MAX_BET}.", ephemeral=True)
-        return
-    
-    user_balance = get_balance(interaction.user.id)
-    if bet > user_balance:
+@registered_only
+async def roll_dice(interaction: discord.Interaction, bet: Bet):
+    try:
+        reservation = await wallet.reserve(interaction.user.id, bet)
+    except InsufficientFunds:
         await interaction.response.send_message("❌ You don't have enough Balance to place this bet!", ephemeral=True)
         return
     
-    user_roll = random.randint(1, 6)
-    bot_roll = random.randint(1, 6)
+    roll = game_core.roll_dice(bet)
+    user_roll = roll.details["user_roll"]
+    bot_roll = roll.details["bot_roll"]
+    await wallet.settle(reservation, roll.payout)
     
-    if user_roll == bot_roll:
-        winnings = bet * 2
-        update_balance(interaction.user.id, winnings-bet)  # Net gain
-        log_transaction(interaction.user.id, f"Won in roll dice +${winnings}")
+    if roll.outcome == WIN:
+        winnings = roll.payout
+        log_transaction(interaction.user.id, f"Won in roll dice +${winnings}", game="roll_dice", bet=bet, delta=roll.delta)
         result = f"🎉 You rolled a {user_roll}, and the bot rolled a {bot_roll}. You win **${winnings}**!"
     else:
-        update_balance(interaction.user.id, -bet)
-        log_transaction(interaction.user.id, f"Lost in roll dice -${bet}")
+        log_transaction(interaction.user.id, f"Lost in roll dice -${bet}", game="roll_dice", bet=bet, delta=roll.delta)
         result = f"😞 You rolled a {user_roll}, and the bot rolled a {bot_roll}. You lose **${bet}**."
     
-    embed = discord.Embed(title="🎲 Roll Dice 🎲", description=result, color=discord.Color.green() if user_roll == bot_roll else discord.Color.red())
+    embed = discord.Embed(title="🎲 Roll Dice 🎲", description=result, color=discord.Color.green() if roll.outcome == WIN else discord.Color.red())
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
 # Coinflip game
 @bot.tree.command(name="coinflip", description="Flip a coin and bet on heads or tails")
-async def coinflip(interaction: discord.Interaction, bet: int, choice: str):
-    if not is_registered(interaction.user.id):
-        await interaction.response.send_message("🚫 You need to `/register` and accept the ToS before using this command.", ephemeral=True)
-        return
-
+@registered_only
+async def coinflip(interaction: discord.Interaction, bet: Bet, choice: str):
     user_id = interaction.user.id
-    if choice.lower() not in ["heads", "tails"]:
+    if choice.lower() not in COINFLIP_SIDES:
         await interaction.response.send_message("⚠️ Choose either 'heads' or 'tails'!", ephemeral=True)
         return
-    if bet <= 0 or bet > MAX_BET:
-        await interaction.response.send_message(f"⚠️ Bet must be between 1 and {MAX_BET}!", ephemeral=True)
-        return
-    if bet > get_balance(user_id):
+    try:
+        reservation = await wallet.reserve(user_id, bet)
+    except InsufficientFunds:
         await interaction.response.send_message("💸 You don't have enough Balance!", ephemeral=True)
         return
     
-    result = random.choice(["heads", "tails"])
+    flip = game_core.coinflip(bet, choice)
+    await wallet.settle(reservation, flip.payout)
+    result = flip.details["result"]
     embed = discord.Embed(title="🪙 Coin Flip 🪙", description=f"The coin landed on **{result}**!", color=discord.Color.orange())
     
-    if result == choice.lower():
-        winnings = bet * 2
-        update_balance(user_id, winnings-bet)  # Net gain
-        log_transaction(user_id, f"Won in coinflip +${winnings}")
+    if flip.outcome == WIN:
+        winnings = flip.payout
+        log_transaction(user_id, f"Won in coinflip +${winnings}", game="coinflip", bet=bet, delta=flip.delta)
         embed.add_field(name="🎉 You Win!", value=f"You won **${winnings}**!", inline=False)
     else:
-        update_balance(user_id, -bet)
-        log_transaction(user_id, f"Lost in coinflip -${bet}")
+        log_transaction(user_id, f"Lost in coinflip -${bet}", game="coinflip", bet=bet, delta=flip.delta)
         embed.add_field(name="😢 You Lost", value=f"You lost **${bet}**.", inline=False)
     
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
 # Blackjack game
-class BlackjackGame:
-    def __init__(self, user_id, bet):
+# Blackjack tables: one shoe per channel, dealt round after round until the cut card
+blackjack_shoes = {}
+
+def table_shoe(channel_id):
+    shoe = blackjack_shoes.get(channel_id)
+    if shoe is None:
+        shoe = blackjack_shoes[channel_id] = Shoe()
+    return shoe
+
+class BlackjackGame(BlackjackRound):
+    def __init__(self, user_id, bet, reservation, shoe, hands=None):
+        super().__init__(shoe, hands=hands)
         self.user_id = user_id
         self.bet = bet
-        self.player_hand = [random.randint(1, 11), random.randint(1, 11)]
-        self.bot_hand = [random.randint(1, 11), random.randint(1, 11)]
-        self.game_over = False
-
-    def hit(self):
-        self.player_hand.append(random.randint(1, 11))
-        if sum(self.player_hand) > 21:
-            self.game_over = True
-        return self.player_hand
-
-    def stand(self):
-        while sum(self.bot_hand) < 17:
-            self.bot_hand.append(random.randint(1, 11))
-        self.game_over = True
-        return self.bot_hand
-
-    def is_blackjack(self, hand):
-        return sorted(hand) == [1, 10]
-
-    def get_winner(self):
-        if self.is_blackjack(self.player_hand):
-            return "blackjack"
-
-        player_total = sum(self.player_hand)
-        bot_total = sum(self.bot_hand)
-
-        if player_total > 21:
-            return "bot"
-        elif bot_total > 21 or player_total > bot_total:
-            return "player"
-        elif player_total < bot_total:
-            return "bot"
-        else:
-            return "tie"
+        self.reservation = reservation  # The bet, taken from the balance when the game started
 
-games = {}
+def blackjack_embed(game, title="🃏 Blackjack 🃏", color=discord.Color.green(), result=None):
+    embed = discord.Embed(title=title, color=color)
+    embed.add_field(name="Your Hand", value=f"{format_hand(game.player_hand)} (Total: {game.player_total})", inline=False)
+    if game.game_over:
+        embed.add_field(name="Bot's Hand", value=f"{format_hand(game.dealer_hand)} (Total: {game.dealer_total})", inline=False)
+    else:
+        embed.add_field(name="Bot's Hand", value=f"{format_hand(game.dealer_hand[:1])} ??", inline=False)
+    embed.add_field(name="Game Status" if result is None else "Game Result", value=result or "Hit or Stand?", inline=False)
+    return embed
+
+# Settle a finished round and show the result, respond sends or edits the game message
+async def finish_blackjack(interaction, game, respond):
+    winner = game.outcome()
+    user_id = game.user_id
+    winnings = game.payout(game.bet)
+
+    if not await wallet.settle(game.reservation, winnings):
+        await interaction.response.send_message("⚠️ This game is already over!", ephemeral=True)
+        return
+
+    if winner == BLACKJACK:
+        log_transaction(user_id, f"Blackjack! Win: +${winnings}", game="blackjack", bet=game.bet, delta=winnings - game.bet)
+        result = f"🂡 Blackjack! 🎉 You win **${winnings}**!"
+    elif winner == PLAYER:
+        log_transaction(user_id, f"Blackjack win: +${winnings}", game="blackjack", bet=game.bet, delta=winnings - game.bet)
+        result = f"🎉 You win **${winnings}**!"
+    elif winner == PUSH:
+        log_transaction(user_id, f"Blackjack tie: ${game.bet}", game="blackjack", bet=game.bet, delta=0)
+        result = f"🤝 It's a tie! Your bet of **${game.bet}** has been returned."
+    else:
+        log_transaction(user_id, f"Blackjack loss: -${game.bet}", game="blackjack", bet=game.bet, delta=-game.bet)
+        result = f"😢 You lose **${game.bet}**. Better luck next time!"
+
+    embed = blackjack_embed(game, "🃏 Blackjack - Game Over 🃏", discord.Color.gold(), result)
+    await respond(embed=embed, view=BlackjackPlayAgainView(user_id, game.bet))
+
+# Start a round, naturals are settled right away
+async def start_blackjack(interaction, user_id, bet, reservation, respond):
+    game = BlackjackGame(user_id, bet, reservation, table_shoe(interaction.channel_id))
+    if game.game_over:
+        await finish_blackjack(interaction, game, respond)
+        return
+    await sessions.open("blackjack", user_id, reservation, game, key=blackjack_key(user_id))
+    await respond(embed=blackjack_embed(game), view=BlackjackView(user_id, bet))
+
+# One blackjack game per player, Hit/Stand always act on the latest one
+def blackjack_key(user_id):
+    return f"blackjack:{user_id}"
+
+# Abandoned game: played out as a stand or refunded, see BLACKJACK_TIMEOUT_POLICY
+async def expire_blackjack(session):
+    game = session.state
+    bet = game.bet
+    if BLACKJACK_TIMEOUT_POLICY == AUTO_STAND:
+        game.stand()
+        payout = game.payout(game.bet)
+    else:
+        payout = game.bet
+        bet = 0  # Refunded, void
+    if await wallet.settle(session.reservation, payout):
+        log_transaction(game.user_id, f"Blackjack timed out ({BLACKJACK_TIMEOUT_POLICY}): ${payout} returned",
+                        game="blackjack", bet=bet, delta=payout - game.bet)
+
+sessions.register_kind(
+    "blackjack",
+    lambda game: {"bet": game.bet, "player_hand": game.player_hand, "dealer_hand": game.dealer_hand},
+    lambda user_id, reservation, data: BlackjackGame(int(user_id), data["bet"], reservation, Shoe(),
+                                                     hands=(data["player_hand"], data["dealer_hand"])),
+    expire_blackjack,
+)
 
 class BlackjackView(discord.ui.View):
     def __init__(self, user_id, bet):
-        super().__init__()
+        super().__init__(timeout=SESSION_TTL)
         self.user_id = user_id
         self.bet = bet
 
     async def end_game(self, interaction, game):
-        winner = game.get_winner()
-        user_id = interaction.user.id
-        winnings = 0
-
-        if winner == "blackjack":
-            winnings = int(game.bet * 2.5)
-            update_balance(user_id, winnings)
-            log_transaction(user_id, f"Blackjack! Win: +${winnings}")
-            result = f"🂡 Blackjack! 🎉 You win **${winnings}**!"
-        elif winner == "player":
-            winnings = game.bet * 2
-            update_balance(user_id, winnings)
-            log_transaction(user_id, f"Blackjack win: +${winnings}")
-            result = f"🎉 You win **${winnings}**!"
-        elif winner == "tie":
-            update_balance(user_id, game.bet)
-            log_transaction(user_id, f"Blackjack tie: ${game.bet}")
-            result = f"🤝 It's a tie! Your bet of **${game.bet}** has been returned."
-        else:
-            log_transaction(user_id, f"Blackjack loss: -${game.bet}")
-            result = f"😢 You lose **${game.bet}**. Better luck next time!"
-
-        for item in self.children:
-            item.disabled = True
-
-        embed = discord.Embed(title="🃏 Blackjack - Game Over 🃏", color=discord.Color.gold())
-        embed.add_field(name="Your Hand", value=f"{game.player_hand} (Total: {sum(game.player_hand)})", inline=False)
-        embed.add_field(name="Bot's Hand", value=f"{game.bot_hand} (Total: {sum(game.bot_hand)})", inline=False)
-        embed.add_field(name="Game Result", value=result, inline=False)
-
-        view = BlackjackPlayAgainView(self.user_id, self.bet)
-        await interaction.response.edit_message(embed=embed, view=view)
+        await finish_blackjack(interaction, game, interaction.response.edit_message)
 
     @discord.ui.button(label="Hit", style=discord.ButtonStyle.primary)
     async def hit_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        user_id = interaction.user.id
-        if user_id not in games:
+        key = blackjack_key(interaction.user.id)
+        session = sessions.get(key)
+        if session is None:
             await interaction.response.send_message("⚠️ No active blackjack game found!", ephemeral=True)
             return
 
-        game = games[user_id]
+        game = session.state
         game.hit()
 
         if game.game_over:
+            sessions.close(key)  # Before any await, a Play Again click may start the next game
             await self.end_game(interaction, game)
-            del games[user_id]
             return
 
-        embed = discord.Embed(title="🃏 Blackjack 🃏", color=discord.Color.green())
-        embed.add_field(name="Your Hand", value=f"{game.player_hand} (Total: {sum(game.player_hand)})", inline=False)
-        embed.add_field(name="Bot's Hand", value=f"[{game.bot_hand[0]}, ?]", inline=False)
-        embed.add_field(name="Game Status", value="Hit or Stand?", inline=False)
-
-        await interaction.response.edit_message(embed=embed, view=self)
+        sessions.touch(key)
+        await interaction.response.edit_message(embed=blackjack_embed(game), view=self)
 
     @discord.ui.button(label="Stand", style=discord.ButtonStyle.danger)
     async def stand_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        user_id = interaction.user.id
-        if user_id not in games:
+        session = sessions.close(blackjack_key(interaction.user.id))
+        if session is None:
             await interaction.response.send_message("⚠️ No active blackjack game found!", ephemeral=True)
             return
 
-        game = games[user_id]
+        game = session.state
         game.stand()
         await self.end_game(interaction, game)
-        del games[user_id]
 
 class BlackjackPlayAgainView(discord.ui.View):
     def __init__(self, user_id, bet):
@@ -390,57 +490,38 @@ class BlackjackPlayAgainView(discord.ui.View):
 
     @discord.ui.button(label="🔁 Play Again", style=discord.ButtonStyle.success)
     async def play_again_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if get_balance(self.user_id) < self.bet:
+        try:
+            reservation = await wallet.reserve(self.user_id, self.bet)
+        except InsufficientFunds:
             await interaction.response.send_message("💸 You don't have enough Balance to play again!", ephemeral=True)
             return
 
-        games[self.user_id] = BlackjackGame(self.user_id, self.bet)
-        update_balance(self.user_id, -self.bet)
-
-        game = games[self.user_id]
-
-        embed = discord.Embed(title="🃏 Blackjack 🃏", color=discord.Color.green())
-        embed.add_field(name="Your Hand", value=f"{game.player_hand} (Total: {sum(game.player_hand)})", inline=False)
-        embed.add_field(name="Bot's Hand", value=f"[{game.bot_hand[0]}, ?]", inline=False)
-        embed.add_field(name="Game Status", value="Hit or Stand?", inline=False)
-
-        view = BlackjackView(self.user_id, self.bet)
-        await interaction.response.edit_message(embed=embed, view=view)
+        await start_blackjack(interaction, self.user_id, self.bet, reservation, interaction.response.edit_message)
 
 @bot.tree.command(name="blackjack", description="Play a game of blackjack against the bot")
-async def blackjack(interaction: discord.Interaction, bet: int):
-    if not is_registered(interaction.user.id):
-        await interaction.response.send_message("🚫 You need to `/register` and accept the ToS before using this command.", ephemeral=True)
-        return
-
+@registered_only
+async def blackjack(interaction: discord.Interaction, bet: Bet):
     user_id = interaction.user.id
-    if bet <= 0 or bet > MAX_BET:
-        await interaction.response.send_message(f"⚠️ Bet must be between 1 and {MAX_BET}!", ephemeral=True)
-        return
-    if bet > get_balance(user_id):
+    try:
+        reservation = await wallet.reserve(user_id, bet)
+    except InsufficientFunds:
         await interaction.response.send_message("💸 You don't have enough Balance!", ephemeral=True)
         return
 
-    games[user_id] = BlackjackGame(user_id, bet)
-    update_balance(user_id, -bet)
+    async def respond(**kwargs):
+        await interaction.response.send_message(ephemeral=True, **kwargs)
 
-    game = games[user_id]
-
-    embed = discord.Embed(title="🃏 Blackjack 🃏", color=discord.Color.green())
-    embed.add_field(name="Your Hand", value=f"{game.player_hand} (Total: {sum(game.player_hand)})", inline=False)
-    embed.add_field(name="Bot's Hand", value=f"[{game.bot_hand[0]}, ?]", inline=False)
-    embed.add_field(name="Game Status", value="Hit or Stand?", inline=False)
-
-    view = BlackjackView(user_id, bet)
-    await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+    await start_blackjack(interaction, user_id, bet, reservation, respond)
 
 
 
 # Graceful shutdown function
-def handle_shutdown():
+async def handle_shutdown():
     print("🔴 Saving data before shutdown...")
-    save_data(BALANCES_FILE, balances)
-    save_data(TRANSACTIONS_FILE, transactions)
+    await scheduler.stop()  # Waits for a job that is already running (e.g. a lottery draw)
+    await outbox.stop()  # Undelivered messages are saved and resent after the restart
+    await sessions.stop()  # Games still waiting on a click are saved and resolved after the restart
+    await storage.close()  # Stops the background saver and flushes everything still pending
     print("✅ Data saved successfully. Bot is shutting down.")
 
 
@@ -448,158 +529,290 @@ def handle_shutdown():
 @app_commands.default_permissions(administrator=True)
 @bot.tree.command(name="shutdown", description="Safely shutdown the bot (Admin only)")
 @app_commands.checks.has_permissions(administrator=True)
+@registered_only
 async def shutdown(interaction: discord.Interaction):
-    if not is_registered(interaction.user.id):
-        await interaction.response.send_message("🚫 You need to `/register` and accept the ToS before using this command.", ephemeral=True)
-        return
     await interaction.response.send_message("🔴 Shutting down the bot safely...", ephemeral=True)
-    handle_shutdown()
+    await handle_shutdown()
     await bot.close()
 
 
 # Run the bot
+# setup_hook runs once per process after logging in and before connecting to the
+# gateway, on_ready fires again on every reconnect, so all loading and starting
+# happens here
+@bot.event
+async def setup_hook():
+    startup.mark("login")
+    load_state()
+    startup.mark("load state")
+
+    storage.start()
+    scheduler.start()  # Timed jobs like the lottery draw run from here
+    outbox.start()  # Waits for the gateway before sending
+    sessions.start()  # Resolves games left over from before a restart
+    restore_staff_request_views()  # Buttons of requests posted before a restart work again
+
+    # Only when the commands changed, tree.sync() is rate limited
+    synced = await sync_commands_if_changed(bot.tree)
+    if synced is None:
+        startup.mark("command sync (failed)")
+    else:
+        startup.mark("command sync" if synced else "command sync (unchanged, skipped)")
+
 @bot.event
 async def on_ready():
-    global balances, transactions  # Ensure global variables are updated
+    print(f'✅ Logged in as {bot.user}')
+    startup.on_ready()
 
-    # Load balances
-    loaded_balances = load_data(BALANCES_FILE)
-    if isinstance(loaded_balances, dict):
-        balances.update(loaded_balances)  # Use update() instead of replacing the dict
-        print("✅ Balances successfully loaded from file.")
-    else:
-        print("⚠️ Balances failed to load. Using default empty dictionary.")
+@bot.event
+async def on_resumed():
+    startup.on_ready(resumed=True)
 
-    # Load transactions
-    loaded_transactions = load_data(TRANSACTIONS_FILE)
-    if isinstance(loaded_transactions, dict):
-        transactions.update(loaded_transactions)
-        print("✅ Transactions successfully loaded from file.")
-    else:
-        print("⚠️ Transactions failed to load. Using default empty dictionary.")
+@bot.event
+async def on_disconnect():
+    startup.on_disconnect()
 
-    await bot.tree.sync()
-    print(f'✅ Logged in as {bot.user}')
-    
-    bot.loop.create_task(lottery_auto_draw())
 
+#Deposit and withdrawal requests
+# Every request is kept in staff_requests (pending_requests.json) until staff handle it,
+# so its buttons work again after a restart and many can be approved at once.
+STAFF_REQUESTS_LIST_SIZE = 20
 
-#Deposit accept/reject
-class DepositView(discord.ui.View):
-    def __init__(self, user: discord.User, amount: int):
+def request_label(request):
+    return f"#{request['id']} {request['kind']} of ${request['amount']} for <@{request['user_id']}>"
+
+def request_embed(request):
+    if request["kind"] == DEPOSIT:
+        embed = discord.Embed(title=f"💰 Deposit Request #{request['id']}", color=discord.Color.gold())
+    else:
+        embed = discord.Embed(title=f"🏦 Withdrawal Request #{request['id']}", color=discord.Color.red())
+    embed.add_field(name="User", value=f"<@{request['user_id']}>", inline=False)
+    embed.add_field(name="Amount", value=f"${request['amount']}", inline=False)
+    if request.get("ign"):
+        embed.add_field(name="IGN", value=request["ign"], inline=False)
+    if request.get("proof"):
+        embed.set_image(url=request["proof"])
+    return embed
+
+# Approve or reject requests in one go. The balance changes of every approved
+# request are applied as one wallet batch, then logged, and everything is saved
+# with a single flush. Returns (handled, skipped) requests, a withdrawal the
+# player can no longer cover is skipped and stays pending.
+async def resolve_staff_requests(request_ids, approve, staff_id):
+    requests = staff_requests.begin(request_ids)  # Before any await
+    if approve:
+        changes = [(r["user_id"], r["amount"] if r["kind"] == DEPOSIT else -r["amount"]) for r in requests]
+        applied = await wallet.apply_batch(changes)
+    else:
+        applied = [True] * len(requests)
+
+    handled, skipped = [], []
+    for request, ok in zip(requests, applied):
+        if not ok:
+            staff_requests.release(request)
+            skipped.append(request)
+            continue
+        staff_requests.finish(request, ACCEPTED if approve else REJECTED, staff_id)
+        handled.append(request)
+
+        user_id, amount = request["user_id"], request["amount"]
+        if request["kind"] == DEPOSIT:
+            if approve:
+                log_transaction(user_id, f"Deposit accepted: +${amount}", game="deposit", delta=amount)
+                outbox.dm(user_id, f"✅ Your deposit of ${amount} has been **accepted**!")
+            else:
+                outbox.dm(user_id, f"❌ Your deposit of ${amount} has been **rejected**.")
+        elif approve:
+            log_transaction(user_id, f"Withdrawal accepted: -${amount}", game="withdrawal", delta=-amount)
+            outbox.dm(user_id, f"✅ Your withdrawal of ${amount} has been **approved**!\nIn-game name: `{request.get('ign')}`")
+        else:
+            outbox.dm(user_id, f"❌ Your withdrawal of ${amount} has been **rejected**.")
+
+    await storage.flush()
+    return handled, skipped
+
+# Accept/Reject buttons on a request in the staff channel
+# The custom_ids carry the request id, so restore_staff_request_views() can
+# reattach the buttons of every pending request after a restart.
+class StaffRequestView(discord.ui.View):
+    def __init__(self, request_id: int):
         super().__init__(timeout=None)
-        self.user = user
-        self.amount = amount
+        self.request_id = request_id
+        self.accept.custom_id = custom_id(request_id, "accept")
+        self.reject.custom_id = custom_id(request_id, "reject")
 
-    @discord.ui.button(label="Accept", style=discord.ButtonStyle.success)
-    async def accept(self, interaction: discord.Interaction, button: discord.ui.Button):
+    async def handle(self, interaction, approve):
         if not interaction.user.guild_permissions.manage_guild:
             await interaction.response.send_message("⛔ You don't have permission to do this.", ephemeral=True)
             return
 
-        update_balance(self.user.id, self.amount)
-        log_transaction(self.user.id, f"Deposit accepted: +${self.amount}")
-        await interaction.response.edit_message(content=f"✅ Deposit of ${self.amount} accepted for {self.user.mention}.", view=None)
-        await self.user.send(f"✅ Your deposit of ${self.amount} has been **accepted**!")
+        request = staff_requests.get(self.request_id)
+        if request is None or request["status"] != PENDING:
+            status = request["status"] if request is not None else "gone"
+            await interaction.response.edit_message(content=f"ℹ️ Request #{self.request_id} was already handled ({status}).", view=None)
+            return
+
+        handled, skipped = await resolve_staff_requests([self.request_id], approve, interaction.user.id)
+        if skipped:
+            await interaction.response.send_message(f"❌ <@{request['user_id']}> no longer has enough Balance for this withdrawal.", ephemeral=True)
+            return
+        if not handled:
+            await interaction.response.edit_message(content=f"ℹ️ Request #{self.request_id} was already handled.", view=None)
+            return
+
+        verb = ("accepted" if request["kind"] == DEPOSIT else "approved") if approve else "rejected"
+        icon = "✅" if approve else "❌"
+        await interaction.response.edit_message(content=f"{icon} {request['kind'].capitalize()} of ${request['amount']} {verb} for <@{request['user_id']}>.", view=None)
+
+    @discord.ui.button(label="Accept", style=discord.ButtonStyle.success)
+    async def accept(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.handle(interaction, True)
 
     @discord.ui.button(label="Reject", style=discord.ButtonStyle.danger)
     async def reject(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not interaction.user.guild_permissions.manage_guild:
-            await interaction.response.send_message("⛔ You don't have permission to do this.", ephemeral=True)
-            return
+        await self.handle(interaction, False)
+
+outbox.register_view("staff_request", StaffRequestView)
 
-        await interaction.response.edit_message(content=f"❌ Deposit of ${self.amount} rejected for {self.user.mention}.", view=None)
-        await self.user.send(f"❌ Your deposit of ${self.amount} has been **rejected**.")
+def restore_staff_request_views():
+    for request in staff_requests.pending():
+        bot.add_view(StaffRequestView(request["id"]))
 
 @bot.tree.command(name="deposit", description="Submit a deposit request with proof")
 @app_commands.describe(amount="Amount to deposit", proof="Upload a screenshot as proof")
+@registered_only
 async def deposit(interaction: discord.Interaction, amount: int, proof: discord.Attachment):
-    if not is_registered(interaction.user.id):
-        await interaction.response.send_message("🚫 You need to `/register` and accept the ToS before using this command.", ephemeral=True)
-        return
-
     if amount <= 0:
         await interaction.response.send_message("⚠️ Amount must be positive!", ephemeral=True)
         return
 
-    embed = discord.Embed(title="💰 Deposit Request", color=discord.Color.gold())
-    embed.add_field(name="User", value=interaction.user.mention, inline=False)
-    embed.add_field(name="Amount", value=f"${amount}", inline=False)
-    embed.set_image(url=proof.url)
-
-    staff_channel = interaction.guild.get_channel(STAFF_CHANNEL_ID)
-    await staff_channel.send(embed=embed, view=DepositView(interaction.user, amount))
+    request = staff_requests.add(DEPOSIT, interaction.user.id, amount, proof=proof.url)
+    outbox.post(STAFF_CHANNEL_ID, embed=request_embed(request), view=("staff_request", {"request_id": request["id"]}), priority=URGENT)
 
     await interaction.response.send_message("✅ Your deposit request has been submitted for review.", ephemeral=True)
 
-
-#Withdrawal accept/reject
-class WithdrawalView(discord.ui.View):
-    def __init__(self, user: discord.User, amount: int, ign: str):
-        super().__init__(timeout=None)
-        self.user = user
-        self.amount = amount
-        self.ign = ign
-
-    @discord.ui.button(label="Accept", style=discord.ButtonStyle.success)
-    async def accept(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not interaction.user.guild_permissions.manage_guild:
-            await interaction.response.send_message("⛔ You don't have permission to do this.", ephemeral=True)
-            return
-
-        update_balance(self.user.id, -self.amount)
-        log_transaction(self.user.id, f"Withdrawal accepted: -${self.amount}")
-        await interaction.response.edit_message(content=f"✅ Withdrawal of ${self.amount} approved for {self.user.mention}.", view=None)
-        await self.user.send(f"✅ Your withdrawal of ${self.amount} has been **approved**!\nIn-game name: `{self.ign}`")
-
-    @discord.ui.button(label="Reject", style=discord.ButtonStyle.danger)
-    async def reject(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not interaction.user.guild_permissions.manage_guild:
-            await interaction.response.send_message("⛔ You don't have permission to do this.", ephemeral=True)
-            return
-
-        await interaction.response.edit_message(content=f"❌ Withdrawal of ${self.amount} rejected for {self.user.mention}.", view=None)
-        await self.user.send(f"❌ Your withdrawal of ${self.amount} has been **rejected**.")
-
 @bot.tree.command(name="withdraw", description="Submit a withdrawal request")
 @app_commands.describe(amount="Amount to withdraw", ign="Your in-game name")
+@registered_only
 async def withdraw(interaction: discord.Interaction, amount: int, ign: str):
-    if not is_registered(interaction.user.id):
-        await interaction.response.send_message("🚫 You need to `/register` and accept the ToS before using this command.", ephemeral=True)
+    if amount <= 0:
+        await interaction.response.send_message("⚠️ Amount must be positive!", ephemeral=True)
         return
 
-    await interaction.response.defer(ephemeral=True)  # ✅ lets the bot "think" longer
-
-    if amount <= 0:
-        await interaction.followup.send("⚠️ Amount must be positive!", ephemeral=True)
+    if players.for_interaction(interaction).balance < amount:
+        await interaction.response.send_message("❌ You don't have enough Balance.", ephemeral=True)
         return
 
-    balance = get_balance(interaction.user.id)
+    request = staff_requests.add(WITHDRAWAL, interaction.user.id, amount, ign=ign)
+    outbox.post(STAFF_CHANNEL_ID, embed=request_embed(request), view=("staff_request", {"request_id": request["id"]}), priority=URGENT)
 
-    if balance < amount:
-        await interaction.followup.send("❌ You don't have enough Balance.", ephemeral=True)
-        return
+    await interaction.response.send_message("✅ Your withdrawal request has been submitted for review.", ephemeral=True)
 
-    embed = discord.Embed(title="🏦 Withdrawal Request", color=discord.Color.red())
-    embed.add_field(name="User", value=interaction.user.mention, inline=False)
-    embed.add_field(name="Amount", value=f"${amount}", inline=False)
-    embed.add_field(name="IGN", value=ign, inline=False)
+# Approve/Reject everything a /pending_requests listing matched
+class BulkRequestsView(discord.ui.View):
+    def __init__(self, staff_id, request_ids):
+        super().__init__(timeout=300)
+        self.staff_id = staff_id
+        self.request_ids = request_ids
+        self.approve_all.label = f"✅ Approve all ({len(request_ids)})"
+        self.reject_all.label = f"❌ Reject all ({len(request_ids)})"
 
-    staff_channel = interaction.guild.get_channel(STAFF_CHANNEL_ID)
-    await staff_channel.send(embed=embed, view=WithdrawalView(interaction.user, amount, ign))
+    async def handle(self, interaction, approve):
+        if interaction.user.id != self.staff_id:
+            await interaction.response.send_message("⚠️ Run /pending_requests yourself to handle these.", ephemeral=True)
+            return
 
-    await interaction.followup.send("✅ Your withdrawal request has been submitted for review.", ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
+        handled, skipped = await resolve_staff_requests(self.request_ids, approve, interaction.user.id)
+        lines = [f"{'✅ Approved' if approve else '❌ Rejected'} **{len(handled)}** request(s), "
+                 f"${sum(r['amount'] for r in handled)} in total."]
+        already = len(self.request_ids) - len(handled) - len(skipped)
+        if skipped:
+            lines.append(f"⚠️ {len(skipped)} withdrawal(s) skipped, not enough Balance: "
+                         + ", ".join(f"#{r['id']}" for r in skipped))
+        if already:
+            lines.append(f"ℹ️ {already} request(s) were already handled.")
+        await interaction.edit_original_response(content="\n".join(lines), embed=None, view=None)
+
+    @discord.ui.button(label="Approve all", style=discord.ButtonStyle.success)
+    async def approve_all(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.handle(interaction, True)
+
+    @discord.ui.button(label="Reject all", style=discord.ButtonStyle.danger)
+    async def reject_all(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.handle(interaction, False)
+
+def parse_request_ids(text):
+    return [int(part) for part in text.replace(",", " ").split()]
+
+# Staff command to list pending requests and handle all matching ones at once
+@app_commands.default_permissions(manage_guild=True)
+@bot.tree.command(name="pending_requests", description="Staff: list pending deposits/withdrawals and approve or reject them in bulk")
+@app_commands.describe(
+    kind="Only deposits or only withdrawals",
+    member="Only requests from this user",
+    ids="Only these request ids, e.g. 3, 7, 12",
+    min_amount="Only requests of at least this amount",
+    max_amount="Only requests of at most this amount"
+)
+@app_commands.choices(
+    kind=[
+        app_commands.Choice(name="Deposits", value=DEPOSIT),
+        app_commands.Choice(name="Withdrawals", value=WITHDRAWAL)
+    ]
+)
+async def pending_requests(interaction: discord.Interaction, kind: app_commands.Choice[str] = None,
+                           member: discord.Member = None, ids: str = None, min_amount: int = None, max_amount: int = None):
+    if not interaction.user.guild_permissions.manage_guild:
+        return await interaction.response.send_message("⛔ You don't have permission to do this.", ephemeral=True)
+
+    try:
+        id_filter = parse_request_ids(ids) if ids else None
+    except ValueError:
+        return await interaction.response.send_message("⚠️ Request ids must be numbers, e.g. `3, 7, 12`.", ephemeral=True)
+
+    matching = staff_requests.pending(kind=kind.value if kind else None, user_id=member.id if member else None,
+                                      ids=id_filter, min_amount=min_amount, max_amount=max_amount)
+    if not matching:
+        return await interaction.response.send_message("📭 No pending requests match.", ephemeral=True)
+
+    lines = [f"- {request_label(r)}" + (f" (IGN `{r['ign']}`)" if r.get("ign") else "") for r in matching[:STAFF_REQUESTS_LIST_SIZE]]
+    if len(matching) > STAFF_REQUESTS_LIST_SIZE:
+        lines.append(f"... and {len(matching) - STAFF_REQUESTS_LIST_SIZE} more")
+    embed = discord.Embed(title=f"📋 Pending Requests ({len(matching)})", description="\n".join(lines), color=discord.Color.blue())
+    embed.set_footer(text=f"Total: ${sum(r['amount'] for r in matching)}")
+    view = BulkRequestsView(interaction.user.id, [r["id"] for r in matching])
+    await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
 
 #Slots games
-EMOJIS = ["🍒", "🍋", "🍉", "⭐", "🔔", "🍇"]
+# Spin animation, frames are skipped when too many edits are going out at once
+slots_animator = Animator(render_spin_frames(SLOT_SYMBOLS), mode=SLOTS_ANIMATION)
+
+# Settle one spin and play the animation, respond shows the first frame
+async def play_slots(interaction, user, bet, multiplier, reservation, respond):
+    # Settle first, the animation only shows a result that is already final
+    spin = game_core.spin_slots(bet, multiplier)
+    await wallet.settle(reservation, spin.payout)
+    result_str = " | ".join(spin.details["reels"])
+
+    if spin.outcome == WIN:
+        winnings = spin.delta
+        log_transaction(user.id, f"Won in slots: +${winnings}", game="slots", bet=bet, delta=spin.delta)
+        message = f"🎉 You won! You got **{result_str}**\n💵 You earned **${winnings}** Redmont Dollars!"
+    else:
+        log_transaction(user.id, f"Lost in slots: -${bet}", game="slots", bet=bet, delta=spin.delta)
+        message = f"😢 You lost. You got **{result_str}**\nBetter luck next time!"
+
+    await slots_animator.play(respond, interaction.edit_original_response,
+                              content=message, view=SlotsView(user, bet, spin.details["next_multiplier"]))
+
 class SlotsView(discord.ui.View):
-    def __init__(self, user: discord.User, bet: int, multiplier: float, message: discord.Message):
+    def __init__(self, user: discord.User, bet: int, multiplier: float):
         super().__init__(timeout=60)
         self.user = user
         self.bet = bet
         self.multiplier = multiplier
-        self.message = message
 
     @discord.ui.button(label="Play Again", style=discord.ButtonStyle.primary)
     async def play_again(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -607,121 +820,65 @@ class SlotsView(discord.ui.View):
             await interaction.response.send_message("⚠️ This button isn't for you!", ephemeral=True)
             return
 
-        balance = get_balance(self.user.id)
-        if balance < self.bet:
+        try:
+            reservation = await wallet.reserve(self.user.id, self.bet)
+        except InsufficientFunds:
             await interaction.response.send_message("❌ Not enough Balance to play again.", ephemeral=True)
             return
 
-        await interaction.response.defer()  # Acknowledge button press
-
-        for _ in range(3):
-            spinning = " | ".join(random.choices(EMOJIS, k=3))
-            await self.message.edit(content=f"🎰 {spinning}")
-            await asyncio.sleep(0.4)
-
-        result = [random.choice(EMOJIS) for _ in range(3)]
-        result_str = " | ".join(result)
-
-        if result[0] == result[1] == result[2]:
-            winnings = int(self.bet * self.multiplier)
-            update_balance(self.user.id, winnings)
-            log_transaction(self.user.id, f"Won in slots: +${winnings}")
-            message = f"🎉 You won! You got **{result_str}**\n💵 You earned **${winnings}** Redmont Dollars!"
-            next_multiplier = 1.5
-        else:
-            update_balance(self.user.id, -self.bet)
-            log_transaction(self.user.id, f"Lost in slots: -${self.bet}")
-            message = f"😢 You lost. You got **{result_str}**\nBetter luck next time!"
-            next_multiplier = 2.0
-
-        await self.message.edit(content=message, view=SlotsView(self.user, self.bet, next_multiplier, self.message))
+        await play_slots(interaction, self.user, self.bet, self.multiplier, reservation, interaction.response.edit_message)
 
 @bot.tree.command(name="slots", description="Play the slot machine!")
 @app_commands.describe(bet="Amount to bet")
-async def slots(interaction: discord.Interaction, bet: int):
-    if not is_registered(interaction.user.id):
-        await interaction.response.send_message("🚫 You need to `/register` and accept the ToS before using this command.", ephemeral=True)
-        return
-
-    if bet <= 0 or bet > MAX_BET:
-        await interaction.response.send_message(f"❌ Invalid bet amount! \n Bet must be between 1 and ${MAX_BET}.", ephemeral=True)
-        return
-
-    balance = get_balance(interaction.user.id)
-    if balance < bet:
+@registered_only
+async def slots(interaction: discord.Interaction, bet: Bet):
+    try:
+        reservation = await wallet.reserve(interaction.user.id, bet)
+    except InsufficientFunds:
         await interaction.response.send_message("❌ You don't have enough Balance.", ephemeral=True)
         return
 
-    await interaction.response.send_message("🎰 Spinning...", ephemeral=True)
-    message = await interaction.original_response()
+    async def respond(**kwargs):
+        await interaction.response.send_message(ephemeral=True, **kwargs)
 
-    for _ in range(3):
-        spinning = " | ".join(random.choices(EMOJIS, k=3))
-        await message.edit(content=f"🎰 {spinning}")
-        await asyncio.sleep(0.4)
-
-    result = [random.choice(EMOJIS) for _ in range(3)]
-    result_str = " | ".join(result)
-
-    if result[0] == result[1] == result[2]:
-        winnings = bet * 2
-        update_balance(interaction.user.id, winnings)
-        log_transaction(interaction.user.id, f"Won in slots: +${winnings}")
-        msg_text = f"🎉 You won! You got **{result_str}**\n💵 You earned **${winnings}** Redmont Dollars!"
-        multiplier = 1.5
-    else:
-        update_balance(interaction.user.id, -bet)
-        log_transaction(interaction.user.id, f"Lost in slots: -${bet}")
-        msg_text = f"😢 You lost. You got **{result_str}**\nBetter luck next time!"
-        multiplier = 2.0
-
-    await message.edit(content=msg_text, view=SlotsView(interaction.user, bet, multiplier, message))
+    await play_slots(interaction, interaction.user, bet, SLOTS_MULTIPLIER, reservation, respond)
 
 
 #Rock Paper Scissors game
 class RPSButtons(discord.ui.View):
-    def __init__(self, user_id, bet):
-        super().__init__(timeout=900)
+    def __init__(self, user_id, bet, session_key):
+        super().__init__(timeout=SESSION_TTL)
         self.user_id = user_id
         self.bet = bet
-        self.play_ended = False
+        self.session_key = session_key
 
     async def play_rps(self, interaction: discord.Interaction, user_choice: str):
         if str(interaction.user.id) != self.user_id:
             await interaction.response.send_message("This isn't your game!", ephemeral=True)
             return
 
-        choices = ["🪨", "📄", "✂️"]
-        bot_choice = random.choice(choices)
-        outcome = self.determine_winner(user_choice, bot_choice)
-        result_message = f"You chose {user_choice} | Bot chose {bot_choice}\n"
+        session = sessions.close(self.session_key)  # None once played or timed out
+        if session is None:
+            await interaction.response.send_message("⚠️ This game is already over!", ephemeral=True)
+            return
+        throw = session.state.play(user_choice)
+        await wallet.settle(session.reservation, throw.payout)
 
-        if outcome == "win":
-            winnings = self.bet * 2
-            update_balance(self.user_id, winnings)
-            log_transaction(self.user_id, f"Won in RPS: +${winnings}")
+        result_message = f"You chose {user_choice} | Bot chose {throw.details['bot_choice']}\n"
+        if throw.outcome == WIN:
+            winnings = throw.payout
+            log_transaction(self.user_id, f"Won in RPS: +${winnings}", game="rps", bet=self.bet, delta=throw.delta)
             result_message += f"🎉 You won {winnings} Redmont Dollars!"
-        elif outcome == "lose":
-            log_transaction(self.user_id, f"Lost in RPS: -${self.bet}")
+        elif throw.outcome == LOSE:
+            log_transaction(self.user_id, f"Lost in RPS: -${self.bet}", game="rps", bet=self.bet, delta=throw.delta)
             result_message += f"😢 You lost {self.bet} Redmont Dollars!"
         else:
-            update_balance(self.user_id, self.bet)
-            log_transaction(self.user_id, f"Tie in RPS: ${self.bet}")
+            log_transaction(self.user_id, f"Tie in RPS: ${self.bet}", game="rps", bet=self.bet, delta=0)
             result_message += "🤝 It's a tie! Your bet has been returned."
 
         self.clear_items()
         self.add_item(PlayAgainButton(self.user_id, self.bet))
         await interaction.response.edit_message(content=result_message, view=self)
-        self.play_ended = True
-
-    def determine_winner(self, user, bot):
-        wins = {"🪨": "✂️", "📄": "🪨", "✂️": "📄"}
-        if user == bot:
-            return "tie"
-        elif wins[user] == bot:
-            return "win"
-        else:
-            return "lose"
 
     @discord.ui.button(label="🪨", style=discord.ButtonStyle.primary)
     async def rock(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -746,34 +903,30 @@ class PlayAgainButton(discord.ui.Button):
             await interaction.response.send_message("You can't restart someone else's game!", ephemeral=True)
             return
 
-        balance = get_balance(self.user_id)
-        if balance < self.bet:
+        try:
+            reservation = await wallet.reserve(self.user_id, self.bet)
+        except InsufficientFunds:
             await interaction.response.send_message("❌ You don't have enough Balance to play again.", ephemeral=True)
             return
 
-        update_balance(self.user_id, -self.bet)
-        view = RPSButtons(user_id=self.user_id, bet=self.bet)
+        session = await sessions.open("rps", self.user_id, reservation, game_core.RPSRound(self.bet))
+        view = RPSButtons(user_id=self.user_id, bet=self.bet, session_key=session.key)
         await interaction.response.edit_message(content="Let's play again!\nChoose your move:", view=view)
 
 @bot.tree.command(name="rps", description="Play Rock Paper Scissors and win Redmont Dollars!")
 @app_commands.describe(bet="Amount of Redmont Dollars to bet")
-async def rps(interaction: discord.Interaction, bet: int):
-    if not is_registered(interaction.user.id):
-        await interaction.response.send_message("🚫 You need to `/register` and accept the ToS before using this command.", ephemeral=True)
-        return
+@registered_only
+async def rps(interaction: discord.Interaction, bet: Bet):
     user_id = str(interaction.user.id)
-    balance = get_balance(user_id)
-
-    if bet <= 0 or bet > MAX_BET:
-        await interaction.response.send_message(f"❌ Invalid bet amount! \n Bet must be between 1 and ${MAX_BET}.", ephemeral=True)
-        return
 
-    if balance < bet:
+    try:
+        reservation = await wallet.reserve(user_id, bet)
+    except InsufficientFunds:
         await interaction.response.send_message("❌ You don't have enough Balance!", ephemeral=True)
         return
 
-    update_balance(user_id, -bet)
-    view = RPSButtons(user_id=user_id, bet=bet)
+    session = await sessions.open("rps", user_id, reservation, game_core.RPSRound(bet))
+    view = RPSButtons(user_id=user_id, bet=bet, session_key=session.key)
 
     await interaction.response.send_message(
         content="Let's play Rock Paper Scissors!\nChoose your move:",
@@ -783,68 +936,54 @@ async def rps(interaction: discord.Interaction, bet: int):
 
 
 
-#HighLow Game
-card_values = {
-    "2": 2, "3": 3, "4": 4, "5": 5, "6": 6,
-    "7": 7, "8": 8, "9": 9, "10": 10,
-    "J": 11, "Q": 12, "K": 13, "A": 1
-}
+# Abandoned RPS and HighLow games get their bet back
+def refund_on_timeout(game_name):
+    async def expire(session):
+        if await wallet.release(session.reservation):
+            log_transaction(session.user_id, f"{game_name} timed out, bet of ${session.reservation.amount} returned",
+                            game=game_name.lower())  # Void
+    return expire
 
-# Risk-based multipliers
-risk_based_pay_table = {
-    2: {"higher": 1.1, "lower": 10.7},
-    3: {"higher": 1.1, "lower": 5.3},
-    4: {"higher": 1.1, "lower": 3.5},
-    5: {"higher": 1.3, "lower": 2.6},
-    6: {"higher": 1.5, "lower": 2.1},
-    7: {"higher": 1.87, "lower": 1.87},
-    8: {"higher": 2.1, "lower": 1.5},
-    9: {"higher": 2.6, "lower": 1.3},
-    10: {"higher": 3.5, "lower": 1.1},
-    11: {"higher": 5.3, "lower": 1.1},
-    12: {"higher": 10.7, "lower": 1.1},
-}
+sessions.register_kind(
+    "rps",
+    lambda game: {"bet": game.bet},
+    lambda user_id, reservation, data: game_core.RPSRound(data["bet"]),
+    refund_on_timeout("RPS"),
+)
 
-def draw_card():
-    return random.choice(["2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q"])
 
+#HighLow Game
 class HighLowButtons(discord.ui.View):
-    def __init__(self, user_id, bet, current_card):
-        super().__init__(timeout=900)
+    def __init__(self, user_id, bet, current_card, session_key):
+        super().__init__(timeout=SESSION_TTL)
         self.user_id = user_id
         self.bet = bet
         self.current_card = current_card
+        self.session_key = session_key
 
     async def play_highlow(self, interaction, choice):
         if interaction.user.id != self.user_id:
             return await interaction.response.send_message("🚫 You can't play this game!", ephemeral=True)
 
-        new_card = draw_card()
-        old_val = card_values[str(self.current_card)]
-        new_val = card_values[str(new_card)]
-
-        if (choice == "higher" and new_val > old_val) or (choice == "lower" and new_val < old_val):
-            outcome = "win"
-            multiplier = risk_based_pay_table[old_val][choice]
-        elif (choice == "higher" and new_val == old_val) or (choice == "lower" and new_val == old_val):
-            outcome = "tie"
-            multiplier = 1
-        else:
-            outcome = "lose"
-            multiplier = 0
-        
-        winnings = int(self.bet * multiplier)
-
-        update_balance(self.user_id, winnings)
-        log_transaction(self.user_id, f"HighLow game: {outcome} | Bet: ${self.bet} | Winnings: ${winnings}")
+        session = sessions.close(self.session_key)  # None once guessed or timed out
+        if session is None:
+            return await interaction.response.send_message("⚠️ This game is already over!", ephemeral=True)
+        guess = session.state.guess(choice)
+        await wallet.settle(session.reservation, guess.payout)
+
+        outcome = guess.outcome
+        new_card = guess.details["new_card"]
+        winnings = guess.payout
+        log_transaction(self.user_id, f"HighLow game: {outcome} | Bet: ${self.bet} | Winnings: ${winnings}",
+                        game="highlow", bet=self.bet, delta=guess.delta)
         
-        if outcome == "win":
+        if outcome == WIN:
             msg = (
         f"🎴 Your card: `{self.current_card}`\n"
         f"🃏 New card: `{new_card}`\n"
         f"🎉 **You won!** \n You guessed correctly and earned **+${winnings}**! 🤑💰\n"
     )
-        elif outcome == "lose":
+        elif outcome == LOSE:
             msg = (
         f"🎴 Your card: `{self.current_card}`\n"
         f"🃏 New card: `{new_card}`\n"
@@ -878,72 +1017,276 @@ class HighLowPlayAgainView(discord.ui.View):
         if interaction.user.id != self.user_id:
             return await interaction.response.send_message("🚫 Only you can restart your game.", ephemeral=True)
 
-        balance = get_balance(self.user_id)
-        if self.bet > balance:
+        try:
+            reservation = await wallet.reserve(self.user_id, self.bet)
+        except InsufficientFunds:
             return await interaction.response.send_message("❌ You don't have enough balance to play again.", ephemeral=True)
 
-        update_balance(self.user_id, -self.bet)
-
-        card = draw_card()
-        view = HighLowButtons(self.user_id, self.bet, card)
+        game = game_core.HighLowRound(self.bet)
+        session = await sessions.open("highlow", self.user_id, reservation, game)
+        view = HighLowButtons(self.user_id, self.bet, game.current_card, session.key)
         await interaction.response.send_message(
-            content=f"🎴 Your card is `{card}`\nWill the next card be 🔼 higher or 🔽 lower?",
+            content=f"🎴 Your card is `{game.current_card}`\nWill the next card be 🔼 higher or 🔽 lower?",
             view=view,
             ephemeral=True
         )
 
 @bot.tree.command(name="highlow", description="Play High-Low card game!")
 @app_commands.describe(bet="How much you want to bet")
-async def highlow(interaction: discord.Interaction, bet: int):
-    if not is_registered(interaction.user.id):
-        await interaction.response.send_message("🚫 You need to `/register` and accept the ToS before using this command.", ephemeral=True)
-        return
+@registered_only
+async def highlow(interaction: discord.Interaction, bet: Bet):
     user_id = interaction.user.id
-    balance = get_balance(user_id)
-
-    if bet <= 0 or bet > MAX_BET:
-        return await interaction.response.send_message(f"❌ Invalid bet amount! \n Bet must be between 1 and ${MAX_BET}.", ephemeral=True)
 
-    if bet > balance:
+    try:
+        reservation = await wallet.reserve(user_id, bet)
+    except InsufficientFunds:
         return await interaction.response.send_message("❌ You don't have enough balance to bet that amount.", ephemeral=True)
 
-    update_balance(user_id, -bet)
-
-    card = draw_card()
-    view = HighLowButtons(user_id, bet, card)
+    game = game_core.HighLowRound(bet)
+    session = await sessions.open("highlow", user_id, reservation, game)
+    view = HighLowButtons(user_id, bet, game.current_card, session.key)
 
     await interaction.response.send_message(
-        content=f"🎴 Your card is `{card}`\nWill the next card be 🔼 higher or 🔽 lower?",
+        content=f"🎴 Your card is `{game.current_card}`\nWill the next card be 🔼 higher or 🔽 lower?",
         view=view,
         ephemeral=True
     )
 
 
-# Command to view last 10 transactions
+sessions.register_kind(
+    "highlow",
+    lambda game: {"bet": game.bet, "card": game.current_card},
+    lambda user_id, reservation, data: game_core.HighLowRound(data["bet"], card=data["card"]),
+    refund_on_timeout("HighLow"),
+)
+
+
+# Transaction history pages
+def format_transaction(record):
+    return f"- `{record.ts[:16]}` {record.description}"
+
+def build_transactions_embed(records, page, total):
+    last_page = max((total - 1) // TRANSACTIONS_PAGE_SIZE, 0)
+    embed = discord.Embed(
+        title="🧾 Recent Transactions" if page == 0 else "🧾 Transaction History",
+        description="\n".join(format_transaction(r) for r in records) or "📭 Nothing on this page.",
+        color=discord.Color.blue()
+    )
+    embed.set_footer(text=f"Page {page + 1}/{last_page + 1} · {total} transactions")
+    return embed
+
+class TransactionsView(discord.ui.View):
+    def __init__(self, user_id, page=0):
+        super().__init__(timeout=120)
+        self.user_id = str(user_id)
+        self.page = page
+        self.update_buttons()
+
+    def update_buttons(self):
+        total = storage.transaction_count(self.user_id)
+        self.newer.disabled = self.page == 0
+        self.older.disabled = (self.page + 1) * TRANSACTIONS_PAGE_SIZE >= total
+
+    async def show_page(self, interaction: discord.Interaction, page):
+        if str(interaction.user.id) != self.user_id:
+            await interaction.response.send_message("⚠️ These aren't your transactions!", ephemeral=True)
+            return
+
+        self.page = page
+        self.update_buttons()
+        records = await storage.transaction_page(self.user_id, page, TRANSACTIONS_PAGE_SIZE)
+        embed = build_transactions_embed(records, page, storage.transaction_count(self.user_id))
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="◀ Newer", style=discord.ButtonStyle.secondary)
+    async def newer(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.page - 1)
+
+    @discord.ui.button(label="Older ▶", style=discord.ButtonStyle.secondary)
+    async def older(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.page + 1)
+
+# Command to view recent transactions
 @bot.tree.command(name="transactions", description="View your recent transactions")
+@registered_only
 async def view_transactions(interaction: discord.Interaction):
-    if not is_registered(interaction.user.id):
-        await interaction.response.send_message("🚫 You need to `/register` and accept the ToS before using this command.", ephemeral=True)
-        return
     user_id = str(interaction.user.id)
 
-    # Load transaction history
-    with open("transactions.json", "r") as f:
-        transactions = json.load(f)
-
-    user_transactions = transactions.get(user_id, [])
-
-    if not user_transactions:
+    total = storage.transaction_count(user_id)
+    if not total:
         await interaction.response.send_message("📭 You don't have any transactions yet.", ephemeral=True)
         return
 
-    # Show the 10 most recent transactions
-    recent = user_transactions[-10:][::-1]  # Last 10, newest first
-    description = "\n".join(f"- {t}" for t in recent)
+    # Newest page is always in memory, no disk access here
+    records = storage.recent_transactions.page(user_id, 0, TRANSACTIONS_PAGE_SIZE)
+    embed = build_transactions_embed(records, 0, total)
+    await interaction.response.send_message(embed=embed, view=TransactionsView(user_id), ephemeral=True)
+
+# Leaderboard
+LEADERBOARD_GAME_NAMES = {
+    ALL_GAMES: "All games", "roll_dice": "Dice", "coinflip": "Coinflip", "slots": "Slots",
+    "blackjack": "Blackjack", "rps": "Rock Paper Scissors", "highlow": "High-Low", "lottery": "Lottery",
+}
+LEADERBOARD_MEDALS = {1: "🥇", 2: "🥈", 3: "🥉"}
+
+def render_leaderboard_page(entries):
+    if not entries:
+        return "Nobody has played yet."
+    return "\n".join(f"{LEADERBOARD_MEDALS.get(rank, f'`#{rank}`')} <@{user_id}> {'+' if score > 0 else '-' if score < 0 else ''}${abs(score)}"
+                     for rank, user_id, score in entries)
+
+def build_leaderboard_embed(game, window, page, user_id):
+    board = leaderboard.board(game, window)
+    title = f"🏆 Leaderboard: {LEADERBOARD_GAME_NAMES[game]}{' (this week)' if window == WEEK else ''}"
+    embed = discord.Embed(title=title, description=board.rendered_page(page, render_leaderboard_page),
+                          color=discord.Color.gold())
+    rank = board.rank(user_id)
+    you = f"You are #{rank} of {len(board)}" if rank else "You're not on this board yet"
+    embed.set_footer(text=f"Page {page + 1}/{board.pages()} • {you}")
+    return embed
+
+class LeaderboardView(discord.ui.View):
+    def __init__(self, user_id, game, window, page=0):
+        super().__init__(timeout=120)
+        self.user_id = str(user_id)
+        self.game = game
+        self.window = window
+        self.page = page
+        self.update_buttons()
+
+    def update_buttons(self):
+        self.previous.disabled = self.page == 0
+        self.next.disabled = self.page + 1 >= leaderboard.board(self.game, self.window).pages()
+
+    async def show_page(self, interaction: discord.Interaction, page):
+        if str(interaction.user.id) != self.user_id:
+            await interaction.response.send_message("⚠️ This isn't your leaderboard! Use /leaderboard to browse your own.", ephemeral=True)
+            return
+
+        self.page = min(page, leaderboard.board(self.game, self.window).pages() - 1)
+        self.update_buttons()
+        embed = build_leaderboard_embed(self.game, self.window, self.page, interaction.user.id)
+        await interaction.response.edit_message(embed=embed, view=self)
 
-    embed = discord.Embed(title="🧾 Recent Transactions", description=description, color=discord.Color.blue())
+    @discord.ui.button(label="◀ Previous", style=discord.ButtonStyle.secondary)
+    async def previous(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.page - 1)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.page + 1)
+
+# Command to show the net winnings leaderboard
+@bot.tree.command(name="leaderboard", description="Top players by net winnings")
+@app_commands.describe(game="One game or all of them", window="All time or this week", page="Page to start on")
+@app_commands.choices(
+    game=[app_commands.Choice(name=name, value=value) for value, name in LEADERBOARD_GAME_NAMES.items()],
+    window=[
+        app_commands.Choice(name="All time", value=ALL_TIME),
+        app_commands.Choice(name="This week", value=WEEK)
+    ]
+)
+@registered_only
+async def show_leaderboard(interaction: discord.Interaction, game: app_commands.Choice[str] = None,
+                           window: app_commands.Choice[str] = None, page: int = 1):
+    game = game.value if game else ALL_GAMES
+    window = window.value if window else ALL_TIME
+    page = max(min(page, leaderboard.board(game, window).pages()), 1) - 1
+    embed = build_leaderboard_embed(game, window, page, interaction.user.id)
+    await interaction.response.send_message(embed=embed, view=LeaderboardView(interaction.user.id, game, window, page))
+
+# Command to show a player's game stats
+def format_money(amount, sign=False):
+    prefix = "-" if amount < 0 else "+" if sign and amount > 0 else ""
+    return f"{prefix}${abs(amount)}"
+
+def format_streak(streak):
+    if streak > 0:
+        return f"🔥 {streak} win(s)"
+    if streak < 0:
+        return f"🧊 {-streak} loss(es)"
+    return "—"
+
+@bot.tree.command(name="stats", description="Your game stats (wagered, won, lost, streaks)")
+@app_commands.describe(game="One game or all of them", member="Someone else's stats")
+@app_commands.choices(game=[app_commands.Choice(name=name, value=value) for value, name in LEADERBOARD_GAME_NAMES.items()])
+@registered_only
+async def show_stats(interaction: discord.Interaction, game: app_commands.Choice[str] = None, member: discord.Member = None):
+    user = member or interaction.user
+    game = game.value if game else ALL_GAMES
+    stats = player_stats.get(user.id, game)
+    if not stats["wagered"] and not stats["won"]:
+        who = "You haven't" if user.id == interaction.user.id else f"{user.display_name} hasn't"
+        return await interaction.response.send_message(f"📭 {who} played {LEADERBOARD_GAME_NAMES[game] if game != ALL_GAMES else 'any games'} yet.", ephemeral=True)
+
+    embed = discord.Embed(title=f"📊 {user.display_name}: {LEADERBOARD_GAME_NAMES[game]}", color=discord.Color.blurple())
+    embed.add_field(name="Rounds", value=str(stats["rounds"]))
+    embed.add_field(name="Wagered", value=format_money(stats["wagered"]))
+    embed.add_field(name="Net", value=format_money(stats["net"], sign=True))
+    embed.add_field(name="Won", value=format_money(stats["won"]))
+    embed.add_field(name="Lost", value=format_money(stats["lost"]))
+    embed.add_field(name="Biggest win", value=format_money(stats["biggest_win"]))
+    embed.add_field(name="Current streak", value=format_streak(stats["streak"]))
+    embed.add_field(name="Best win streak", value=str(stats["best_streak"]))
+    embed.add_field(name="Worst losing streak", value=str(stats["worst_streak"]))
+    if game == ALL_GAMES:
+        by_game = player_stats.net_by_game(user.id)
+        lines = [f"{LEADERBOARD_GAME_NAMES[g]}: {format_money(net, sign=True)}"
+                 for g, net in sorted(by_game.items(), key=lambda item: -item[1])]
+        embed.add_field(name="P&L per game", value="\n".join(lines), inline=False)
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
+# Admin command to see how the house is doing per game
+HOUSE_REPORT_MAX_PERIODS = 24
+
+@app_commands.default_permissions(administrator=True)
+@bot.tree.command(name="house_report", description="Admins can see handle, payouts and house net per game over time.")
+@app_commands.describe(
+    resolution="Size of each period",
+    game="One game or all of them",
+    periods=f"Number of recent periods to show (up to {HOUSE_REPORT_MAX_PERIODS})",
+    export_csv="Also attach every kept period of this resolution as CSV"
+)
+@app_commands.choices(
+    resolution=[
+        app_commands.Choice(name="Minutes", value=MINUTE),
+        app_commands.Choice(name="Hours", value=HOUR),
+        app_commands.Choice(name="Days", value=DAY)
+    ],
+    game=[app_commands.Choice(name=name, value=value) for value, name in LEADERBOARD_GAME_NAMES.items()]
+)
+async def house_report(interaction: discord.Interaction, resolution: app_commands.Choice[str] = None,
+                       game: app_commands.Choice[str] = None, periods: int = 12, export_csv: bool = False):
+    if not interaction.user.guild_permissions.administrator:
+        return await interaction.response.send_message("🚫 You must be an admin to use this command.", ephemeral=True)
+
+    resolution = resolution.value if resolution else HOUR
+    game = game.value if game else ALL_GAMES
+    periods = max(min(periods, HOUSE_REPORT_MAX_PERIODS), 1)
+    if not house_stats.has_data(resolution):
+        return await interaction.response.send_message("📭 No games have been played since the house report started.", ephemeral=True)
+
+    series = house_stats.series(resolution, game, periods)
+    handle = sum(row[HANDLE] for _, row in series)
+    payouts = sum(row[PAYOUTS] for _, row in series)
+    lines = [f"`{label}` {format_money(row[HANDLE])} in, {format_money(row[PAYOUTS])} out, "
+             f"net {format_money(row[HANDLE] - row[PAYOUTS], sign=True)}, {row[PLAYERS]} player(s)"
+             for label, row in series]
+    embed = discord.Embed(title=f"🏦 House report: {LEADERBOARD_GAME_NAMES[game]}, last {periods} {resolution}(s)",
+                          description="\n".join(lines), color=discord.Color.dark_green())
+    embed.add_field(name="Handle", value=format_money(handle))
+    embed.add_field(name="Payouts", value=format_money(payouts))
+    embed.add_field(name="House net", value=format_money(handle - payouts, sign=True))
+    embed.add_field(name="Rounds", value=str(sum(row[ROUNDS] for _, row in series)))
+    embed.add_field(name="House edge", value=f"{(handle - payouts) / handle:.2%}" if handle else "—")
+    embed.add_field(name="Lottery pot", value=format_money(house_stats.pot(resolution, series[-1][0])))
+
+    if export_csv:
+        file = discord.File(io.BytesIO(house_stats.to_csv(resolution).encode()), filename=f"house_report_{resolution}.csv")
+        await interaction.response.send_message(embed=embed, file=file, ephemeral=True)
+    else:
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
 # Registeration of users
 class ToSView(discord.ui.View):
     def __init__(self, user_id):
@@ -956,9 +1299,7 @@ class ToSView(discord.ui.View):
             await interaction.response.send_message("⚠️ This isn't your registration session.", ephemeral=True)
             return
 
-        if str(self.user_id) not in registered_users:
-            registered_users.append(str(self.user_id))
-            save_registered_users(registered_users)
+        players.register(self.user_id)
 
         await interaction.response.edit_message(content="🎉 You are now registered and can use the casino!", view=None)
 @bot.tree.command(name="register", description="Register and accept ToS to use the casino")
@@ -978,27 +1319,23 @@ async def register(interaction: discord.Interaction):
 #Lottery - buy ticket
 @bot.tree.command(name="buy_ticket", description="Buy tickets for the Lottery! Per ticket costs $100")
 @app_commands.describe(quantity="Number of tickets to buy.")
+@registered_only
 async def buy_ticket(interaction: discord.Interaction, quantity: int):
-    if not is_registered(interaction.user.id):
-        await interaction.response.send_message("🚫 You must `/register` before buying a lottery ticket.", ephemeral=True)
-        return
-    
     if quantity <= 0:
         await interaction.response.send_message("Quantity must be at least 1")
         return
 
     user_id = str(interaction.user.id)
     total_cost = LOTTERY_TICKET_PRICE * quantity
-    if get_balance(user_id) < total_cost:
+    try:
+        await wallet.debit(user_id, total_cost)
+    except InsufficientFunds:
         await interaction.response.send_message("💸 You don't have enough Balance to buy {quantity} ticket!", ephemeral=True)
         return
 
-    update_balance(user_id, -total_cost)
-    for _ in range(quantity):
-        lottery_entries.append(user_id)
-    save_lottery_entries(lottery_entries)
+    storage.add_lottery_tickets(user_id, quantity)
 
-    log_transaction(user_id, f"Bought {quantity} lottery ticket(s) -${total_cost}")
+    log_transaction(user_id, f"Bought {quantity} lottery ticket(s) -${total_cost}", game="lottery", bet=total_cost, delta=-total_cost)
     await interaction.response.send_message(
         f"🎟️ You successfully bought **{quantity}** ticket(s)! Good luck!",
         ephemeral=True
@@ -1006,76 +1343,55 @@ async def buy_ticket(interaction: discord.Interaction, quantity: int):
 
 # Draw lottery funtion
 async def draw_lottery_winner():
-    if not lottery_entries:
+    if not lottery.total:
         print("No lottery entries this round.")
         return
 
-    winner_id = random.choice(lottery_entries)
-    total_pot = len(lottery_entries) * LOTTERY_TICKET_PRICE
-    prize = int(total_pot * 0.9)  # 90% to winner
+    # One winner per prize tier, a player can only win once per draw
+    winners = lottery.draw_winners(len(LOTTERY_PRIZE_TIERS))
+    total_pot = lottery.total * LOTTERY_TICKET_PRICE
+    prizes = [(winner_id, int(total_pot * share)) for winner_id, share in zip(winners, LOTTERY_PRIZE_TIERS)]
+    storage.clear_lottery()  # Reset entries before any await, tickets bought from now on are for the next draw
 
-    update_balance(winner_id, prize)
-    log_transaction(winner_id, f"🎰 Lottery win: +${prize}")
-    save_lottery_entries([])  # Reset entries
+    for place, (winner_id, prize) in enumerate(prizes, 1):
+        await wallet.credit(winner_id, prize)
+        log_transaction(winner_id, f"🎰 Lottery win (#{place}): +${prize}", game="lottery", delta=prize)
 
-    try:
-        user = await bot.fetch_user(int(winner_id))
-        await user.send(f"🎉 You won this week's Lottery and received **${prize}**!")
-        print(f"{user.name} has won ${prize} in the lottery!")
-    except Exception as e:
-        print("Error sending DM to winner:", e)
+    for place, (winner_id, prize) in enumerate(prizes, 1):
+        if len(prizes) == 1:
+            outbox.dm(winner_id, f"🎉 You won this week's Lottery and received **${prize}**!")
+        else:
+            outbox.dm(winner_id, f"🎉 You placed #{place} in this week's Lottery and received **${prize}**!")
+        print(f"{user_names.name(winner_id)} has won ${prize} in the lottery!")
 
     # Announce publicly in a channel
-    channel = bot.get_channel(LOTTERY_ANNOUNCE_CHANNEL_ID)
-    if channel:
-        await channel.send(f"🎉 Congratulations to <@{winner_id}> for winning this week's **Lottery** and taking home **${prize}**!")
+    if len(prizes) == 1:
+        winner_id, prize = prizes[0]
+        outbox.post(LOTTERY_ANNOUNCE_CHANNEL_ID, f"🎉 Congratulations to <@{winner_id}> for winning this week's **Lottery** and taking home **${prize}**!",
+                    priority=LOW)
     else:
-        print("❗ Lottery announcement channel not found.")
+        lines = [f"**#{place}** <@{winner_id}> takes home **${prize}**" for place, (winner_id, prize) in enumerate(prizes, 1)]
+        outbox.post(LOTTERY_ANNOUNCE_CHANNEL_ID, "🎉 Congratulations to this week's **Lottery** winners!\n" + "\n".join(lines), priority=LOW)
 
-# Auto Draw at midnight
-last_lottery_draw_date = None
-async def lottery_auto_draw():
-    await bot.wait_until_ready()
-    global last_lottery_draw_date
+# Weekly draw (DRAW_DAY at DRAW_HOUR:DRAW_MINUTE UTC), a draw missed while the bot was offline runs on startup
+async def scheduled_lottery_draw():
+    print("🎯 Running weekly lottery draw...")
+    await draw_lottery_winner()
 
-    while not bot.is_closed():
-        now = datetime.now(timezone.utc)
-
-        if (
-            now.weekday() == DRAW_DAY and
-            now.hour == DRAW_HOUR and
-            now.minute == DRAW_MINUTE and
-            last_lottery_draw_date != now.date()
-        ):
-            print("🎯 Running weekly lottery draw...")
-            await draw_lottery_winner()
-            last_lottery_draw_date = now.date()  # Mark this day as drawn
-            await asyncio.sleep(60)  # Prevent rerun during the same minute
-
-        await asyncio.sleep(30)  # Check every 30 seconds
+scheduler.add_job("lottery_draw", scheduled_lottery_draw, weekly(DRAW_DAY, DRAW_HOUR, DRAW_MINUTE))
 
 
 # Lottery Status command
-@bot.tree.command(name="lottery_status", description="Check current lottery entries")
-@app_commands.default_permissions(administrator=True)
-async def lottery_status(interaction: discord.Interaction):
-    if not lottery_entries:
-        await interaction.response.send_message("📭 No users have entered the lottery yet.", ephemeral=True)
-        return
-
-    unique_users = list(set(lottery_entries))
-    num_tickets = len(lottery_entries)
-    num_users = len(unique_users)
-
-    mentions = []
-    for uid in unique_users:
-        user = await bot.fetch_user(int(uid))
-        mentions.append(user.mention if user else f"`{uid}`")
+async def build_lottery_status_embed(participants, total_tickets, page):
+    last_page = max((len(participants) - 1) // LOTTERY_STATUS_PAGE_SIZE, 0)
+    shown = participants[page * LOTTERY_STATUS_PAGE_SIZE:(page + 1) * LOTTERY_STATUS_PAGE_SIZE]
+    names = await user_names.resolve_many([uid for uid, _ in shown])  # Only this page's users are looked up
 
+    lines = [f"- **{names[int(uid)]}** (<@{uid}>): {tickets} ticket(s)" for uid, tickets in shown]
     description = (
-        f"🎟️ **Total Tickets Sold:** {num_tickets}\n"
-        f"👥 **Unique Participants:** {num_users}\n"
-        f"📋 **Participants:**\n" + ", ".join(mentions)
+        f"🎟️ **Total Tickets Sold:** {total_tickets}\n"
+        f"👥 **Unique Participants:** {len(participants)}\n"
+        f"📋 **Participants:**\n" + "\n".join(lines)
     )
 
     embed = discord.Embed(
@@ -1083,9 +1399,58 @@ async def lottery_status(interaction: discord.Interaction):
         description=description,
         color=discord.Color.purple()
     )
+    embed.set_footer(text=f"Page {page + 1}/{last_page + 1}")
+    return embed
 
-    await interaction.response.send_message(embed=embed, ephemeral=True)
+class LotteryStatusView(discord.ui.View):
+    def __init__(self, user_id, participants, total_tickets):
+        super().__init__(timeout=120)
+        self.user_id = user_id
+        self.participants = participants  # Snapshot taken when the command ran
+        self.total_tickets = total_tickets
+        self.page = 0
+        self.update_buttons()
+
+    def update_buttons(self):
+        self.previous.disabled = self.page == 0
+        self.next.disabled = (self.page + 1) * LOTTERY_STATUS_PAGE_SIZE >= len(self.participants)
+
+    async def show_page(self, interaction: discord.Interaction, page):
+        if interaction.user.id != self.user_id:
+            await interaction.response.send_message("⚠️ This isn't your lottery status!", ephemeral=True)
+            return
+
+        await interaction.response.defer()  # Name lookups for a new page can take a moment
+        self.page = page
+        self.update_buttons()
+        embed = await build_lottery_status_embed(self.participants, self.total_tickets, page)
+        await interaction.edit_original_response(embed=embed, view=self)
+
+    @discord.ui.button(label="◀ Previous", style=discord.ButtonStyle.secondary)
+    async def previous(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.page - 1)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.page + 1)
+
+@bot.tree.command(name="lottery_status", description="Check current lottery entries")
+@app_commands.default_permissions(administrator=True)
+async def lottery_status(interaction: discord.Interaction):
+    if not lottery.total:
+        await interaction.response.send_message("📭 No users have entered the lottery yet.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True)
 
+    # Most tickets first
+    participants = sorted(lottery.counts.items(), key=lambda item: item[1], reverse=True)
+    embed = await build_lottery_status_embed(participants, lottery.total, 0)
+    view = LotteryStatusView(interaction.user.id, participants, lottery.total)
+    await interaction.followup.send(embed=embed, view=view, ephemeral=True)
 
-bot.run(BOT_KEY)
 
+# Importing the module (e.g. from benchmarks/loadtest.py) sets everything up without connecting
+startup.mark("imports")
+if __name__ == "__main__":
+    bot.run(BOT_KEY)
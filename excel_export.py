@@ -0,0 +1,125 @@
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+import xlsxwriter
+
+from persistence import FileLock
+from storage import TRANSACTION_INDEX_FILE, TRANSACTION_LOCK_FILE, TRANSACTION_ROWS_FILE, iter_stored_transactions, storage_backend
+from transaction_history import TIMESTAMP_FORMAT, TransactionRecord, prepend_records
+
+HEADER = ["Timestamp", "User ID", "Username", "Game", "Bet", "Change", "Balance After", "Reference", "Description"]
+
+
+# Parse a YYYY-MM-DD date, returns None for empty input
+def parse_date(value):
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+# Build the xlsx in one streaming pass, one sheet per month
+# constant_memory keeps only the current row in memory, so the history can be
+# any size. records is any iterable of TransactionRecord in time order,
+# start/end are dates, end is inclusive.
+def export_transactions(out_file, records, start=None, end=None):
+    if end is not None:
+        end = end + timedelta(days=1)
+
+    workbook = xlsxwriter.Workbook(out_file, {"constant_memory": True})
+    bold = workbook.add_format({"bold": True})
+    sheets = {}  # "YYYY-MM" -> [worksheet, next row]
+    count = 0
+
+    for record in records:
+        try:
+            timestamp = datetime.strptime(record.ts, TIMESTAMP_FORMAT)
+        except ValueError:
+            continue
+        if start and timestamp < start:
+            continue
+        if end and timestamp >= end:
+            continue
+
+        month = timestamp.strftime("%Y-%m")
+        if month not in sheets:
+            worksheet = workbook.add_worksheet(month)
+            worksheet.write_row(0, 0, HEADER, bold)
+            worksheet.set_column(0, 0, 20)
+            worksheet.set_column(1, 2, 22)
+            worksheet.set_column(3, 7, 12)
+            worksheet.set_column(8, 8, 50)
+            sheets[month] = [worksheet, 1]
+
+        worksheet, row_number = sheets[month]
+        worksheet.write_row(row_number, 0, [
+            record.ts, record.user_id, record.username, record.game, record.bet,
+            record.delta, record.balance_after, record.ref, record.description
+        ])
+        sheets[month][1] = row_number + 1
+        count += 1
+
+    if not sheets:
+        workbook.add_worksheet("Transactions").write_row(0, 0, HEADER, bold)
+
+    workbook.close()
+    return count
+
+
+def read_legacy_workbook(workbook):
+    for n, values in enumerate(workbook.active.iter_rows(min_row=2, values_only=True)):
+        if not values or values[0] is None:
+            continue
+        timestamp, user_id, username, description = (list(values) + [None] * 4)[:4]
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.strftime(TIMESTAMP_FORMAT)
+        yield TransactionRecord(str(timestamp), str(user_id), "legacy", 0, 0, 0, f"xlsx-{n}", description or "",
+                                username or "Unknown")
+
+
+# One-shot import of the old transaction_log.xlsx into the JSON row log
+# The rows are older than anything logged, so they go in front of the log like
+# the transactions.json migration. Refuses to run while the bot has the log open.
+def import_legacy_workbook(xlsx_file, rows_file=TRANSACTION_ROWS_FILE, index_file=TRANSACTION_INDEX_FILE,
+                           lock_file=TRANSACTION_LOCK_FILE):
+    import openpyxl  # Only needed for this one-off import
+
+    lock = FileLock(lock_file)
+    if not lock.acquire():
+        raise RuntimeError(f"{rows_file} is in use, stop the bot before importing")
+    try:
+        workbook = openpyxl.load_workbook(xlsx_file, read_only=True)
+        try:
+            return prepend_records(read_legacy_workbook(workbook), rows_file, index_file)
+        finally:
+            workbook.close()
+    finally:
+        lock.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the casino transaction log to Excel")
+    parser.add_argument("out_file", nargs="?", default="transaction_log.xlsx")
+    parser.add_argument("--backend", choices=["json", "sqlite", "mongo"], help="Storage to read from (default: STORAGE_BACKEND)")
+    parser.add_argument("--start", help="First day to include (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Last day to include (YYYY-MM-DD)")
+    parser.add_argument("--import-legacy", metavar="XLSX", help="Import an old transaction_log.xlsx in front of the JSON row log and exit (bot stopped)")
+    args = parser.parse_args()
+
+    if args.import_legacy:
+        if (args.backend or storage_backend()) != "json":
+            parser.error("--import-legacy only works with the json backend, import before migrating to a database")
+        try:
+            count = import_legacy_workbook(args.import_legacy)
+        except RuntimeError as e:
+            sys.exit(f"⚠️ {e}")
+        print(f"✅ Imported {count} rows from {args.import_legacy} into {TRANSACTION_ROWS_FILE}")
+        return
+
+    records = iter_stored_transactions(args.backend)
+    count = export_transactions(args.out_file, records, parse_date(args.start), parse_date(args.end))
+    print(f"✅ Exported {count} transactions to {args.out_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import random
+
+from paytables import (DICE_SIDES, DICE_MATCH_PAYOUT, COINFLIP_PAYOUT, SLOT_SYMBOLS, SLOTS_MULTIPLIER,
+                       SLOTS_MULTIPLIER_AFTER_WIN, SLOTS_MULTIPLIER_AFTER_LOSS, RPS_PAYOUTS, HIGHLOW_CARD_VALUES,
+                       HIGHLOW_DECK, HIGHLOW_TIE_PAYOUT, HIGHLOW_PAY_TABLE)
+
+# Game rules without Discord
+# Every game is a small state machine: it is created with the bet, takes the
+# player's action and returns a Settlement. The views in casino_bot.py only move
+# money (wallet reserve/settle), log and render what comes back, so the same
+# rounds can be played in batches, profiled or used by another frontend.
+# Blackjack has its own engine in blackjack.py.
+
+# Outcomes
+WIN = "win"
+LOSE = "lose"
+TIE = "tie"
+
+COINFLIP_SIDES = ["heads", "tails"]
+RPS_CHOICES = ["🪨", "📄", "✂️"]
+RPS_BEATS = {"🪨": "✂️", "📄": "🪨", "✂️": "📄"}  # choice -> what it beats
+HIGHLOW_CHOICES = ["higher", "lower"]
+
+
+class GameOver(Exception):
+    pass
+
+
+# Result of a finished round: payout is returned to the player, stake included
+class Settlement:
+    __slots__ = ("outcome", "bet", "payout", "details")
+
+    def __init__(self, outcome, bet, payout, **details):
+        self.outcome = outcome
+        self.bet = bet
+        self.payout = payout
+        self.details = details
+
+    @property
+    def delta(self):
+        return self.payout - self.bet
+
+    def __repr__(self):
+        return f"Settlement({self.outcome!r}, bet={self.bet}, payout={self.payout}, {self.details})"
+
+
+# Roll dice: both dice match
+def roll_dice(bet, rng=random):
+    user_roll = rng.randint(1, DICE_SIDES)
+    bot_roll = rng.randint(1, DICE_SIDES)
+    if user_roll == bot_roll:
+        return Settlement(WIN, bet, bet * DICE_MATCH_PAYOUT, user_roll=user_roll, bot_roll=bot_roll)
+    return Settlement(LOSE, bet, 0, user_roll=user_roll, bot_roll=bot_roll)
+
+
+def coinflip(bet, choice, rng=random):
+    choice = choice.lower()
+    if choice not in COINFLIP_SIDES:
+        raise ValueError(f"Unknown coinflip side {choice!r}")
+    result = rng.choice(COINFLIP_SIDES)
+    if result == choice:
+        return Settlement(WIN, bet, bet * COINFLIP_PAYOUT, result=result)
+    return Settlement(LOSE, bet, 0, result=result)
+
+
+# One slots spin: three of a kind pays bet * multiplier on top of the stake
+# details["next_multiplier"] is what "Play Again" pays next.
+def spin_slots(bet, multiplier=SLOTS_MULTIPLIER, rng=random):
+    reels = [rng.choice(SLOT_SYMBOLS) for _ in range(3)]
+    if reels[0] == reels[1] == reels[2]:
+        return Settlement(WIN, bet, bet + int(bet * multiplier), reels=reels,
+                          next_multiplier=SLOTS_MULTIPLIER_AFTER_WIN)
+    return Settlement(LOSE, bet, 0, reels=reels, next_multiplier=SLOTS_MULTIPLIER_AFTER_LOSS)
+
+
+def rps_winner(user, bot):
+    if user == bot:
+        return TIE
+    return WIN if RPS_BEATS[user] == bot else LOSE
+
+
+# Rock paper scissors, one throw per round
+class RPSRound:
+    def __init__(self, bet, rng=random):
+        self.bet = bet
+        self.rng = rng
+        self.settlement = None
+
+    @property
+    def finished(self):
+        return self.settlement is not None
+
+    def play(self, choice):
+        if self.finished:
+            raise GameOver()
+        if choice not in RPS_BEATS:
+            raise ValueError(f"Unknown RPS choice {choice!r}")
+        bot_choice = self.rng.choice(RPS_CHOICES)
+        outcome = rps_winner(choice, bot_choice)
+        self.settlement = Settlement(outcome, self.bet, self.bet * RPS_PAYOUTS[outcome],
+                                     choice=choice, bot_choice=bot_choice)
+        return self.settlement
+
+
+def draw_highlow_card(rng=random):
+    return rng.choice(HIGHLOW_DECK)
+
+
+# HighLow: a card is shown, the player guesses whether the next one is higher or lower
+class HighLowRound:
+    def __init__(self, bet, rng=random, card=None):
+        self.bet = bet
+        self.rng = rng
+        self.current_card = card or draw_highlow_card(rng)
+        self.settlement = None
+
+    @property
+    def finished(self):
+        return self.settlement is not None
+
+    def guess(self, choice):
+        if self.finished:
+            raise GameOver()
+        if choice not in HIGHLOW_CHOICES:
+            raise ValueError(f"Unknown HighLow choice {choice!r}")
+        new_card = draw_highlow_card(self.rng)
+        old_val = HIGHLOW_CARD_VALUES[self.current_card]
+        new_val = HIGHLOW_CARD_VALUES[new_card]
+
+        if new_val == old_val:
+            outcome, multiplier = TIE, HIGHLOW_TIE_PAYOUT
+        elif (new_val > old_val) == (choice == "higher"):
+            outcome, multiplier = WIN, HIGHLOW_PAY_TABLE[old_val][choice]
+        else:
+            outcome, multiplier = LOSE, 0
+
+        self.settlement = Settlement(outcome, self.bet, int(self.bet * multiplier),
+                                     card=self.current_card, new_card=new_card)
+        return self.settlement
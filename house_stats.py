@@ -0,0 +1,125 @@
+import csv
+import io
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from persistence import json_file_writer
+from transaction_history import TIMESTAMP_FORMAT
+
+HOUSE_STATS_FILE = "house_stats.json"
+HOUSE_GAMES = ("roll_dice", "coinflip", "slots", "blackjack", "rps", "highlow", "lottery")
+ALL_GAMES = "all"
+
+# Resolutions: bucket label length in a transaction timestamp ("YYYY-MM-DD HH:MM:SS")
+# and how many buckets are kept. Every resolution is counted straight from the
+# results, so older minutes can be dropped while their hours and days stay.
+MINUTE = "minute"
+HOUR = "hour"
+DAY = "day"
+RESOLUTIONS = {
+    MINUTE: (16, 6 * 60),  # 6 hours
+    HOUR: (13, 14 * 24),  # 2 weeks
+    DAY: (10, 2 * 365),  # 2 years
+}
+RESOLUTION_STEPS = {MINUTE: timedelta(minutes=1), HOUR: timedelta(hours=1), DAY: timedelta(days=1)}
+
+# One row per game per bucket
+ROW_FIELDS = ("handle", "payouts", "rounds", "players")
+HANDLE, PAYOUTS, ROUNDS, PLAYERS = range(len(ROW_FIELDS))
+
+
+# House totals per game in minute, hour and day buckets
+# Fed with every game result as it is logged, so reports never rescan the
+# transaction history. Handle is what players bet, payouts what went back to
+# them (stake included), the house net is the difference. Unique players are
+# counted with a set for the newest bucket of each resolution only, older
+# buckets just keep the count.
+class HouseStats:
+    def __init__(self, saver, file_path=HOUSE_STATS_FILE, games=HOUSE_GAMES, resolutions=RESOLUTIONS):
+        self.saver = saver
+        self.file_path = file_path
+        self.games = games
+        self.resolutions = resolutions
+        self.buckets = {r: OrderedDict() for r in resolutions}  # resolution -> label -> {"games": {game: row}, "pot": int}
+        self._players = {r: {} for r in resolutions}  # resolution -> {game: set of user ids} of the newest bucket
+        saver.register(file_path, json_file_writer(file_path, self._dump, indent=None))
+
+    def _dump(self):
+        return {
+            "buckets": self.buckets,
+            "players": {r: {game: sorted(ids) for game, ids in players.items()} for r, players in self._players.items()},
+        }
+
+    def load(self):
+        try:
+            if os.path.exists(self.file_path) and os.path.getsize(self.file_path) > 0:
+                with open(self.file_path, "r") as f:
+                    data = json.load(f)
+                for r in self.resolutions:
+                    self.buckets[r] = OrderedDict(data["buckets"].get(r, {}))
+                    self._players[r] = {game: set(ids) for game, ids in data["players"].get(r, {}).items()}
+        except json.JSONDecodeError:
+            print(f"⚠️ Error loading {self.file_path}. House report history starts from now.")
+
+    # Count one transaction, pot is the lottery pot right after it
+    # Voided rounds (bets refunded on timeout) took nothing and paid nothing, so they're skipped
+    def add(self, record, pot=0):
+        if record.game not in self.games or record.void:
+            return
+        for r, (length, keep) in self.resolutions.items():
+            label = record.ts[:length]
+            buckets = self.buckets[r]
+            bucket = buckets.get(label)
+            if bucket is None:
+                bucket = buckets[label] = {"games": {}, "pot": pot}
+                self._players[r] = {}  # A new bucket, the previous one keeps its counts
+                while len(buckets) > keep:
+                    buckets.popitem(last=False)
+            bucket["pot"] = pot
+
+            for game in (ALL_GAMES, record.game):
+                row = bucket["games"].get(game)
+                if row is None:
+                    row = bucket["games"][game] = [0] * len(ROW_FIELDS)
+                row[HANDLE] += record.bet
+                row[PAYOUTS] += record.bet + record.delta
+                if record.bet:
+                    row[ROUNDS] += 1
+                players = self._players[r].setdefault(game, set())
+                if record.user_id not in players:
+                    players.add(record.user_id)
+                    row[PLAYERS] += 1
+        self.saver.mark_dirty(self.file_path)
+
+    # [(label, row)] of the last `count` periods of one game up to the current one, oldest first
+    # Buckets only exist for periods something was played in, the others get zero rows.
+    def series(self, resolution, game=ALL_GAMES, count=1, now=None):
+        length = self.resolutions[resolution][0]
+        now = now or datetime.now()
+        labels = [(now - RESOLUTION_STEPS[resolution] * i).strftime(TIMESTAMP_FORMAT)[:length] for i in range(count - 1, -1, -1)]
+        buckets = self.buckets[resolution]
+        empty = [0] * len(ROW_FIELDS)
+        return [(label, buckets[label]["games"].get(game, empty) if label in buckets else empty) for label in labels]
+
+    def has_data(self, resolution):
+        return bool(self.buckets[resolution])
+
+    # Lottery pot at the end of a period, carried over from the last one with a bucket
+    def pot(self, resolution, label):
+        for bucket_label, bucket in reversed(self.buckets[resolution].items()):
+            if bucket_label <= label:
+                return bucket["pot"]
+        return 0
+
+    # Every kept bucket of one resolution as CSV, one line per bucket and game
+    def to_csv(self, resolution):
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(["bucket", "game", "handle", "payouts", "net", "rounds", "unique_players", "lottery_pot"])
+        for label, bucket in self.buckets[resolution].items():
+            for game, row in bucket["games"].items():
+                writer.writerow([label, game, row[HANDLE], row[PAYOUTS], row[HANDLE] - row[PAYOUTS],
+                                 row[ROUNDS], row[PLAYERS], bucket["pot"]])
+        return out.getvalue()
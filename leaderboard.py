@@ -0,0 +1,158 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+from sortedcontainers import SortedList
+
+from persistence import json_file_writer
+from transaction_history import TIMESTAMP_FORMAT
+
+LEADERBOARD_WEEK_FILE = "leaderboard_week.json"
+LEADERBOARD_PAGE_SIZE = 10
+LEADERBOARD_GAMES = ("roll_dice", "coinflip", "slots", "blackjack", "rps", "highlow", "lottery")
+ALL_GAMES = "all"
+
+# Windows
+ALL_TIME = "all"
+WEEK = "week"  # Monday 00:00 to the next Monday, bot local time like transaction timestamps
+
+
+def week_start(ts):
+    day = ts.date() - timedelta(days=ts.weekday())
+    return day.isoformat()
+
+
+# Net winnings of every player on one board, kept sorted by score
+# Each update is a remove and an insert in a SortedList (O(log n)), so ranks
+# and pages never need a sort of all players. Rendered pages are cached and a
+# page is only thrown away when an update moves ranks inside it.
+class RankedIndex:
+    def __init__(self, page_size=LEADERBOARD_PAGE_SIZE, scores=None):
+        self.page_size = page_size
+        self.scores = dict(scores or {})  # user_id -> net winnings
+        self._ranked = SortedList((-score, user_id) for user_id, score in self.scores.items())  # Best first
+        self._pages = {}  # page -> rendered text
+
+    def __len__(self):
+        return len(self.scores)
+
+    def add(self, user_id, delta):
+        old = self.scores.get(user_id)
+        if old is None:
+            old_rank = len(self._ranked)  # New players come in at the bottom
+            score = delta
+        else:
+            old_rank = self._ranked.index((-old, user_id))
+            del self._ranked[old_rank]
+            score = old + delta
+        self.scores[user_id] = score
+        self._ranked.add((-score, user_id))
+        new_rank = self._ranked.index((-score, user_id))
+
+        # Everyone between the old and the new rank moved by one (or just the player's score changed)
+        first, last = min(old_rank, new_rank) // self.page_size, max(old_rank, new_rank) // self.page_size
+        for page in [p for p in self._pages if first <= p <= last]:
+            del self._pages[page]
+
+    # 1-based rank, None if the player isn't on the board
+    def rank(self, user_id):
+        user_id = str(user_id)
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return self._ranked.index((-score, user_id)) + 1
+
+    def pages(self):
+        return max((len(self._ranked) + self.page_size - 1) // self.page_size, 1)
+
+    # [(rank, user_id, score)] of one page
+    def page(self, page):
+        start = page * self.page_size
+        return [(start + i + 1, user_id, -score)
+                for i, (score, user_id) in enumerate(self._ranked[start:start + self.page_size])]
+
+    # Rendered page from the cache, render(entries) builds it on a miss
+    def rendered_page(self, page, render):
+        text = self._pages.get(page)
+        if text is None:
+            text = self._pages[page] = render(self.page(page))
+        return text
+
+
+# All-time and weekly boards, overall and per game
+# The ranked indexes are only built the first time a board is shown: all-time
+# scores come from player_stats (which already keeps net winnings per game) and
+# weekly ones from this week's totals in leaderboard_week.json. Until then an
+# update is one dict change, after that it also moves the player in the index.
+class Leaderboard:
+    def __init__(self, saver, player_stats, file_path=LEADERBOARD_WEEK_FILE, games=LEADERBOARD_GAMES,
+                 page_size=LEADERBOARD_PAGE_SIZE):
+        self.saver = saver
+        self.player_stats = player_stats
+        self.file_path = file_path
+        self.games = games
+        self.page_size = page_size
+        self.week = week_start(datetime.now())
+        self.week_scores = {game: {} for game in (ALL_GAMES,) + games}  # game -> {user_id: net} this week
+        self._boards = None  # (game, window) -> RankedIndex, once built
+        saver.register(file_path, json_file_writer(file_path, lambda: {"week": self.week, "scores": self.week_scores}, indent=None))
+
+    def load(self):
+        try:
+            if os.path.exists(self.file_path) and os.path.getsize(self.file_path) > 0:
+                with open(self.file_path, "r") as f:
+                    data = json.load(f)
+                if data["week"] == self.week:  # Last week's totals are dropped
+                    self.week_scores.update(data["scores"])
+        except json.JSONDecodeError:
+            print(f"⚠️ Error loading {self.file_path}. This week's leaderboard starts from zero.")
+
+    @property
+    def built(self):
+        return self._boards is not None
+
+    def _build(self):
+        self._boards = {}
+        for game in (ALL_GAMES,) + self.games:
+            self._boards[game, ALL_TIME] = RankedIndex(self.page_size, self.player_stats.net_by_player(game))
+            self._boards[game, WEEK] = RankedIndex(self.page_size, self.week_scores[game])
+
+    def _new_week(self, week):
+        self.week = week
+        for game in (ALL_GAMES,) + self.games:
+            self.week_scores[game] = {}
+            if self._boards is not None:
+                self._boards[game, WEEK] = RankedIndex(self.page_size)
+        self.saver.mark_dirty(self.file_path)
+
+    def _roll_week(self):
+        week = week_start(datetime.now())
+        if week != self.week:
+            self._new_week(week)
+
+    # Count one transaction, anything that isn't a game round is ignored
+    def add(self, record):
+        if record.game not in self.games or not record.delta:
+            return
+        try:
+            week = week_start(datetime.strptime(record.ts, TIMESTAMP_FORMAT))
+        except ValueError:
+            week = None
+        if week is not None and week > self.week:
+            self._new_week(week)
+        for game in (ALL_GAMES, record.game):
+            if self._boards is not None:
+                self._boards[game, ALL_TIME].add(record.user_id, record.delta)
+            if week == self.week:
+                scores = self.week_scores[game]
+                scores[record.user_id] = scores.get(record.user_id, 0) + record.delta
+                if self._boards is not None:
+                    self._boards[game, WEEK].add(record.user_id, record.delta)
+        if week == self.week:
+            self.saver.mark_dirty(self.file_path)
+
+    def board(self, game=ALL_GAMES, window=ALL_TIME):
+        self._roll_week()  # A quiet start of the week still shows an empty board
+        if self._boards is None:
+            self._build()
+        return self._boards[game, window]
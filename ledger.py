@@ -0,0 +1,128 @@
+import json
+import os
+
+from persistence import write_file_atomic
+
+# Number of ledger records between compacted snapshots
+LEDGER_SNAPSHOT_EVERY = 1000
+
+
+# Append-only balance ledger
+# Every balance change is one compact line in the ledger file. The snapshot file
+# holds the full balances dict plus the sequence number of the last record it
+# includes, so replay on start only applies records newer than the snapshot.
+class BalanceLedger:
+    def __init__(self, snapshot_file, ledger_file, legacy_file=None, snapshot_every=LEDGER_SNAPSHOT_EVERY):
+        self.snapshot_file = snapshot_file
+        self.ledger_file = ledger_file
+        self.legacy_file = legacy_file  # Old balances.json, only read if there is no snapshot yet
+        self.snapshot_every = snapshot_every
+        self.balances = {}
+        self.seq = 0
+        self.since_snapshot = 0
+        self._buffer = []  # Records not handed to a flush yet
+        self._inflight = []  # Records handed to a flush that hasn't finished
+        self._snapshot_requested = False
+
+    def _read_json(self, file_path):
+        try:
+            if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+                with open(file_path, "r") as f:
+                    data = json.load(f)
+                    if isinstance(data, dict):
+                        return data
+        except json.JSONDecodeError:
+            print(f"⚠️ Error loading {file_path}. Ignoring it.")
+        return None
+
+    def _load_snapshot(self):
+        snapshot = self._read_json(self.snapshot_file)
+        if snapshot is not None:
+            return dict(snapshot.get("balances", {})), snapshot.get("seq", 0)
+
+        # First start after switching to the ledger, import the old balances file
+        if self.legacy_file:
+            legacy = self._read_json(self.legacy_file)
+            if legacy is not None:
+                return legacy, 0
+        return {}, 0
+
+    # Load the last snapshot and replay the ledger tail on top of it
+    def load(self):
+        balances, seq = self._load_snapshot()
+        replayed = 0
+
+        if os.path.exists(self.ledger_file):
+            with open(self.ledger_file, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Torn last line from a crash mid-append
+                    if record["s"] <= seq:
+                        continue  # Already part of the snapshot
+                    balances[record["u"]] = balances.get(record["u"], 0) + record["d"]
+                    seq = record["s"]
+                    replayed += 1
+
+        self.balances = balances
+        self.seq = seq
+        self.since_snapshot = replayed
+
+        # Fold the replayed tail into a fresh snapshot so the ledger starts clean
+        if replayed or os.path.exists(self.ledger_file):
+            self.compact()
+        return self.balances
+
+    # Apply a balance change in memory and queue its ledger record
+    # The record is written by the next flush (see prepare_flush), not here
+    def apply(self, user_id, amount):
+        self.balances[user_id] = self.balances.get(user_id, 0) + amount
+        self.seq += 1
+        self._buffer.append(json.dumps({"s": self.seq, "u": user_id, "d": amount}, separators=(",", ":")) + "\n")
+        self.since_snapshot += 1
+        return self.balances[user_id]
+
+    def request_snapshot(self):
+        self._snapshot_requested = True
+
+    # Runs on the event loop: grabs the queued records (and a snapshot if one is due)
+    # and returns a blocking function that writes them
+    def prepare_flush(self):
+        if self.since_snapshot >= self.snapshot_every or self._snapshot_requested:
+            snapshot_text = json.dumps({"seq": self.seq, "balances": self.balances}, separators=(",", ":"))
+            self._buffer = []
+            self._inflight = []  # Everything up to seq is inside the snapshot
+            self.since_snapshot = 0
+            self._snapshot_requested = True  # Stays set until the write succeeded, so a failure retries it
+            return lambda: self._write_snapshot(snapshot_text)
+
+        # Keep records in flight until the write succeeded, a retried append is
+        # harmless because replay skips sequence numbers it has already applied
+        self._inflight.extend(self._buffer)
+        self._buffer = []
+        if not self._inflight:
+            return None
+        lines = "".join(self._inflight)
+        return lambda: self._append(lines)
+
+    def flush_done(self):
+        self._inflight = []
+        self._snapshot_requested = False
+
+    def _append(self, lines):
+        with open(self.ledger_file, "a") as f:
+            f.write(lines)
+
+    def _write_snapshot(self, snapshot_text):
+        write_file_atomic(self.snapshot_file, snapshot_text)
+        # Safe even if we crash before this line: records <= seq are skipped on replay
+        open(self.ledger_file, "w").close()
+
+    # Write a full snapshot and truncate the ledger right away (blocking)
+    def compact(self):
+        self._buffer = []
+        self._inflight = []
+        self._write_snapshot(json.dumps({"seq": self.seq, "balances": self.balances}, separators=(",", ":")))
+        self.since_snapshot = 0
+        self._snapshot_requested = False
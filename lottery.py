@@ -0,0 +1,92 @@
+import random
+
+
+# Lottery tickets stored as a ticket count per player
+# Every player has a slot in a Fenwick tree (binary indexed tree) of their
+# counts, so buying any number of tickets and drawing a winner both cost
+# O(log players), no matter how many tickets were sold.
+class LotteryTickets:
+    def __init__(self, counts=None):
+        self.clear()
+        for user_id, quantity in (counts or {}).items():
+            if quantity > 0:
+                self.add(user_id, quantity)
+
+    def clear(self):
+        self.counts = {}  # user_id -> tickets
+        self.total = 0
+        self._slots = {}  # user_id -> position in the tree (1-based)
+        self._players = [None]  # position -> user_id
+        self._tree = [0]
+
+    @classmethod
+    def from_entries(cls, entries):
+        # Old format: the user id repeated once per ticket
+        tickets = cls()
+        counts = {}
+        for user_id in entries:
+            counts[user_id] = counts.get(user_id, 0) + 1
+        for user_id, quantity in counts.items():
+            tickets.add(user_id, quantity)
+        return tickets
+
+    def _prefix(self, position):
+        total = 0
+        while position > 0:
+            total += self._tree[position]
+            position -= position & -position
+        return total
+
+    def _update(self, position, amount):
+        while position < len(self._tree):
+            self._tree[position] += amount
+            position += position & -position
+
+    def add(self, user_id, quantity):
+        position = self._slots.get(user_id)
+        if position is None:
+            # New slot at the end, its node covers (position - lowbit, position]
+            position = len(self._tree)
+            self._tree.append(self._prefix(position - 1) - self._prefix(position - (position & -position)))
+            self._players.append(user_id)
+            self._slots[user_id] = position
+        self._update(position, quantity)
+        self.counts[user_id] = self.counts.get(user_id, 0) + quantity
+        self.total += quantity
+
+    # Position of the ticket with the given number (0 <= number < total)
+    def _find(self, number):
+        position = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            next_position = position + step
+            if next_position < len(self._tree) and self._tree[next_position] <= number:
+                position = next_position
+                number -= self._tree[next_position]
+            step >>= 1
+        return position + 1
+
+    # One winner, every ticket has the same chance
+    def draw(self, rng=random):
+        if self.total <= 0:
+            return None
+        return self._players[self._find(rng.randrange(self.total))]
+
+    # Up to `count` different winners in draw order, weighted by tickets
+    # (sampling without replacement: a winner's tickets leave the draw)
+    def draw_winners(self, count, rng=random):
+        winners = []
+        removed = []
+        while len(winners) < count and self.total > 0:
+            position = self._find(rng.randrange(self.total))
+            user_id = self._players[position]
+            quantity = self.counts[user_id]
+            self._update(position, -quantity)
+            self.total -= quantity
+            removed.append((position, quantity))
+            winners.append(user_id)
+
+        for position, quantity in removed:  # Put the tickets back, drawing doesn't change the pot
+            self._update(position, quantity)
+            self.total += quantity
+        return winners
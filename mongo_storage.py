@@ -0,0 +1,252 @@
+import os
+import uuid
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, InsertOne, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from persistence import PERSIST_INTERVAL, PERSIST_MAX_PENDING
+from lottery import LotteryTickets
+from storage import Storage
+from transaction_history import TransactionRecord
+
+DEFAULT_MONGO_URI = "mongodb://localhost:27017"
+DEFAULT_MONGO_DB = "casino"
+APPLIED_OPS_KEPT = 50  # Flush ids remembered per balance/ticket document, so a resent $inc is skipped
+DUPLICATE_KEY = 11000
+FIRST_N_VERSION = (5, 2)  # $firstN in $group, keeps only N documents per group
+
+TRANSACTION_FIELDS = ("user_id", "ts", "game", "bet", "delta", "balance_after", "ref", "description", "username")
+
+
+def record_from_doc(doc):
+    return TransactionRecord(**{field: doc[field] for field in TRANSACTION_FIELDS})
+
+
+def record_to_doc(record):
+    return {field: getattr(record, field) for field in TRANSACTION_FIELDS}
+
+
+# $inc updates that can be sent again safely: the first step creates missing
+# documents, the second only applies to documents that don't list op_id yet.
+# Documents count their applied changes in n and only keep the newest
+# APPLIED_OPS_KEPT ids, so an id missing from ops only proves the change wasn't
+# applied while n is at most baseline (n before the first send) + APPLIED_OPS_KEPT.
+# Past that the update matches nothing instead of maybe applying twice.
+def idempotent_inc(field, amounts, op_id, baseline):
+    create = [UpdateOne({"_id": key}, {"$setOnInsert": {field: 0, "n": 0}}, upsert=True) for key in amounts]
+    apply = [UpdateOne({"_id": key, "ops": {"$ne": op_id}, "n": {"$not": {"$gt": baseline.get(key, 0) + APPLIED_OPS_KEPT}}},
+                       {"$inc": {field: amount, "n": 1}, "$push": {"ops": {"$each": [op_id], "$slice": -APPLIED_OPS_KEPT}}})
+             for key, amount in amounts.items()]
+    return create + apply
+
+
+# One balance or ticket step of a flush, kept until it went through
+class IncStep:
+    def __init__(self, field, amounts):
+        self.field = field
+        self.amounts = amounts
+        self.op_id = uuid.uuid4().hex
+        self.baseline = None  # {key: n} read right before the first send
+
+
+def connect(client=None):
+    if client is None:
+        client = MongoClient(os.getenv("MONGO_URI", DEFAULT_MONGO_URI))
+    return client[os.getenv("MONGO_DB", DEFAULT_MONGO_DB)]
+
+
+# Read every stored transaction in order, safe to use while the bot runs
+def iter_mongo_transactions(client=None):
+    for doc in connect(client).transactions.find({}, sort=[("ts", ASCENDING), ("_id", ASCENDING)]):
+        yield record_from_doc(doc)
+
+
+# MongoDB backend
+# Several bot processes can share one economy: balance and ticket changes are
+# sent as atomic $inc updates, so concurrent writers add up instead of
+# overwriting each other. Changes are queued and sent as a few bulk_write calls
+# per flush, and balances touched by a flush are re-read afterwards so this
+# process also sees what the others changed. A failed write (even a network
+# error that hides what the server applied) is sent again: every $inc carries
+# the id of its flush and is skipped by documents that already have it,
+# transactions have their _id set here so a resent insert is a duplicate key.
+# Documents only remember their last APPLIED_OPS_KEPT ids. If that many other
+# changes (from any process) reach a document while a step keeps failing, the
+# resend can't tell any more and leaves that document alone; it is logged so
+# the balance can be checked by hand.
+class MongoStorage(Storage):
+    def __init__(self, client=None, interval=PERSIST_INTERVAL, max_pending=PERSIST_MAX_PENDING):
+        super().__init__(interval, max_pending)
+        self.db = connect(client)  # Pass a mongomock.MongoClient() to run without a server
+        self.db.transactions.create_index([("user_id", ASCENDING), ("ts", DESCENDING), ("_id", DESCENDING)])
+        self.db.transactions.create_index([("ts", ASCENDING)])
+        self.transaction_counts = {}
+        self._reset_queue()
+        self._steps = []  # Bulk writes handed to the saver that haven't gone through yet
+        self._refreshed = {}
+        self.saver.register("mongo", self._prepare_flush, self._flush_done)
+
+    def _reset_queue(self):
+        self._balance_deltas = {}
+        self._transactions = []
+        self._users = []
+        self._tickets = {}
+        self._clear_tickets = False
+
+    def is_empty(self):
+        return (self.db.balances.estimated_document_count() == 0
+                and self.db.transactions.estimated_document_count() == 0
+                and self.db.registered_users.estimated_document_count() == 0)
+
+    def import_data(self, balances, records, registered_users, lottery_tickets):
+        if balances:
+            self.db.balances.bulk_write([UpdateOne({"_id": user_id}, {"$set": {"balance": balance}}, upsert=True)
+                                         for user_id, balance in balances.items()])
+        docs = [record_to_doc(record) for record in records]
+        if docs:
+            self.db.transactions.insert_many(docs)
+        if registered_users:
+            self.db.registered_users.bulk_write([UpdateOne({"_id": user_id}, {"$set": {"_id": user_id}}, upsert=True)
+                                                 for user_id in registered_users])
+        if lottery_tickets:
+            self.db.lottery_tickets.bulk_write([UpdateOne({"_id": user_id}, {"$inc": {"tickets": tickets}}, upsert=True)
+                                                for user_id, tickets in lottery_tickets.items()])
+
+    def load(self):
+        self.balances = {doc["_id"]: doc["balance"] for doc in self.db.balances.find()}
+        self.registered_users = {doc["_id"] for doc in self.db.registered_users.find()}
+        self.lottery = LotteryTickets({doc["_id"]: doc["tickets"] for doc in self.db.lottery_tickets.find()})
+
+        # Counts and the recent ring buffers of every user. Only the newest few
+        # documents per user are ever held: $firstN keeps N per group on servers
+        # that have it, older ones get one limited query per user on the
+        # (user_id, ts, _id) index. Never $push a whole history, a group document
+        # can't grow past 16 MB.
+        size = self.recent_transactions.size
+        self.transaction_counts = {}
+        if tuple(self.db.client.server_info()["versionArray"][:2]) >= FIRST_N_VERSION:
+            per_user = self.db.transactions.aggregate([
+                {"$sort": {"user_id": ASCENDING, "ts": DESCENDING, "_id": DESCENDING}},
+                {"$group": {"_id": "$user_id", "count": {"$sum": 1}, "recent": {"$firstN": {"input": "$$ROOT", "n": size}}}},
+            ], allowDiskUse=True)
+            recent = {}
+            for group in per_user:
+                self.transaction_counts[group["_id"]] = group["count"]
+                recent[group["_id"]] = group["recent"]
+        else:
+            counts = self.db.transactions.aggregate([{"$group": {"_id": "$user_id", "count": {"$sum": 1}}}], allowDiskUse=True)
+            self.transaction_counts = {group["_id"]: group["count"] for group in counts}
+            recent = {user_id: self.db.transactions.find({"user_id": user_id}, sort=[("ts", DESCENDING), ("_id", DESCENDING)],
+                                                          limit=size)
+                      for user_id in self.transaction_counts}
+        for docs in recent.values():
+            for doc in reversed(list(docs)):
+                self.recent_transactions.add(record_from_doc(doc))
+
+    def add_balance(self, user_id, amount):
+        self.balances[user_id] = self.balances.get(user_id, 0) + amount
+        self._balance_deltas[user_id] = self._balance_deltas.get(user_id, 0) + amount
+        self.saver.mark_dirty("mongo")
+        return self.balances[user_id]
+
+    def append_transaction(self, record):
+        self.recent_transactions.add(record)
+        self.transaction_counts[record.user_id] = self.transaction_counts.get(record.user_id, 0) + 1
+        self._transactions.append(InsertOne({"_id": ObjectId(), **record_to_doc(record)}))
+        self.saver.mark_dirty("mongo")
+
+    def transaction_count(self, user_id):
+        return self.transaction_counts.get(str(user_id), 0)
+
+    def _read_transactions(self, user_id, skip, limit):
+        docs = self.db.transactions.find({"user_id": user_id}, sort=[("ts", DESCENDING), ("_id", DESCENDING)],
+                                         skip=skip, limit=limit)
+        return [record_from_doc(doc) for doc in docs]
+
+    def iter_transactions(self):
+        return iter_mongo_transactions(self.db.client)
+
+    def add_registered_user(self, user_id):
+        self.registered_users.add(user_id)
+        self._users.append(UpdateOne({"_id": user_id}, {"$set": {"_id": user_id}}, upsert=True))
+        self.saver.mark_dirty("mongo")
+
+    def add_lottery_tickets(self, user_id, quantity):
+        self.lottery.add(user_id, quantity)
+        self._tickets[user_id] = self._tickets.get(user_id, 0) + quantity
+        self.saver.mark_dirty("mongo")
+
+    def clear_lottery(self):
+        self.lottery.clear()
+        self._tickets = {}
+        self._clear_tickets = True
+        self.saver.mark_dirty("mongo")
+
+    # Runs on the event loop: turns the queued changes into bulk writes for the worker thread
+    def _prepare_flush(self):
+        if self._clear_tickets:
+            self._steps.append(("clear_lottery", None))
+        if self._balance_deltas:
+            self._steps.append(("balances", IncStep("balance", self._balance_deltas)))
+        if self._transactions:
+            self._steps.append(("transactions", self._transactions))
+        if self._users:
+            self._steps.append(("registered_users", self._users))
+        if self._tickets:
+            self._steps.append(("lottery_tickets", IncStep("tickets", self._tickets)))
+        touched = list(self._balance_deltas)
+        self._reset_queue()
+
+        if not self._steps:
+            return None
+        return lambda: self._write(touched)
+
+    def _write(self, touched):
+        # Steps run in order and are dropped once they went through. A step that
+        # fails is sent again whole on the next flush, which is safe because
+        # every operation in it is idempotent (see idempotent_inc).
+        while self._steps:
+            collection, operations = self._steps[0]
+            if collection == "clear_lottery":
+                self.db.lottery_tickets.delete_many({})
+            elif collection == "transactions":
+                self._insert_transactions(operations)
+            elif isinstance(operations, IncStep):
+                self._send_inc(collection, operations)
+            else:
+                self.db[collection].bulk_write(operations, ordered=True)
+            self._steps.pop(0)
+
+        # Pick up what other processes did to the same players
+        self._refreshed = {doc["_id"]: doc["balance"] for doc in self.db.balances.find({"_id": {"$in": touched}})}
+
+    def _send_inc(self, collection, step):
+        keys = list(step.amounts)
+        resend = step.baseline is not None
+        if not resend:
+            step.baseline = {doc["_id"]: doc.get("n", 0) for doc in self.db[collection].find({"_id": {"$in": keys}}, {"n": 1})}
+        self.db[collection].bulk_write(idempotent_inc(step.field, step.amounts, step.op_id, step.baseline), ordered=True)
+        if resend:
+            for doc in self.db[collection].find({"_id": {"$in": keys}, "ops": {"$ne": step.op_id}}, {"_id": 1}):
+                print(f"⚠️ Can't tell if the {step.field} change of {step.amounts[doc['_id']]} for {doc['_id']} was saved, "
+                      f"over {APPLIED_OPS_KEPT} newer changes since the first try. Not resending it, check it by hand.")
+
+    def _insert_transactions(self, operations):
+        try:
+            self.db.transactions.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors"):
+                raise  # Not sure what was kept, resend all of them
+            # A duplicate key was inserted by an earlier try, anything else is retried
+            failed = [error["index"] for error in e.details.get("writeErrors", []) if error["code"] != DUPLICATE_KEY]
+            if failed:
+                self._steps[0] = ("transactions", [operations[i] for i in failed])
+                raise
+
+    # Runs on the loop once the write went through
+    def _flush_done(self):
+        for user_id, balance in self._refreshed.items():
+            # Changes queued while the write was running are not in the database yet
+            self.balances[user_id] = balance + self._balance_deltas.get(user_id, 0)
+        self._refreshed = {}
@@ -0,0 +1,211 @@
+import asyncio
+import heapq
+import json
+import os
+import time
+
+import discord
+
+from persistence import json_file_writer
+from ratelimit import TokenBucket
+
+OUTBOX_FILE = "outbox.json"
+OUTBOX_SENDS_PER_SECOND = 5  # Leaves most of Discord's request budget to interactions
+OUTBOX_CONCURRENCY = 5  # Messages sent at once
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_BASE = 2.0  # Seconds before the first retry, doubles every attempt
+OUTBOX_RETRY_MAX = 600.0
+
+# Priorities, lower goes first
+URGENT = 0  # Staff requests waiting on a human
+NORMAL = 1  # DMs about the player's own money
+LOW = 2  # Announcements
+
+
+# Durable outbound message queue for staff-channel posts and DMs
+# Handlers only queue a message and return. Pending messages are saved by the
+# storage saver, so a restart resends what wasn't delivered yet. A background
+# task sends them in priority order within a token bucket, retries failures with
+# exponential backoff and merges plain DMs to the same user into one message.
+# Views are saved by name and rebuilt from a factory registered with register_view().
+class Outbox:
+    def __init__(self, bot, saver, file_path=OUTBOX_FILE, rate=OUTBOX_SENDS_PER_SECOND, concurrency=OUTBOX_CONCURRENCY):
+        self.bot = bot
+        self.saver = saver
+        self.file_path = file_path
+        self.bucket = TokenBucket(rate)
+        self.concurrency = concurrency
+        self.entries = {}  # id -> entry dict, everything not delivered yet
+        self._views = {}
+        self._ready = []  # (priority, id) of entries that can go out now
+        self._waiting = []  # (retry time, id) of entries backing off
+        self._next_id = 1
+        self._wakeup = None
+        self._task = None
+        self._sending = None
+        saver.register(file_path, json_file_writer(file_path, lambda: list(self.entries.values()), indent=None))
+
+    def register_view(self, name, factory):
+        self._views[name] = factory
+
+    def load(self):
+        try:
+            if os.path.exists(self.file_path) and os.path.getsize(self.file_path) > 0:
+                with open(self.file_path, "r") as f:
+                    for entry in json.load(f):
+                        entry["retry_at"] = 0  # Monotonic times don't survive a restart
+                        self._add(entry)
+        except json.JSONDecodeError:
+            print(f"⚠️ Error loading {self.file_path}. Pending messages were lost.")
+        if self.entries:
+            self._next_id = max(self.entries) + 1
+            print(f"📬 {len(self.entries)} pending messages will be resent.")
+
+    def _add(self, entry):
+        self.entries[entry["id"]] = entry
+        heapq.heappush(self._ready, (entry["priority"], entry["id"]))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _queue(self, kind, target, content, embed, view, priority):
+        entry = {
+            "id": self._next_id,
+            "kind": kind,
+            "target": int(target),
+            "content": content,
+            "embed": embed.to_dict() if embed is not None else None,
+            "view": list(view) if view is not None else None,  # [factory name, kwargs]
+            "priority": priority,
+            "attempts": 0,
+            "retry_at": 0,
+        }
+        self._next_id += 1
+        self._add(entry)
+        self.saver.mark_dirty(self.file_path)
+        return entry["id"]
+
+    def dm(self, user_id, content=None, embed=None, priority=NORMAL):
+        return self._queue("dm", user_id, content, embed, None, priority)
+
+    # view is (name, kwargs) of a factory registered with register_view()
+    def post(self, channel_id, content=None, embed=None, view=None, priority=NORMAL):
+        return self._queue("channel", channel_id, content, embed, view, priority)
+
+    @property
+    def pending(self):
+        return len(self.entries)
+
+    # Start the sender task (safe to call more than once)
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self._task
+
+    def _take_batch(self):
+        now = time.monotonic()
+        while self._waiting and self._waiting[0][0] <= now:
+            _, entry_id = heapq.heappop(self._waiting)
+            if entry_id in self.entries:
+                heapq.heappush(self._ready, (self.entries[entry_id]["priority"], entry_id))
+
+        batch = []
+        merged = {}  # user_id -> first plain DM to them in this batch
+        while self._ready and len(batch) < self.concurrency:
+            _, entry_id = self._ready[0]
+            entry = self.entries.get(entry_id)
+            if entry is None:
+                heapq.heappop(self._ready)  # Already delivered as part of a merged DM
+                continue
+            plain_dm = entry["kind"] == "dm" and entry["embed"] is None
+            if plain_dm and entry["target"] in merged:
+                heapq.heappop(self._ready)
+                merged[entry["target"]].append(entry)  # Rides along, no extra request
+                continue
+            if not self.bucket.try_take():
+                break
+            heapq.heappop(self._ready)
+            group = [entry]
+            if plain_dm:
+                merged[entry["target"]] = group
+            batch.append(group)
+        return batch
+
+    async def _run(self):
+        await self.bot.wait_until_ready()  # Started from setup_hook, the channel cache fills in on ready
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                if self._ready:
+                    timeout = self.bucket.wait_time()
+                elif self._waiting:
+                    timeout = self._waiting[0][0] - time.monotonic()
+                else:
+                    timeout = None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            # Shielded so stop() lets messages that are already going out finish
+            self._sending = asyncio.ensure_future(asyncio.gather(*[self._deliver(group) for group in batch]))
+            await asyncio.shield(self._sending)
+            self._sending = None
+
+    async def _resolve_target(self, entry):
+        if entry["kind"] == "dm":
+            return self.bot.get_user(entry["target"]) or await self.bot.fetch_user(entry["target"])
+        return self.bot.get_channel(entry["target"]) or await self.bot.fetch_channel(entry["target"])
+
+    async def _deliver(self, group):
+        entry = group[0]
+        kwargs = {}
+        if entry["content"] is not None:
+            kwargs["content"] = "\n".join(e["content"] for e in group)
+        if entry["embed"] is not None:
+            kwargs["embed"] = discord.Embed.from_dict(entry["embed"])
+
+        try:
+            if entry["view"] is not None:
+                name, view_kwargs = entry["view"]
+                kwargs["view"] = self._views[name](**view_kwargs)  # An unknown view (e.g. saved by an older version) drops the message
+            target = await self._resolve_target(entry)
+            await target.send(**kwargs)
+        except (discord.Forbidden, discord.NotFound) as e:
+            # Closed DMs, a deleted user or a missing channel, retrying won't help
+            print(f"⚠️ Dropping {entry['kind']} message to {entry['target']}:", e)
+        except (discord.HTTPException, OSError, asyncio.TimeoutError) as e:
+            self._retry(group, e)
+            return
+        except Exception as e:
+            print(f"⚠️ Dropping {entry['kind']} message to {entry['target']}:", e)
+
+        for e in group:
+            self.entries.pop(e["id"], None)
+        self.saver.mark_dirty(self.file_path)
+
+    def _retry(self, group, error):
+        for entry in group:
+            entry["attempts"] += 1
+            if entry["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+                print(f"⚠️ Giving up on {entry['kind']} message to {entry['target']} after {entry['attempts']} attempts:", error)
+                self.entries.pop(entry["id"], None)
+                continue
+            delay = min(OUTBOX_RETRY_BASE * 2 ** (entry["attempts"] - 1), OUTBOX_RETRY_MAX)
+            entry["retry_at"] = time.monotonic() + delay
+            heapq.heappush(self._waiting, (entry["retry_at"], entry["id"]))
+        self.saver.mark_dirty(self.file_path)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._sending is not None:
+            await self._sending
+            self._sending = None
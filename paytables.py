@@ -0,0 +1,47 @@
+# Pay tables for every game, kept apart from the Discord code so the RTP
+# simulation (python -m simulation) checks exactly what the bot pays.
+# Payouts are multiples of the bet returned to the player, stake included.
+
+# Roll dice: both dice match
+DICE_SIDES = 6
+DICE_MATCH_PAYOUT = 2
+
+# Coinflip: called side comes up
+COINFLIP_PAYOUT = 2
+
+# Slots: three of a kind pays the stake back plus bet * multiplier
+SLOT_SYMBOLS = ["🍒", "🍋", "🍉", "⭐", "🔔", "🍇"]
+SLOTS_MULTIPLIER = 2  # First spin from /slots
+SLOTS_MULTIPLIER_AFTER_WIN = 1.5  # "Play Again" after a win
+SLOTS_MULTIPLIER_AFTER_LOSS = 2.0  # "Play Again" after a loss
+
+# Rock paper scissors
+RPS_PAYOUTS = {"win": 2, "tie": 1, "lose": 0}
+
+# HighLow: both cards are drawn from 2..Q, a tie returns the bet
+HIGHLOW_CARD_VALUES = {
+    "2": 2, "3": 3, "4": 4, "5": 5, "6": 6,
+    "7": 7, "8": 8, "9": 9, "10": 10,
+    "J": 11, "Q": 12, "K": 13, "A": 1
+}
+HIGHLOW_DECK = ["2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q"]
+HIGHLOW_TIE_PAYOUT = 1
+
+# Risk-based multipliers
+HIGHLOW_PAY_TABLE = {
+    2: {"higher": 1.1, "lower": 10.7},
+    3: {"higher": 1.1, "lower": 5.3},
+    4: {"higher": 1.1, "lower": 3.5},
+    5: {"higher": 1.3, "lower": 2.6},
+    6: {"higher": 1.5, "lower": 2.1},
+    7: {"higher": 1.87, "lower": 1.87},
+    8: {"higher": 2.1, "lower": 1.5},
+    9: {"higher": 2.6, "lower": 1.3},
+    10: {"higher": 3.5, "lower": 1.1},
+    11: {"higher": 5.3, "lower": 1.1},
+    12: {"higher": 10.7, "lower": 1.1},
+}
+
+# Lottery
+LOTTERY_TICKET_PRICE = 100
+LOTTERY_PRIZE_TIERS = [0.9]  # Share of the pot for 1st, 2nd, ... place, e.g. [0.5, 0.25, 0.15] for three winners
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows, file locks are skipped there
+    fcntl = None
+
+# Default flush settings, casino_bot.py passes its own values
+PERSIST_INTERVAL = 2.0  # Seconds between background flushes
+PERSIST_MAX_PENDING = 500  # Flush early once this many changes are waiting
+
+
+# Write a whole file atomically (temp file + rename) so a crash never leaves half a JSON file
+def write_file_atomic(file_path, text):
+    tmp_file = file_path + ".tmp"
+    with open(tmp_file, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, file_path)
+
+
+# Returns a prepare function for a JSON file that is rewritten as a whole
+def json_file_writer(file_path, get_data, indent=4):
+    def prepare():
+        text = json.dumps(get_data(), indent=indent)  # Serialize on the loop so the data can't change mid-dump
+        return lambda: write_file_atomic(file_path, text)
+    return prepare
+
+
+# Write-behind persistence engine
+# Command handlers only mark keys as dirty. A background task coalesces all
+# changes made since the last flush into one write per key and runs the
+# blocking file I/O in a worker thread, so the event loop never waits on disk.
+class WriteBehind:
+    def __init__(self, interval=PERSIST_INTERVAL, max_pending=PERSIST_MAX_PENDING):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._writers = {}
+        self._dirty = set()
+        self._pending = 0
+        self._wakeup = None
+        self._lock = None
+        self._task = None
+        self._stopping = False
+
+    # prepare() runs on the event loop and returns a blocking write function for the worker thread
+    # done() (optional) runs on the loop once that write succeeded
+    def register(self, key, prepare, done=None):
+        self._writers[key] = (prepare, done)
+
+    def mark_dirty(self, key):
+        self._dirty.add(key)
+        self._pending += 1
+        if self._pending >= self.max_pending and self._wakeup is not None:
+            self._wakeup.set()  # Too much waiting, don't wait for the timer
+
+    @property
+    def pending(self):
+        return self._pending
+
+    # Start the background flush task (safe to call more than once)
+    def start(self):
+        if self._task is None:
+            self._ensure_primitives()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self._task
+
+    def _ensure_primitives(self):
+        # Created lazily so they bind to the loop the bot is actually running on
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+            self._wakeup = asyncio.Event()
+
+    async def _run(self):
+        # wait_for() can swallow a cancel that lands together with the wakeup (before
+        # Python 3.12), so stop() also sets a flag the loop checks
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # Shielded so stop() can't cancel us halfway through a write running in the worker thread
+            await asyncio.shield(self.flush())
+
+    # Write everything that is dirty right now, returns once it is on disk
+    async def flush(self):
+        self._ensure_primitives()
+        async with self._lock:
+            dirty = self._dirty
+            self._dirty = set()
+            self._pending = 0
+
+            for key in dirty:
+                prepare, done = self._writers[key]
+                try:
+                    write = prepare()
+                    if write is not None:
+                        await asyncio.to_thread(write)
+                    if done is not None:
+                        done()
+                except Exception as e:
+                    print(f"⚠️ Failed to save {key}, will retry:", e)
+                    self._dirty.add(key)
+
+    async def stop(self):
+        if self._task is not None:
+            self._stopping = True
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._stopping = False
+        await self.flush()
+
+
+# Append-only line log that is written by the saver
+# Lines are queued in memory and appended in one write per flush. If a write
+# fails halfway, the file is cut back to where that write started so a retry
+# can't leave duplicated or torn lines behind.
+class AppendLog:
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._buffer = []
+        self._inflight = []
+
+    def append(self, line):
+        self._buffer.append(line + "\n")
+
+    def prepare(self):
+        self._inflight.extend(self._buffer)
+        self._buffer = []
+        if not self._inflight:
+            return None
+        text = "".join(self._inflight)
+        return lambda: self._write(text)
+
+    def done(self):
+        self._inflight = []
+
+    def _write(self, text):
+        data = memoryview(text.encode("utf-8"))
+        with open(self.file_path, "ab", buffering=0) as f:
+            start = f.seek(0, os.SEEK_END)
+            try:
+                while data:
+                    data = data[f.write(data):]
+            except Exception:
+                f.truncate(start)
+                raise
+
+
+# Advisory lock on a file, says "this process owns these files"
+# Taken with flock, so the OS drops it when the process dies and a crash never
+# leaves a stale lock behind. Offline tools check it before rewriting files the
+# bot has open.
+class FileLock:
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._file = None
+
+    # False if another process holds it
+    def acquire(self):
+        if self._file is not None:
+            return True
+        f = open(self.file_path, "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return False
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()  # Closing the file drops the lock
+            self._file = None
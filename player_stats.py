@@ -0,0 +1,170 @@
+import json
+import os
+
+from persistence import write_file_atomic
+
+PLAYER_STATS_FILE = "player_stats.json"
+PLAYER_STATS_LOG_FILE = "player_stats.jsonl"
+STATS_SNAPSHOT_EVERY = 5000  # Changed rows appended between full snapshots
+STATS_GAMES = ("roll_dice", "coinflip", "slots", "blackjack", "rps", "highlow", "lottery")
+# Tickets are wagered and lost when bought and the draw pays prizes later, so they
+# count in wagered/won/lost but aren't rounds and don't touch streaks
+NO_ROUND_GAMES = ("lottery",)
+ALL_GAMES = "all"
+
+# One row per player per game (plus an "all" row), stored as a plain list
+STAT_FIELDS = ("rounds", "wagered", "won", "lost", "biggest_win", "streak", "best_streak", "worst_streak")
+ROUNDS, WAGERED, WON, LOST, BIGGEST_WIN, STREAK, BEST_STREAK, WORST_STREAK = range(len(STAT_FIELDS))
+
+
+# A row as a dict, with net P&L added
+def describe(row):
+    stats = dict(zip(STAT_FIELDS, row or [0] * len(STAT_FIELDS)))
+    stats["net"] = stats["won"] - stats["lost"]
+    return stats
+
+
+def _count(row, bet, delta, is_round=True):
+    if delta > 0:
+        row[WON] += delta
+        row[BIGGEST_WIN] = max(row[BIGGEST_WIN], delta)
+    elif delta < 0:
+        row[LOST] -= delta
+    row[WAGERED] += bet
+    if not bet or not is_round:
+        return
+
+    row[ROUNDS] += 1
+    # streak > 0 is a winning streak, < 0 a losing one, pushes don't break it
+    if delta > 0:
+        row[STREAK] = row[STREAK] + 1 if row[STREAK] > 0 else 1
+        row[BEST_STREAK] = max(row[BEST_STREAK], row[STREAK])
+    elif delta < 0:
+        row[STREAK] = row[STREAK] - 1 if row[STREAK] < 0 else -1
+        row[WORST_STREAK] = max(row[WORST_STREAK], -row[STREAK])
+
+
+# Running per-player totals of every game round
+# Updated by log_transaction as results are recorded, so /stats reads a few
+# counters instead of the history. Saved like the balance ledger: each flush
+# appends the rows that changed as compact lines and every so often a full
+# snapshot replaces them. Rows hold totals, not deltas, so replaying a line
+# twice is harmless.
+class PlayerStats:
+    def __init__(self, saver, snapshot_file=PLAYER_STATS_FILE, log_file=PLAYER_STATS_LOG_FILE,
+                 games=STATS_GAMES, snapshot_every=STATS_SNAPSHOT_EVERY):
+        self.saver = saver
+        self.snapshot_file = snapshot_file
+        self.log_file = log_file
+        self.games = games
+        self.snapshot_every = snapshot_every
+        self.rows = {}  # user_id -> {game: row}
+        self.since_snapshot = 0
+        self._dirty = set()  # (user_id, game) rows changed since the last flush
+        self._inflight = set()
+        self._snapshot_requested = False
+        saver.register(log_file, self.prepare_flush, self.flush_done)
+
+    # Load the snapshot and the changed rows after it. history (a callable returning
+    # every transaction in order) is only used on the first start, to count old games.
+    def load(self, history=None):
+        counted = False
+        try:
+            if os.path.exists(self.snapshot_file) and os.path.getsize(self.snapshot_file) > 0:
+                with open(self.snapshot_file, "r") as f:
+                    self.rows = json.load(f)
+            elif history is not None:
+                for record in history():
+                    self.add(record, save=False)
+                counted = True
+                print(f"📊 Player stats counted from {len(self.rows)} players' history.")
+        except json.JSONDecodeError:
+            print(f"⚠️ Error loading {self.snapshot_file}. Player stats start from zero.")
+
+        if os.path.exists(self.log_file):
+            with open(self.log_file, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Torn last line from a crash mid-append
+                    self.rows.setdefault(entry["u"], {})[entry["g"]] = entry["r"]
+
+        # Fold the log into a fresh snapshot so it starts clean
+        if counted or os.path.exists(self.log_file):
+            self.compact()
+
+    # Count one transaction, anything that isn't a game result (or was voided) is ignored
+    def add(self, record, save=True):
+        if record.game not in self.games or record.void:
+            return
+        is_round = record.game not in NO_ROUND_GAMES
+        user_rows = self.rows.setdefault(record.user_id, {})
+        for game in (ALL_GAMES, record.game):
+            row = user_rows.get(game)
+            if row is None:
+                row = user_rows[game] = [0] * len(STAT_FIELDS)
+            _count(row, record.bet, record.delta, is_round)
+            if save:
+                self._dirty.add((record.user_id, game))
+        if save:
+            self.saver.mark_dirty(self.log_file)
+
+    # describe()d stats of one player for one game (or all games)
+    def get(self, user_id, game=ALL_GAMES):
+        return describe(self.rows.get(str(user_id), {}).get(game))
+
+    # {game: net} of the games a player has played
+    def net_by_game(self, user_id):
+        user_rows = self.rows.get(str(user_id), {})
+        return {game: row[WON] - row[LOST] for game, row in user_rows.items() if game != ALL_GAMES}
+
+    # {user_id: net} of everyone who played one game (or any game)
+    def net_by_player(self, game=ALL_GAMES):
+        net = {}
+        for user_id, user_rows in self.rows.items():
+            row = user_rows.get(game)
+            if row is not None:
+                net[user_id] = row[WON] - row[LOST]
+        return net
+
+    def prepare_flush(self):
+        if self.since_snapshot >= self.snapshot_every or self._snapshot_requested:
+            text = json.dumps(self.rows, separators=(",", ":"))
+            self._dirty = set()
+            self._inflight = set()  # Every row is inside the snapshot
+            self.since_snapshot = 0
+            self._snapshot_requested = True  # Stays set until the write succeeded, so a failure retries it
+            return lambda: self._write_snapshot(text)
+
+        self._inflight |= self._dirty
+        self._dirty = set()
+        if not self._inflight:
+            return None
+        rows = self.rows
+        lines = "".join(
+            json.dumps({"u": user_id, "g": game, "r": rows[user_id][game]}, separators=(",", ":")) + "\n"
+            for user_id, game in self._inflight
+        )
+        self.since_snapshot += len(self._inflight)
+        return lambda: self._append(lines)
+
+    def flush_done(self):
+        self._inflight = set()
+        self._snapshot_requested = False
+
+    def _append(self, lines):
+        with open(self.log_file, "a") as f:
+            f.write(lines)
+
+    def _write_snapshot(self, text):
+        write_file_atomic(self.snapshot_file, text)
+        open(self.log_file, "w").close()  # Every row in it is part of the snapshot now
+
+    # Write a full snapshot and empty the log right away (blocking)
+    def compact(self):
+        self._dirty = set()
+        self._inflight = set()
+        self._write_snapshot(json.dumps(self.rows, separators=(",", ":")))
+        self.since_snapshot = 0
+        self._snapshot_requested = False
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+
+import discord
+from discord import app_commands
+
+PROFILE_CACHE_SIZE = 10000  # Players kept in memory, least recently seen ones are dropped first
+
+
+class NotRegistered(app_commands.CheckFailure):
+    pass
+
+
+class InvalidBet(app_commands.AppCommandError):
+    def __init__(self, max_bet):
+        super().__init__(f"Bet must be between 1 and {max_bet}")
+        self.max_bet = max_bet
+
+
+# What a command needs to know about the player who used it
+# Built once per player and reused, the balance is read live from storage.
+class PlayerProfile:
+    __slots__ = ("user_id", "key", "registered", "max_bet", "_storage")
+
+    def __init__(self, storage, user_id, registered, max_bet):
+        self._storage = storage
+        self.user_id = user_id
+        self.key = str(user_id)  # Storage keys are strings
+        self.registered = registered
+        self.max_bet = max_bet
+
+    @property
+    def balance(self):
+        return self._storage.balances.get(self.key, 0)
+
+
+# Player profiles by Discord user id (one dict lookup per interaction)
+class PlayerCache:
+    def __init__(self, storage, max_bet, size=PROFILE_CACHE_SIZE):
+        self.storage = storage
+        self.max_bet = max_bet
+        self.size = size
+        self._profiles = OrderedDict()
+
+    def get(self, user_id):
+        user_id = int(user_id)
+        profile = self._profiles.get(user_id)
+        if profile is not None:
+            self._profiles.move_to_end(user_id)
+            return profile
+
+        profile = PlayerProfile(self.storage, user_id, str(user_id) in self.storage.registered_users, self.max_bet)
+        self._profiles[user_id] = profile
+        if len(self._profiles) > self.size:
+            self._profiles.popitem(last=False)
+        return profile
+
+    def register(self, user_id):
+        profile = self.get(user_id)
+        if not profile.registered:
+            self.storage.add_registered_user(profile.key)
+            profile.registered = True
+        return profile
+
+    # Profile for this interaction, resolved once and kept in interaction.extras
+    def for_interaction(self, interaction: discord.Interaction):
+        profile = interaction.extras.get("player")
+        if profile is None:
+            profile = interaction.extras["player"] = self.get(interaction.user.id)
+        return profile
+
+    # app_commands check: only registered players get past it
+    def registered_only(self):
+        async def predicate(interaction: discord.Interaction):
+            if not self.for_interaction(interaction).registered:
+                raise NotRegistered()
+            return True
+        return app_commands.check(predicate)
+
+
+# Bet option: Discord already enforces 1..max_bet in the client, this checks it
+# again against the player's own limit before the command runs
+class BetTransformer(app_commands.Transformer):
+    def __init__(self, players):
+        self.players = players
+
+    @property
+    def type(self):
+        return discord.AppCommandOptionType.integer
+
+    @property
+    def min_value(self):
+        return 1
+
+    @property
+    def max_value(self):
+        return self.players.max_bet
+
+    async def transform(self, interaction: discord.Interaction, value):
+        profile = self.players.for_interaction(interaction)
+        if value <= 0 or value > profile.max_bet:
+            raise InvalidBet(profile.max_bet)
+        return value
@@ -0,0 +1,39 @@
+import time
+
+
+# Token bucket: `rate` tokens per second, at most `burst` saved up
+# try_take() is for sends that can be skipped or delayed, take() for sends that
+# must go out now, it may put the bucket into debt so the optional ones back off.
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or rate
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    # Share of the bucket that is still available (0..1)
+    @property
+    def level(self):
+        self._refill()
+        return max(self.tokens, 0) / self.burst
+
+    def try_take(self):
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+    # Seconds until try_take() can succeed
+    def wait_time(self):
+        self._refill()
+        return max(1 - self.tokens, 0) / self.rate
@@ -0,0 +1,156 @@
+import asyncio
+import heapq
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+from persistence import write_file_atomic
+
+SCHEDULER_STATE_FILE = "scheduler_state.json"
+MAX_SLEEP = 3600  # Re-check at least hourly so a system clock change can't push a job back by days
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+# Next-run functions: take the last run (or now) and return when the job is due next
+def weekly(weekday, hour, minute):
+    def next_run(after):
+        candidate = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        candidate += timedelta(days=(weekday - after.weekday()) % 7)
+        if candidate <= after:
+            candidate += timedelta(days=7)
+        return candidate
+    return next_run
+
+
+def daily(hour, minute):
+    def next_run(after):
+        candidate = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if candidate <= after:
+            candidate += timedelta(days=1)
+        return candidate
+    return next_run
+
+
+def every(seconds):
+    return lambda after: after + timedelta(seconds=seconds)
+
+
+class Job:
+    def __init__(self, name, func, next_run, catch_up):
+        self.name = name
+        self.func = func  # async function without arguments
+        self.next_run = next_run
+        self.catch_up = catch_up
+        self.due = None
+
+
+# Timer-heap job scheduler
+# One background task sleeps until the earliest due job instead of polling.
+# The last run of every job is saved before the job runs, so a restart never
+# runs it twice, and a job that was due while the bot was offline runs once on
+# startup (catch_up=True) instead of waiting for its next slot.
+class Scheduler:
+    def __init__(self, state_file=SCHEDULER_STATE_FILE):
+        self.state_file = state_file
+        self.jobs = {}
+        self.last_run = {}  # job name -> datetime of the last run
+        self._heap = []  # (due, counter, job name), stale entries are skipped
+        self._counter = 0
+        self._wakeup = None
+        self._task = None
+        self._running = None  # Job run in progress
+
+    def load(self):
+        try:
+            if os.path.exists(self.state_file) and os.path.getsize(self.state_file) > 0:
+                with open(self.state_file, "r") as f:
+                    data = json.load(f)
+                self.last_run = {name: datetime.fromisoformat(value) for name, value in data.items()}
+        except (json.JSONDecodeError, ValueError, AttributeError):
+            print(f"⚠️ Error loading {self.state_file}. Jobs start from their next regular run.")
+            self.last_run = {}
+
+    # Register a periodic job (safe to call before or after start)
+    def add_job(self, name, func, next_run, catch_up=True):
+        job = self.jobs[name] = Job(name, func, next_run, catch_up)
+        if self._task is not None:
+            self._schedule(job, utcnow())
+            self._wakeup.set()
+        return job
+
+    def _schedule(self, job, now):
+        last = self.last_run.get(job.name)
+        due = job.next_run(last or now)
+        if due <= now:
+            due = now if job.catch_up else job.next_run(now)  # Missed while offline
+        job.due = due
+        self._counter += 1
+        heapq.heappush(self._heap, (due, self._counter, job.name))
+
+    # Start the timer task (safe to call more than once)
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self.load()
+            now = utcnow()
+            for job in self.jobs.values():
+                self._schedule(job, now)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self._task
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            due, _, name = self._heap[0]
+            delay = (due - utcnow()).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=min(delay, MAX_SLEEP))
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()  # A job was added, look at the heap again
+                continue
+
+            heapq.heappop(self._heap)
+            job = self.jobs.get(name)
+            if job is None or job.due != due:
+                continue  # Replaced by a newer add_job
+
+            # Shielded so stop() can't cancel a job halfway (e.g. a lottery draw after paying the winner)
+            self._running = asyncio.ensure_future(self._run_job(job, due))
+            await asyncio.shield(self._running)
+            self._running = None
+            self._schedule(job, utcnow())
+
+    async def _run_job(self, job, due):
+        # Saved before running: a crash mid-job skips this run instead of repeating it
+        self.last_run[job.name] = due
+        state = json.dumps({name: run.isoformat() for name, run in self.last_run.items()}, indent=4)
+        try:
+            await asyncio.to_thread(write_file_atomic, self.state_file, state)
+        except OSError as e:
+            print(f"⚠️ Failed to save {self.state_file}:", e)
+
+        try:
+            await job.func()
+        except Exception as e:
+            print(f"⚠️ Scheduled job {job.name} failed:", e)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._running is not None:
+            await self._running  # Let a job that already started finish
+            self._running = None
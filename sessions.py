@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from itertools import chain
+
+from persistence import json_file_writer
+from wallet import Reservation
+
+SESSIONS_FILE = "sessions.json"
+SESSION_TTL = 900  # Seconds without a click before a game is resolved by its timeout policy
+MAX_SESSIONS = 10000  # Live games kept at once, the oldest is resolved early past this
+SESSION_SWEEP_INTERVAL = 30  # Seconds between checks for timed out games
+
+# Timeout policies
+REFUND = "refund"  # Give the bet back
+AUTO_STAND = "stand"  # Play the round out as if the player stood (blackjack)
+
+
+# A game waiting on the player, with the bet already taken from their balance
+class Session:
+    __slots__ = ("key", "kind", "user_id", "reservation", "state", "expires")
+
+    def __init__(self, key, kind, user_id, reservation, state, expires):
+        self.key = key
+        self.kind = kind
+        self.user_id = user_id
+        self.reservation = reservation
+        self.state = state  # The game object, e.g. a BlackjackRound
+        self.expires = expires
+
+
+# Live game sessions with a size bound and TTL
+# Sessions are kept in last-activity order, so timed out ones are always at the
+# front and sweeping is cheap. A session that times out (or is pushed out by the
+# size bound) is handed to its kind's expire() coroutine, which settles the bet
+# by the game's timeout policy. Live sessions are saved by the storage saver;
+# their buttons don't survive a restart, so the ones found on startup are
+# resolved right away instead of waiting for their TTL.
+class SessionStore:
+    def __init__(self, saver, file_path=SESSIONS_FILE, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS):
+        self.saver = saver
+        self.file_path = file_path
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # key -> Session, least recently used first
+        self._kinds = {}  # kind -> (dump, load, expire)
+        self._restored = []
+        self._next_id = 1
+        self._task = None
+        saver.register(file_path, json_file_writer(file_path, self._dump_all, indent=None))
+
+    # dump(state) -> dict and load(user_id, reservation, data) -> state make sessions of this kind
+    # persistent, expire(session) is awaited to settle a session that timed out
+    def register_kind(self, kind, dump, load, expire):
+        self._kinds[kind] = (dump, load, expire)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _dump_all(self):
+        return [
+            {
+                "key": s.key,
+                "kind": s.kind,
+                "user_id": s.user_id,
+                "amount": s.reservation.amount,
+                "state": self._kinds[s.kind][0](s.state),
+            }
+            for s in chain(self._restored, self._sessions.values())
+        ]
+
+    def load(self):
+        try:
+            if os.path.exists(self.file_path) and os.path.getsize(self.file_path) > 0:
+                with open(self.file_path, "r") as f:
+                    entries = json.load(f)
+            else:
+                entries = []
+        except json.JSONDecodeError:
+            print(f"⚠️ Error loading {self.file_path}. Games that were in progress can't be resolved.")
+            return
+
+        for entry in entries:
+            kind = self._kinds.get(entry["kind"])
+            if kind is None:
+                print(f"⚠️ Unknown game session kind {entry['kind']!r}, skipped.")
+                continue
+            reservation = Reservation(entry["user_id"], entry["amount"])
+            state = kind[1](entry["user_id"], reservation, entry["state"])
+            self._restored.append(Session(entry["key"], entry["kind"], entry["user_id"], reservation, state, 0))
+        if self._restored:
+            print(f"🃏 {len(self._restored)} games from before the restart will be resolved.")
+
+    def new_key(self, kind):
+        key = f"{kind}:{self._next_id}"
+        self._next_id += 1
+        return key
+
+    # Start a session, replacing (and resolving) any live one with the same key
+    async def open(self, kind, user_id, reservation, state, key=None):
+        key = key or self.new_key(kind)
+        session = Session(key, kind, str(user_id), reservation, state, time.monotonic() + self.ttl)
+        old = self._sessions.pop(key, None)
+        self._sessions[key] = session
+        self.saver.mark_dirty(self.file_path)
+
+        expired = [old] if old is not None else []
+        while len(self._sessions) > self.max_sessions:
+            expired.append(self._sessions.popitem(last=False)[1])
+        for s in expired:
+            await self._expire(s)
+        return session
+
+    def get(self, key):
+        return self._sessions.get(key)
+
+    # The player did something: restart the TTL and save the new state
+    def touch(self, key):
+        session = self._sessions.get(key)
+        if session is not None:
+            session.expires = time.monotonic() + self.ttl
+            self._sessions.move_to_end(key)
+            self.saver.mark_dirty(self.file_path)
+        return session
+
+    # Remove a session to finish it, returns None if it's already gone (timed
+    # out or a double click). Call it before any await.
+    def close(self, key):
+        session = self._sessions.pop(key, None)
+        if session is not None:
+            self.saver.mark_dirty(self.file_path)
+        return session
+
+    async def _expire(self, session):
+        try:
+            await self._kinds[session.kind][2](session)
+        except Exception as e:
+            print(f"⚠️ Failed to resolve timed out {session.kind} game {session.key}:", e)
+
+    # Resolve every session whose TTL has run out
+    async def sweep(self):
+        now = time.monotonic()
+        expired = []
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.expires > now:
+                break
+            self._sessions.popitem(last=False)
+            expired.append(session)
+        if expired:
+            self.saver.mark_dirty(self.file_path)
+        for session in expired:
+            await self._expire(session)
+        return len(expired)
+
+    async def _run(self):
+        while self._restored:
+            await self._expire(self._restored[0])
+            self._restored.pop(0)  # Saved until it's resolved
+            self.saver.mark_dirty(self.file_path)
+        while True:
+            await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+            await asyncio.shield(self.sweep())
+
+    # Load saved sessions and start the sweeper task (safe to call more than once)
+    # Call it once every kind is registered.
+    def start(self):
+        if self._task is None:
+            self.load()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
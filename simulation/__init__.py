@@ -0,0 +1,75 @@
+import math
+import time
+
+import numpy as np
+
+import paytables as pt
+from simulation import games
+
+CHUNK_ROUNDS = 1_000_000  # Rounds per vectorized batch, keeps memory flat for any round count
+Z_95 = 1.959964
+
+# (game, bet path, simulator, rounds per batch)
+GAMES = [
+    ("roll_dice", "match", games.roll_dice, CHUNK_ROUNDS),
+    ("coinflip", "call", games.coinflip, CHUNK_ROUNDS),
+    ("slots", "first spin", games.slots(pt.SLOTS_MULTIPLIER), CHUNK_ROUNDS),
+    ("slots", "again after win", games.slots(pt.SLOTS_MULTIPLIER_AFTER_WIN), CHUNK_ROUNDS),
+    ("slots", "again after loss", games.slots(pt.SLOTS_MULTIPLIER_AFTER_LOSS), CHUNK_ROUNDS),
+    ("rps", "random", games.rps, CHUNK_ROUNDS),
+    ("highlow", "always higher", games.highlow("higher"), CHUNK_ROUNDS),
+    ("highlow", "always lower", games.highlow("lower"), CHUNK_ROUNDS),
+    ("highlow", "best side", games.highlow("best"), CHUNK_ROUNDS),
+] + [
+    ("highlow", f"{card} best side", games.highlow("best", card), CHUNK_ROUNDS)
+    for card in pt.HIGHLOW_DECK
+] + [
+    ("blackjack", "basic strategy", games.blackjack_round, CHUNK_ROUNDS // 4),
+    ("lottery", "1 ticket", games.lottery(tickets=1), CHUNK_ROUNDS // 64),
+    ("lottery", "10 tickets", games.lottery(tickets=10), CHUNK_ROUNDS // 64),
+]
+
+
+class Result:
+    def __init__(self, game, path, rounds, total, total_sq, elapsed):
+        self.game = game
+        self.path = path
+        self.rounds = rounds
+        self.rtp = total / rounds
+        self.variance = max(total_sq / rounds - self.rtp ** 2, 0.0)
+        half_width = Z_95 * math.sqrt(self.variance / rounds)
+        self.ci = (self.rtp - half_width, self.rtp + half_width)
+        self.elapsed = elapsed
+
+    @property
+    def house_edge(self):
+        return 1.0 - self.rtp
+
+    @property
+    def rounds_per_second(self):
+        return self.rounds / self.elapsed if self.elapsed > 0 else float("inf")
+
+
+# Run `rounds` rounds of one simulator in batches, only sums are kept
+def simulate(game, path, simulator, rounds, rng, chunk=CHUNK_ROUNDS):
+    total = 0.0
+    total_sq = 0.0
+    done = 0
+    start = time.perf_counter()
+    while done < rounds:
+        n = min(chunk, rounds - done)
+        payouts = simulator(rng, n)
+        total += float(payouts.sum())
+        total_sq += float(np.dot(payouts, payouts))
+        done += n
+    return Result(game, path, rounds, total, total_sq, time.perf_counter() - start)
+
+
+def run_all(rounds, seed=None, only=None):
+    rng = np.random.default_rng(seed)
+    results = []
+    for game, path, simulator, chunk in GAMES:
+        if only and game not in only:
+            continue
+        results.append(simulate(game, path, simulator, rounds, rng, chunk))
+    return results
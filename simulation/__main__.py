@@ -0,0 +1,46 @@
+# RTP simulation of every game's pay table
+# Prints RTP, house edge, standard deviation and a 95% confidence interval per
+# game and bet path, plus rounds/sec so it doubles as a benchmark. Exits with
+# status 1 if a path's whole confidence interval is above --max-rtp, so a pay
+# table change that makes a game pay out more than it takes in fails a CI run.
+#
+#   python -m simulation --rounds 10000000
+#   python -m simulation --rounds 1000000 --game slots --game highlow
+import argparse
+import math
+import time
+
+from simulation import run_all
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized RTP simulation of every game")
+    parser.add_argument("--rounds", type=int, default=10_000_000, help="Rounds per game and bet path")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--game", action="append", help="Only simulate this game (repeatable)")
+    parser.add_argument("--max-rtp", type=float, default=1.0, help="Fail if a path's RTP is certainly above this")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run_all(args.rounds, args.seed, args.game)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'game':<10} {'bet path':<18} {'RTP':>8} {'edge':>8} {'std dev':>8} {'95% CI':>19} {'rounds/s':>12}")
+    failed = []
+    for r in results:
+        ci = f"{r.ci[0]:.4%}..{r.ci[1]:.4%}"
+        print(f"{r.game:<10} {r.path:<18} {r.rtp:>8.3%} {r.house_edge:>8.3%} {math.sqrt(r.variance):>8.3f} "
+              f"{ci:>19} {r.rounds_per_second:>12,.0f}")
+        if r.ci[0] > args.max_rtp:
+            failed.append(r)
+
+    total_rounds = sum(r.rounds for r in results)
+    print(f"\n{total_rounds:,} rounds in {elapsed:.1f}s ({total_rounds / elapsed:,.0f} rounds/s)")
+    if failed:
+        for r in failed:
+            print(f"❌ {r.game} ({r.path}) returns {r.rtp:.3%}, above the {args.max_rtp:.0%} limit")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import numpy as np
+
+import blackjack
+import paytables as pt
+
+# Vectorized round simulators
+# Each takes a numpy Generator and a round count and returns an array with the
+# payout of every round as a multiple of the bet, stake included (0 = lost,
+# 1 = bet back). Payouts are not rounded down to whole dollars like the bot
+# does, so results are for large bets.
+
+
+def roll_dice(rng, n):
+    user = rng.integers(1, pt.DICE_SIDES + 1, n)
+    bot = rng.integers(1, pt.DICE_SIDES + 1, n)
+    return np.where(user == bot, float(pt.DICE_MATCH_PAYOUT), 0.0)
+
+
+def coinflip(rng, n):
+    won = rng.integers(0, 2, n, dtype=np.int8) == rng.integers(0, 2, n, dtype=np.int8)
+    return np.where(won, float(pt.COINFLIP_PAYOUT), 0.0)
+
+
+def slots(multiplier):
+    def simulate(rng, n):
+        reels = rng.integers(0, len(pt.SLOT_SYMBOLS), (n, 3), dtype=np.int8)
+        won = (reels[:, 0] == reels[:, 1]) & (reels[:, 1] == reels[:, 2])
+        return np.where(won, 1.0 + multiplier, 0.0)
+    return simulate
+
+
+def rps(rng, n):
+    # 0 rock, 1 paper, 2 scissors: (user - bot) % 3 is 0 for a tie, 1 for a win
+    diff = (rng.integers(0, 3, n, dtype=np.int8) - rng.integers(0, 3, n, dtype=np.int8)) % 3
+    table = np.array([pt.RPS_PAYOUTS["tie"], pt.RPS_PAYOUTS["win"], pt.RPS_PAYOUTS["lose"]], dtype=float)
+    return table[diff]
+
+
+def _highlow_tables():
+    higher = np.zeros(14)
+    lower = np.zeros(14)
+    for value, row in pt.HIGHLOW_PAY_TABLE.items():
+        higher[value] = row["higher"]
+        lower[value] = row["lower"]
+    return higher, lower
+
+
+# choice is "higher", "lower" or "best" (the side with the better pay for the card shown)
+def highlow(choice, card=None):
+    deck = np.array([pt.HIGHLOW_CARD_VALUES[name] for name in pt.HIGHLOW_DECK])
+    higher, lower = _highlow_tables()
+    # Chance the next card is strictly higher/lower than each value
+    p_higher = np.array([(deck > v).mean() for v in range(14)])
+    p_lower = np.array([(deck < v).mean() for v in range(14)])
+    pick_higher = higher * p_higher >= lower * p_lower
+
+    def simulate(rng, n):
+        old = deck[rng.integers(0, len(deck), n)] if card is None else np.full(n, pt.HIGHLOW_CARD_VALUES[card])
+        new = deck[rng.integers(0, len(deck), n)]
+        if choice == "best":
+            go_higher = pick_higher[old]
+        else:
+            go_higher = np.full(n, choice == "higher")
+        won = np.where(go_higher, new > old, new < old)
+        pay = np.where(go_higher, higher[old], lower[old])
+        return np.where(won, pay, np.where(new == old, float(pt.HIGHLOW_TIE_PAYOUT), 0.0))
+    return simulate
+
+
+_BJ_VALUES = np.frombuffer(blackjack.CARD_VALUES, dtype=np.uint8).astype(np.int8)
+_MAX_HITS = 11  # Eleven cards always bust or reach 21
+
+
+def _best_total(total, aces):
+    soft = aces & (total <= 11)
+    return np.where(soft, total + 10, total), soft
+
+
+# Blackjack with the headless basic strategy from blackjack.py
+# Cards are drawn with replacement (an infinite shoe), which is what lets every
+# round run side by side; benchmarks/bench_blackjack.py plays the real 6-deck shoe.
+def blackjack_round(rng, n):
+    draw = lambda size: _BJ_VALUES[rng.integers(0, 52, size)]
+    player = draw((n, 2))
+    dealer = draw((n, 2))
+
+    p_total = player.sum(axis=1, dtype=np.int16)
+    p_aces = (player == 1).any(axis=1)
+    d_total = dealer.sum(axis=1, dtype=np.int16)
+    d_aces = (dealer == 1).any(axis=1)
+    p_best, _ = _best_total(p_total, p_aces)
+    d_best, _ = _best_total(d_total, d_aces)
+    p_natural = p_best == 21
+    d_natural = d_best == 21
+
+    up = dealer[:, 0].astype(np.int16)
+    up = np.where(up == 1, 11, up)
+    stiff_vs_weak = (up >= 2) & (up <= 6)
+
+    # Player hits until the strategy stands, 21 is reached or the hand busts
+    active = ~(p_natural | d_natural)
+    for _ in range(_MAX_HITS):
+        best, soft = _best_total(p_total, p_aces)
+        hit = active & np.where(soft, best < 18, (best < 17) & ~((best >= 12) & stiff_vs_weak))
+        if not hit.any():
+            break
+        card = draw(n)
+        p_total = p_total + np.where(hit, card, 0)
+        p_aces |= hit & (card == 1)
+        active = hit & (_best_total(p_total, p_aces)[0] < 21)
+    p_best, _ = _best_total(p_total, p_aces)
+
+    # Dealer plays out every hand that is still live
+    drawing = ~(p_natural | d_natural) & (p_best <= 21)
+    for _ in range(_MAX_HITS):
+        best, soft = _best_total(d_total, d_aces)
+        hit = drawing & ((best < 17) | ((best == 17) & soft & blackjack.HIT_SOFT_17))
+        if not hit.any():
+            break
+        card = draw(n)
+        d_total = d_total + np.where(hit, card, 0)
+        d_aces |= hit & (card == 1)
+        drawing = hit
+    d_best, _ = _best_total(d_total, d_aces)
+
+    payouts = blackjack.PAYOUTS
+    result = np.where(p_best > d_best, float(payouts[blackjack.PLAYER]), float(payouts[blackjack.PUSH]))
+    result = np.where(p_best < d_best, float(payouts[blackjack.DEALER]), result)
+    result = np.where(d_best > 21, float(payouts[blackjack.PLAYER]), result)
+    result = np.where(p_best > 21, float(payouts[blackjack.DEALER]), result)
+    result = np.where(d_natural, float(payouts[blackjack.DEALER]), result)
+    result = np.where(p_natural, float(payouts[blackjack.BLACKJACK]), result)
+    return np.where(p_natural & d_natural, float(payouts[blackjack.PUSH]), result)
+
+
+# Lottery return per ticket for a player holding `tickets` in a draw against
+# `players` others who each hold a geometric number of tickets: at least 1, mean_tickets on
+# average (numpy's geometric(p) counts trials up to the first success, mean 1/p)
+# Winners are drawn without replacement by weight like LotteryTickets.draw_winners,
+# using exponential keys (the smallest key / weight wins first).
+def lottery(players=50, mean_tickets=3.0, tickets=1):
+    tiers = np.array(pt.LOTTERY_PRIZE_TIERS, dtype=float)
+
+    def simulate(rng, n):
+        field = np.empty((n, players + 1))
+        field[:, 0] = tickets
+        field[:, 1:] = rng.geometric(1.0 / mean_tickets, (n, players))
+        pot = field.sum(axis=1) * pt.LOTTERY_TICKET_PRICE
+        keys = rng.exponential(size=field.shape) / field
+        # Place of our player = how many players drew a smaller key
+        place = (keys[:, 1:] < keys[:, :1]).sum(axis=1)
+        share = np.zeros(n)
+        placed = place < len(tiers)
+        share[placed] = tiers[place[placed]]
+        return share * pot / (tickets * pt.LOTTERY_TICKET_PRICE)
+    return simulate
@@ -0,0 +1,107 @@
+import json
+import os
+from datetime import datetime, timezone
+
+from persistence import json_file_writer
+
+PENDING_REQUESTS_FILE = "pending_requests.json"
+RESOLVED_KEEP = 500  # Handled requests kept for reference, the oldest are dropped past this
+
+# Kinds
+DEPOSIT = "deposit"
+WITHDRAWAL = "withdrawal"
+
+# Statuses
+PENDING = "pending"
+PROCESSING = "processing"  # Picked up by a staff action that hasn't finished yet
+ACCEPTED = "accepted"
+REJECTED = "rejected"
+
+
+def custom_id(request_id, action):
+    return f"staff_request:{action}:{request_id}"
+
+
+# Durable index of deposit and withdrawal requests waiting on staff
+# Requests are plain dicts (id, kind, user_id, amount, status, ...) saved by the
+# storage saver, so they survive restarts and their staff-channel buttons can be
+# restored. A staff action first claims requests with begin(), which takes them
+# out of the pending set before any await, so a button click and a bulk
+# approval can't both pay the same request.
+class StaffRequests:
+    def __init__(self, saver, file_path=PENDING_REQUESTS_FILE):
+        self.saver = saver
+        self.file_path = file_path
+        self.requests = {}  # id -> request, in creation order
+        self._next_id = 1
+        saver.register(file_path, json_file_writer(file_path, lambda: list(self.requests.values())))
+
+    def load(self):
+        try:
+            if os.path.exists(self.file_path) and os.path.getsize(self.file_path) > 0:
+                with open(self.file_path, "r") as f:
+                    for request in json.load(f):
+                        if request["status"] == PROCESSING:
+                            request["status"] = PENDING  # The bot stopped before it was handled
+                        self.requests[request["id"]] = request
+        except json.JSONDecodeError:
+            print(f"⚠️ Error loading {self.file_path}. Pending deposit/withdrawal requests were lost.")
+        if self.requests:
+            self._next_id = max(self.requests) + 1
+
+    def add(self, kind, user_id, amount, **details):
+        request = {
+            "id": self._next_id,
+            "kind": kind,
+            "user_id": str(user_id),
+            "amount": amount,
+            "status": PENDING,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            **details,  # e.g. proof URL, in-game name
+        }
+        self._next_id += 1
+        self.requests[request["id"]] = request
+        self.saver.mark_dirty(self.file_path)
+        return request
+
+    def get(self, request_id):
+        return self.requests.get(int(request_id))
+
+    def pending(self, kind=None, user_id=None, ids=None, min_amount=None, max_amount=None):
+        ids = set(ids) if ids is not None else None
+        user_id = str(user_id) if user_id is not None else None
+        return [
+            r for r in self.requests.values()
+            if r["status"] == PENDING
+            and (kind is None or r["kind"] == kind)
+            and (user_id is None or r["user_id"] == user_id)
+            and (ids is None or r["id"] in ids)
+            and (min_amount is None or r["amount"] >= min_amount)
+            and (max_amount is None or r["amount"] <= max_amount)
+        ]
+
+    # Claim requests for a staff action, returns the ones that were still pending
+    def begin(self, request_ids):
+        claimed = []
+        for request_id in request_ids:
+            request = self.requests.get(int(request_id))
+            if request is not None and request["status"] == PENDING:
+                request["status"] = PROCESSING
+                claimed.append(request)
+        return claimed
+
+    # Put a claimed request back, e.g. a withdrawal the player can no longer cover
+    def release(self, request):
+        request["status"] = PENDING
+
+    def finish(self, request, status, staff_id):
+        request["status"] = status
+        request["resolved_by"] = str(staff_id)
+        request["resolved_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.saver.mark_dirty(self.file_path)
+        self._prune()
+
+    def _prune(self):
+        resolved = [r["id"] for r in self.requests.values() if r["status"] in (ACCEPTED, REJECTED)]
+        for request_id in resolved[:max(len(resolved) - RESOLVED_KEEP, 0)]:
+            del self.requests[request_id]
@@ -0,0 +1,70 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+import discord
+
+from persistence import write_file_atomic
+
+COMMAND_TREE_HASH_FILE = "command_tree.sha256"
+
+
+# Hash of the slash commands as Discord sees them (plus the application they belong to)
+def command_tree_hash(tree):
+    commands = sorted((command.to_dict() for command in tree.get_commands()), key=lambda c: (c["name"], c.get("type", 1)))
+    payload = {"application_id": tree.client.application_id, "commands": commands}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+# tree.sync() is a rate limited REST call, so only make it when the commands
+# changed since the last successful sync. Returns True if it synced, False if
+# nothing changed and None if Discord refused; the bot still starts with the
+# commands it already has and the next start tries again.
+async def sync_commands_if_changed(tree, file_path=COMMAND_TREE_HASH_FILE):
+    digest = command_tree_hash(tree)
+    saved = None
+    if os.path.exists(file_path):
+        with open(file_path, "r") as f:
+            saved = f.read().strip()
+    if saved == digest:
+        return False
+
+    try:
+        await tree.sync()
+    except discord.HTTPException as e:  # Forbidden too, e.g. the bot was added without the applications.commands scope
+        print(f"⚠️ Couldn't sync slash commands, will retry on the next start: {e}")
+        return None
+    await asyncio.to_thread(write_file_atomic, file_path, digest)
+    return True
+
+
+# Durations of the startup steps and of gateway reconnects, for the log
+class StartupTimer:
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.steps = []  # (name, seconds)
+        self._last = self.started
+        self.ready = False
+        self._disconnected = None
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.steps.append((name, now - self._last))
+        self._last = now
+
+    # First on_ready: the cold start report. Later ones (and resumes): how long the connection was down.
+    def on_ready(self, resumed=False):
+        if not self.ready:
+            self.ready = True
+            self.mark("connect")
+            steps = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.steps)
+            print(f"⏱️ Cold start: ready after {time.perf_counter() - self.started:.2f}s ({steps})")
+        elif self._disconnected is not None:
+            print(f"⏱️ {'Resumed' if resumed else 'Reconnected'} after {time.perf_counter() - self._disconnected:.2f}s offline")
+        self._disconnected = None
+
+    def on_disconnect(self):
+        if self.ready and self._disconnected is None:
+            self._disconnected = time.perf_counter()
@@ -0,0 +1,503 @@
+import argparse
+import asyncio
+from abc import ABC, abstractmethod
+import json
+import os
+import sqlite3
+import threading
+
+from ledger import BalanceLedger
+from lottery import LotteryTickets
+from persistence import FileLock, WriteBehind, json_file_writer, write_file_atomic, PERSIST_INTERVAL, PERSIST_MAX_PENDING
+from transaction_history import TransactionLog, TransactionRecord, RecentTransactions, migrate_legacy_transactions
+
+# Which backend the bot uses, read when the storage is opened so .env files apply:
+# STORAGE_BACKEND = "json" (files next to the bot), "sqlite" (SQLITE_FILE) or "mongo" (MONGO_URI)
+DEFAULT_STORAGE_BACKEND = "json"
+DEFAULT_SQLITE_FILE = "casino.db"
+
+def storage_backend():
+    return os.getenv("STORAGE_BACKEND", DEFAULT_STORAGE_BACKEND)
+
+def sqlite_file():
+    return os.getenv("SQLITE_FILE", DEFAULT_SQLITE_FILE)
+
+# JSON backend files
+BALANCES_FILE = "balances.json"  # Old balances file, imported into the ledger once
+BALANCES_SNAPSHOT_FILE = "balances_snapshot.json"
+BALANCES_LEDGER_FILE = "balances_ledger.jsonl"
+TRANSACTIONS_FILE = "transactions.json"  # Old free-text history, imported into the transaction log once
+TRANSACTION_ROWS_FILE = "transaction_rows.jsonl"
+TRANSACTION_INDEX_FILE = "transaction_rows.idx"
+TRANSACTION_LOCK_FILE = "transaction_rows.lock"  # Held while a running bot has the transaction log open
+REGISTERED_USERS_FILE = "registered_users.json"
+LOTTERY_FILE = "lottery_entries.json"  # {user_id: tickets}, older versions stored one list entry per ticket
+
+
+# Storage interface
+# The backend owns the in-memory state the commands read (balances, registered users,
+# lottery tickets, recent transactions) and persists every change through its
+# write-behind saver. Command handlers only call these methods, never touch files.
+class Storage(ABC):
+    def __init__(self, interval=PERSIST_INTERVAL, max_pending=PERSIST_MAX_PENDING):
+        self.saver = WriteBehind(interval=interval, max_pending=max_pending)
+        self.balances = {}
+        self.registered_users = set()  # Checked on every command, so a set
+        self.lottery = LotteryTickets()
+        self.recent_transactions = RecentTransactions()
+
+    # Read everything into memory, called once at startup
+    @abstractmethod
+    def load(self):
+        ...
+
+    # Balances
+    @abstractmethod
+    def add_balance(self, user_id, amount):
+        ...
+
+    # Transactions
+    @abstractmethod
+    def append_transaction(self, record):
+        ...
+
+    @abstractmethod
+    def transaction_count(self, user_id):
+        ...
+
+    # Blocking read of older history, newest first (called from a worker thread)
+    @abstractmethod
+    def _read_transactions(self, user_id, skip, limit):
+        ...
+
+    # Blocking iterator over every transaction in order (called from a worker thread)
+    @abstractmethod
+    def iter_transactions(self):
+        ...
+
+    # One page of a user's history, newest first
+    async def transaction_page(self, user_id, page, page_size):
+        user_id = str(user_id)
+        skip = page * page_size
+
+        # Recent pages (or the whole history of newer players) come straight from memory
+        in_memory = self.recent_transactions.count(user_id)
+        if skip + page_size <= in_memory or in_memory == self.transaction_count(user_id):
+            return self.recent_transactions.page(user_id, skip, page_size)
+
+        await self.flush()  # Older pages are read from disk, so make sure it is up to date
+        return await asyncio.to_thread(self._read_transactions, user_id, skip, page_size)
+
+    # Registered users
+    @abstractmethod
+    def add_registered_user(self, user_id):
+        ...
+
+    # Lottery
+    @abstractmethod
+    def add_lottery_tickets(self, user_id, quantity):
+        ...
+
+    @abstractmethod
+    def clear_lottery(self):
+        ...
+
+    # Migrations: True if nothing is stored yet, and a bulk import of existing state
+    @abstractmethod
+    def is_empty(self):
+        ...
+
+    @abstractmethod
+    def import_data(self, balances, records, registered_users, lottery_tickets):
+        ...
+
+    # Lifecycle
+    def start(self):
+        self.saver.start()
+
+    async def flush(self):
+        await self.saver.flush()
+
+    async def close(self):
+        await self.saver.stop()
+
+
+# JSON files backend (balance ledger, transaction log, small JSON files)
+class JsonStorage(Storage):
+    def __init__(self, interval=PERSIST_INTERVAL, max_pending=PERSIST_MAX_PENDING):
+        super().__init__(interval, max_pending)
+        self.ledger = BalanceLedger(BALANCES_SNAPSHOT_FILE, BALANCES_LEDGER_FILE, legacy_file=BALANCES_FILE)
+        self.transaction_log = TransactionLog(TRANSACTION_ROWS_FILE, TRANSACTION_INDEX_FILE)
+        self.log_lock = FileLock(TRANSACTION_LOCK_FILE)
+
+        self.saver.register(BALANCES_LEDGER_FILE, self.ledger.prepare_flush, self.ledger.flush_done)
+        self.saver.register(TRANSACTION_ROWS_FILE, self.transaction_log.prepare_flush, self.transaction_log.flush_done)
+        self.saver.register(REGISTERED_USERS_FILE, json_file_writer(REGISTERED_USERS_FILE, lambda: sorted(self.registered_users)))
+        self.saver.register(LOTTERY_FILE, json_file_writer(LOTTERY_FILE, lambda: self.lottery.counts))
+
+    def _load_json(self, file_path):
+        try:
+            if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+                with open(file_path, "r") as f:
+                    return json.load(f)
+        except json.JSONDecodeError:
+            print(f"⚠️ Error loading {file_path}. Using default values.")
+        return None
+
+    def _load_list(self, file_path):
+        data = self._load_json(file_path)
+        return data if isinstance(data, list) else []
+
+    def _load_lottery(self):
+        data = self._load_json(LOTTERY_FILE)
+        if isinstance(data, list):
+            return LotteryTickets.from_entries(data)  # Old one-entry-per-ticket list, saved as counts from now on
+        if isinstance(data, dict):
+            return LotteryTickets(data)
+        return LotteryTickets()
+
+    def load(self):
+        # Balances are replayed from the last snapshot + ledger tail (imports balances.json on first run)
+        self.balances = self.ledger.load()
+
+        if os.path.exists(TRANSACTIONS_FILE):
+            migrated = migrate_legacy_transactions(TRANSACTIONS_FILE, TRANSACTION_ROWS_FILE, TRANSACTION_INDEX_FILE)
+            print(f"✅ Imported {migrated} old transactions from {TRANSACTIONS_FILE}.")
+        self.transaction_log.load(self.recent_transactions)
+
+        self.registered_users = set(self._load_list(REGISTERED_USERS_FILE))
+        self.lottery = self._load_lottery()
+
+    def add_balance(self, user_id, amount):
+        new_balance = self.ledger.apply(user_id, amount)  # One small ledger record instead of rewriting every balance
+        self.saver.mark_dirty(BALANCES_LEDGER_FILE)
+        return new_balance
+
+    def append_transaction(self, record):
+        self.recent_transactions.add(record)
+        self.transaction_log.append(record)
+        self.saver.mark_dirty(TRANSACTION_ROWS_FILE)
+
+    def transaction_count(self, user_id):
+        return self.transaction_log.count(user_id)
+
+    def _read_transactions(self, user_id, skip, limit):
+        return self.transaction_log.read_offsets(self.transaction_log.page_offsets(user_id, skip, limit))
+
+    def iter_transactions(self):
+        return self.transaction_log.iter_records()
+
+    def add_registered_user(self, user_id):
+        self.registered_users.add(user_id)
+        self.saver.mark_dirty(REGISTERED_USERS_FILE)
+
+    def add_lottery_tickets(self, user_id, quantity):
+        self.lottery.add(user_id, quantity)
+        self.saver.mark_dirty(LOTTERY_FILE)
+
+    def clear_lottery(self):
+        self.lottery.clear()
+        self.saver.mark_dirty(LOTTERY_FILE)
+
+    def is_empty(self):
+        return not has_json_data() and not os.path.exists(TRANSACTION_ROWS_FILE)
+
+    # Blocking, writes straight to the files (e.g. moving back from a database)
+    def import_data(self, balances, records, registered_users, lottery_tickets):
+        self.ledger.balances = dict(balances)
+        self.ledger.compact()
+        for record in records:
+            self.transaction_log.append(record)
+        write = self.transaction_log.prepare_flush()
+        if write is not None:
+            write()
+            self.transaction_log.flush_done()
+        write_file_atomic(REGISTERED_USERS_FILE, json.dumps(sorted(registered_users), indent=4))
+        write_file_atomic(LOTTERY_FILE, json.dumps(dict(lottery_tickets), indent=4))
+
+    def start(self):
+        if not self.log_lock.acquire():
+            print(f"⚠️ Another process holds {TRANSACTION_LOCK_FILE}, is the bot already running?")
+        super().start()
+
+    async def close(self):
+        self.ledger.request_snapshot()
+        self.saver.mark_dirty(BALANCES_LEDGER_FILE)
+        await super().close()
+        self.log_lock.release()
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS balances (
+    user_id TEXT PRIMARY KEY,
+    balance INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    game TEXT NOT NULL,
+    bet INTEGER NOT NULL,
+    delta INTEGER NOT NULL,
+    balance_after INTEGER NOT NULL,
+    ref TEXT NOT NULL,
+    description TEXT NOT NULL,
+    username TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_user ON transactions (user_id, id);
+CREATE INDEX IF NOT EXISTS transactions_ts ON transactions (ts);
+CREATE TABLE IF NOT EXISTS registered_users (
+    user_id TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS lottery_tickets (
+    user_id TEXT PRIMARY KEY,
+    tickets INTEGER NOT NULL
+);
+"""
+
+# Statements are constants so sqlite3's statement cache keeps them prepared
+SQL_ADD_BALANCE = ("INSERT INTO balances (user_id, balance) VALUES (?, ?) "
+                   "ON CONFLICT (user_id) DO UPDATE SET balance = balance + excluded.balance")
+SQL_SET_BALANCE = "INSERT OR REPLACE INTO balances (user_id, balance) VALUES (?, ?)"
+SQL_INSERT_TRANSACTION = ("INSERT INTO transactions (user_id, ts, game, bet, delta, balance_after, ref, description, username) "
+                          "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+SQL_ADD_USER = "INSERT OR IGNORE INTO registered_users (user_id) VALUES (?)"
+SQL_ADD_TICKETS = ("INSERT INTO lottery_tickets (user_id, tickets) VALUES (?, ?) "
+                   "ON CONFLICT (user_id) DO UPDATE SET tickets = tickets + excluded.tickets")
+SQL_CLEAR_TICKETS = "DELETE FROM lottery_tickets"
+SQL_TRANSACTION_PAGE = ("SELECT user_id, ts, game, bet, delta, balance_after, ref, description, username "
+                        "FROM transactions WHERE user_id = ? ORDER BY id DESC LIMIT ? OFFSET ?")
+SQL_RECENT_TRANSACTIONS = ("SELECT user_id, ts, game, bet, delta, balance_after, ref, description, username FROM ("
+                           "SELECT *, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY id DESC) AS rn FROM transactions"
+                           ") WHERE rn <= ? ORDER BY id")
+SQL_ALL_TRANSACTIONS = ("SELECT user_id, ts, game, bet, delta, balance_after, ref, description, username "
+                        "FROM transactions ORDER BY id")
+
+
+def record_from_row(row):
+    return TransactionRecord(ts=row[1], user_id=row[0], game=row[2], bet=row[3], delta=row[4],
+                             balance_after=row[5], ref=row[6], description=row[7], username=row[8])
+
+
+def record_to_row(record):
+    return (record.user_id, record.ts, record.game, record.bet, record.delta, record.balance_after,
+            record.ref, record.description, record.username)
+
+
+# SQLite backend
+# One connection in WAL mode is reused for the whole run. Changes are queued in
+# memory and the saver commits them in one transaction per flush; balance deltas
+# of the same user are summed first so a busy player is one row update per flush.
+class SqliteStorage(Storage):
+    def __init__(self, db_file=None, interval=PERSIST_INTERVAL, max_pending=PERSIST_MAX_PENDING):
+        super().__init__(interval, max_pending)
+        self.db_file = db_file or sqlite_file()
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints, a crash only loses the last commit
+        self.conn.executescript(SQLITE_SCHEMA)
+        self.db_lock = threading.Lock()  # The connection is shared by the saver thread and page reads
+        self.transaction_counts = {}
+        self._reset_queue()
+        self._inflight = None  # Batch handed to the saver, kept until its commit succeeded
+        self.saver.register("sqlite", self._prepare_flush, self._flush_done)
+
+    def _reset_queue(self):
+        self._balance_deltas = {}
+        self._transactions = []
+        self._users = []
+        self._tickets = {}
+        self._clear_tickets = False
+
+    def is_empty(self):
+        with self.db_lock:
+            return self.conn.execute("SELECT NOT EXISTS (SELECT 1 FROM balances) AND "
+                                     "NOT EXISTS (SELECT 1 FROM transactions) AND "
+                                     "NOT EXISTS (SELECT 1 FROM registered_users)").fetchone()[0] == 1
+
+    def import_data(self, balances, records, registered_users, lottery_tickets):
+        with self.db_lock, self.conn:
+            self.conn.executemany(SQL_SET_BALANCE, list(balances.items()))
+            self.conn.executemany(SQL_INSERT_TRANSACTION, (record_to_row(r) for r in records))
+            self.conn.executemany(SQL_ADD_USER, [(user_id,) for user_id in registered_users])
+            self.conn.executemany(SQL_ADD_TICKETS, list(lottery_tickets.items()))
+
+    def load(self):
+        with self.db_lock:
+            self.balances = dict(self.conn.execute("SELECT user_id, balance FROM balances"))
+            self.registered_users = {row[0] for row in self.conn.execute("SELECT user_id FROM registered_users")}
+            self.lottery = LotteryTickets(dict(self.conn.execute("SELECT user_id, tickets FROM lottery_tickets")))
+            self.transaction_counts = dict(self.conn.execute("SELECT user_id, COUNT(*) FROM transactions GROUP BY user_id"))
+            for row in self.conn.execute(SQL_RECENT_TRANSACTIONS, (self.recent_transactions.size,)):
+                self.recent_transactions.add(record_from_row(row))
+
+    def add_balance(self, user_id, amount):
+        self.balances[user_id] = self.balances.get(user_id, 0) + amount
+        self._balance_deltas[user_id] = self._balance_deltas.get(user_id, 0) + amount
+        self.saver.mark_dirty("sqlite")
+        return self.balances[user_id]
+
+    def append_transaction(self, record):
+        self.recent_transactions.add(record)
+        self.transaction_counts[record.user_id] = self.transaction_counts.get(record.user_id, 0) + 1
+        self._transactions.append(record_to_row(record))
+        self.saver.mark_dirty("sqlite")
+
+    def transaction_count(self, user_id):
+        return self.transaction_counts.get(str(user_id), 0)
+
+    def _read_transactions(self, user_id, skip, limit):
+        with self.db_lock:
+            return [record_from_row(row) for row in self.conn.execute(SQL_TRANSACTION_PAGE, (user_id, limit, skip))]
+
+    def iter_transactions(self):
+        return iter_sqlite_transactions(self.db_file)
+
+    def add_registered_user(self, user_id):
+        self.registered_users.add(user_id)
+        self._users.append((user_id,))
+        self.saver.mark_dirty("sqlite")
+
+    def add_lottery_tickets(self, user_id, quantity):
+        self.lottery.add(user_id, quantity)
+        self._tickets[user_id] = self._tickets.get(user_id, 0) + quantity
+        self.saver.mark_dirty("sqlite")
+
+    def clear_lottery(self):
+        self.lottery.clear()
+        self._tickets = {}
+        self._clear_tickets = True
+        self.saver.mark_dirty("sqlite")
+
+    # Runs on the event loop: takes the queued changes and returns the blocking commit
+    def _prepare_flush(self):
+        batch = (self._balance_deltas, self._transactions, self._users, self._tickets, self._clear_tickets)
+        self._reset_queue()
+        if self._inflight is not None:
+            batch = merge_batches(self._inflight, batch)  # Last commit failed and was rolled back, retry it too
+        self._inflight = batch
+
+        balance_deltas, transactions, users, tickets, clear_tickets = batch
+        if not (balance_deltas or transactions or users or tickets or clear_tickets):
+            return None
+
+        def write():
+            with self.db_lock, self.conn:  # One transaction for the whole batch
+                if clear_tickets:
+                    self.conn.execute(SQL_CLEAR_TICKETS)
+                self.conn.executemany(SQL_ADD_BALANCE, list(balance_deltas.items()))
+                self.conn.executemany(SQL_INSERT_TRANSACTION, transactions)
+                self.conn.executemany(SQL_ADD_USER, users)
+                self.conn.executemany(SQL_ADD_TICKETS, list(tickets.items()))
+        return write
+
+    def _flush_done(self):
+        self._inflight = None
+
+    async def close(self):
+        await super().close()
+        with self.db_lock:
+            self.conn.close()
+
+
+# Combine a failed batch with the changes queued after it
+def merge_batches(old, new):
+    old_deltas, old_transactions, old_users, old_tickets, old_clear = old
+    new_deltas, new_transactions, new_users, new_tickets, new_clear = new
+
+    balance_deltas = dict(old_deltas)
+    for user_id, amount in new_deltas.items():
+        balance_deltas[user_id] = balance_deltas.get(user_id, 0) + amount
+
+    if new_clear:
+        # A later draw cleared the lottery, older ticket changes don't matter anymore
+        tickets, clear_tickets = new_tickets, True
+    else:
+        tickets, clear_tickets = dict(old_tickets), old_clear
+        for user_id, quantity in new_tickets.items():
+            tickets[user_id] = tickets.get(user_id, 0) + quantity
+
+    return balance_deltas, old_transactions + new_transactions, old_users + new_users, tickets, clear_tickets
+
+
+# Read every stored transaction from SQLite in order
+# Uses its own connection, WAL lets it read while the bot keeps writing
+def iter_sqlite_transactions(db_file):
+    conn = sqlite3.connect(db_file)
+    try:
+        for row in conn.execute(SQL_ALL_TRANSACTIONS):
+            yield record_from_row(row)
+    finally:
+        conn.close()
+
+
+# Read-only access to the transaction history of a backend, safe to use while the bot runs
+def iter_stored_transactions(backend=None):
+    backend = backend or storage_backend()
+    if backend == "sqlite":
+        return iter_sqlite_transactions(sqlite_file())
+    if backend == "mongo":
+        from mongo_storage import iter_mongo_transactions
+        return iter_mongo_transactions()
+    return TransactionLog(TRANSACTION_ROWS_FILE, TRANSACTION_INDEX_FILE).iter_records()
+
+
+# One-shot copy of the JSON files into an empty database backend
+def migrate_json(target):
+    source = JsonStorage()
+    source.load()
+
+    target.import_data(source.balances, source.iter_transactions(), source.registered_users, source.lottery.counts)
+    print(f"✅ Migrated {len(source.balances)} balances, {len(source.registered_users)} users and "
+          f"{source.lottery.total} lottery tickets from the JSON files.")
+
+
+def has_json_data():
+    return os.path.exists(BALANCES_SNAPSHOT_FILE) or os.path.exists(BALANCES_FILE)
+
+
+# Create the configured backend, migrating the JSON files the first time a database is used
+# With load=False nothing is read yet, call load_storage() later (the bot does it in setup_hook)
+def open_storage(backend=None, interval=PERSIST_INTERVAL, max_pending=PERSIST_MAX_PENDING, load=True):
+    backend = backend or storage_backend()
+    if backend == "json":
+        storage = JsonStorage(interval, max_pending)
+    elif backend == "sqlite":
+        storage = SqliteStorage(None, interval, max_pending)
+    elif backend == "mongo":
+        from mongo_storage import MongoStorage  # pymongo is only imported when it is used
+        storage = MongoStorage(interval=interval, max_pending=max_pending)
+    else:
+        raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}")
+
+    if load:
+        load_storage(storage)
+    return storage
+
+
+def load_storage(storage):
+    if not isinstance(storage, JsonStorage) and storage.is_empty() and has_json_data():
+        migrate_json(storage)
+    storage.load()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Casino storage tools")
+    parser.add_argument("command", choices=["migrate-sqlite", "migrate-mongo"])
+    parser.add_argument("--db", default=None, help="SQLite file (default: SQLITE_FILE or casino.db)")
+    args = parser.parse_args()
+
+    if args.command == "migrate-sqlite":
+        storage = SqliteStorage(args.db)
+    else:
+        from mongo_storage import MongoStorage
+        storage = MongoStorage()
+
+    if not storage.is_empty():
+        print("⚠️ The database already has data, not migrating again.")
+        return
+    migrate_json(storage)
+
+
+if __name__ == "__main__":
+    main()
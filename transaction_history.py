@@ -0,0 +1,303 @@
+import json
+import os
+import uuid
+from array import array
+from collections import deque
+from dataclasses import dataclass, asdict, fields
+from datetime import datetime
+
+from persistence import AppendLog
+
+RECENT_TRANSACTIONS = 50  # Per-user ring buffer size kept in memory
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+# One transaction, stored as one JSON line in the transaction log
+@dataclass
+class TransactionRecord:
+    ts: str
+    user_id: str
+    game: str
+    bet: int
+    delta: int  # Net change of the round (or deposit/withdrawal amount)
+    balance_after: int
+    ref: str
+    description: str
+    username: str = "Unknown"
+
+    @classmethod
+    def create(cls, user_id, description, game="other", bet=0, delta=0, balance_after=0, username="Unknown"):
+        return cls(
+            ts=datetime.now().strftime(TIMESTAMP_FORMAT),
+            user_id=str(user_id),
+            game=game,
+            bet=bet,
+            delta=delta,
+            balance_after=balance_after,
+            ref=uuid.uuid4().hex[:12],
+            description=description,
+            username=username,
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        # Rows written before records were structured only have ts/user_id/username/description
+        defaults = {"ts": "", "user_id": "", "game": "other", "bet": 0, "delta": 0, "balance_after": 0,
+                    "ref": "", "description": "", "username": "Unknown"}
+        record = cls(**{f.name: data.get(f.name, defaults[f.name]) for f in fields(cls)})
+        record.user_id = str(record.user_id)
+        return record
+
+    # Nothing was staked or won, e.g. a bet refunded when a game timed out
+    @property
+    def void(self):
+        return not (self.bet or self.delta)
+
+    def to_json(self):
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+
+# Last few transactions of every user, newest at the right
+class RecentTransactions:
+    def __init__(self, size=RECENT_TRANSACTIONS):
+        self.size = size
+        self._by_user = {}
+
+    def add(self, record):
+        buffer = self._by_user.get(record.user_id)
+        if buffer is None:
+            buffer = self._by_user[record.user_id] = deque(maxlen=self.size)
+        buffer.append(record)
+
+    def count(self, user_id):
+        return len(self._by_user.get(str(user_id), ()))
+
+    # Newest first, skipping the `skip` newest ones
+    def page(self, user_id, skip, limit):
+        buffer = self._by_user.get(str(user_id))
+        if not buffer:
+            return []
+        end = len(buffer) - skip
+        start = max(end - limit, 0)
+        return [buffer[i] for i in range(end - 1, start - 1, -1)]
+
+
+# Cut a file back to its last complete line (a crash can leave half a line at the end)
+def cut_torn_tail(file_path):
+    if not os.path.exists(file_path):
+        return
+    with open(file_path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        # Walk back to the last newline
+        position = size
+        while position > 0:
+            chunk_start = max(position - 4096, 0)
+            f.seek(chunk_start)
+            chunk = f.read(position - chunk_start)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                f.truncate(chunk_start + newline + 1)
+                return
+            position = chunk_start
+        f.truncate(0)
+
+
+# Append-only transaction log with a per-user byte offset index
+# The index file has one "user_id offset" line per record, so finding a user's
+# older history is a seek per record instead of a scan of the whole log.
+class TransactionLog:
+    def __init__(self, log_file, index_file):
+        self.log_file = log_file
+        self.index_file = index_file
+        self.offsets = {}  # user_id -> array of byte offsets into the log, oldest first
+        self.size = 0  # Log size including records not written yet
+        self._log = AppendLog(log_file)
+        self._index = AppendLog(index_file)
+
+    def _add_offset(self, user_id, offset):
+        user_offsets = self.offsets.get(user_id)
+        if user_offsets is None:
+            user_offsets = self.offsets[user_id] = array("q")
+        user_offsets.append(offset)
+
+    # Load the index, index anything the last run wrote to the log but not the index,
+    # and warm the recent ring buffers
+    def load(self, recent):
+        cut_torn_tail(self.log_file)
+        cut_torn_tail(self.index_file)
+        self.size = os.path.getsize(self.log_file) if os.path.exists(self.log_file) else 0
+
+        last_offset = -1
+        if os.path.exists(self.index_file):
+            with open(self.index_file, "r") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) != 2:
+                        continue
+                    offset = int(parts[1])
+                    if offset >= self.size:
+                        continue  # Points past the log, that write never made it
+                    self._add_offset(parts[0], offset)
+                    last_offset = max(last_offset, offset)
+
+        if self.size:
+            with open(self.log_file, "rb") as f:
+                position = 0
+                if last_offset >= 0:
+                    f.seek(last_offset)
+                    position = last_offset + len(f.readline())
+                    f.seek(position)
+                for line in f:
+                    try:
+                        user_id = str(json.loads(line)["user_id"])
+                    except (json.JSONDecodeError, KeyError):
+                        position += len(line)
+                        continue
+                    self._add_offset(user_id, position)
+                    self._index.append(f"{user_id} {position}")
+                    position += len(line)
+
+            # Write the rebuilt part of the index right away
+            write = self._index.prepare()
+            if write is not None:
+                write()
+                self._index.done()
+
+        self._warm(recent)
+
+    def _warm(self, recent):
+        wanted = []
+        for user_offsets in self.offsets.values():
+            wanted.extend(user_offsets[-recent.size:])
+        wanted.sort()  # Read in file order so this is close to one sequential pass
+        for record in self.read_offsets(wanted):
+            recent.add(record)
+
+    # Queue a record, it is written by the next flush
+    def append(self, record):
+        line = record.to_json()
+        offset = self.size
+        self.size += len(line.encode("utf-8")) + 1
+        self._add_offset(record.user_id, offset)
+        self._log.append(line)
+        self._index.append(f"{record.user_id} {offset}")
+
+    def count(self, user_id):
+        return len(self.offsets.get(str(user_id), ()))
+
+    # Offsets for one page, newest first, skipping the `skip` newest records
+    def page_offsets(self, user_id, skip, limit):
+        user_offsets = self.offsets.get(str(user_id))
+        if not user_offsets:
+            return []
+        end = len(user_offsets) - skip
+        start = max(end - limit, 0)
+        return [user_offsets[i] for i in range(end - 1, start - 1, -1)]
+
+    # Blocking read of records at the given offsets (run it in a thread from async code)
+    def read_offsets(self, offsets):
+        records = []
+        if not offsets or not os.path.exists(self.log_file):
+            return records
+        with open(self.log_file, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                try:
+                    records.append(TransactionRecord.from_dict(json.loads(f.readline())))
+                except json.JSONDecodeError:
+                    continue  # Not flushed yet
+        return records
+
+    # Iterate every record in file order (used by exports and migrations)
+    def iter_records(self):
+        if not os.path.exists(self.log_file):
+            return
+        with open(self.log_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield TransactionRecord.from_dict(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+
+    # Runs on the event loop: log lines are written before the index lines that point at them
+    def prepare_flush(self):
+        write_log = self._log.prepare()
+        write_index = self._index.prepare()
+        if write_log is None and write_index is None:
+            return None
+
+        def write():
+            if write_log is not None:
+                write_log()
+                self._log.done()  # Don't append the log lines again if only the index write fails
+            if write_index is not None:
+                write_index()
+        return write
+
+    def flush_done(self):
+        self._index.done()
+
+
+# Write records in front of everything already in the log (older history imported later)
+# The log is rewritten through a temp file and the index dropped, TransactionLog.load
+# rebuilds it. Only safe while no TransactionLog has the files open. Returns the count.
+def prepend_records(records, log_file, index_file):
+    existing = []
+    if os.path.exists(log_file):
+        cut_torn_tail(log_file)
+        with open(log_file, "r", encoding="utf-8") as f:
+            existing = f.readlines()
+
+    count = 0
+    tmp_file = log_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(record.to_json() + "\n")
+            count += 1
+        f.writelines(existing)
+    os.replace(tmp_file, log_file)
+    if os.path.exists(index_file):
+        os.remove(index_file)  # Offsets moved
+    return count
+
+
+# One-shot import of the old free-text transactions.json into the log
+# Rows already logged since the row log was introduced are the newest entries of each
+# user's legacy list, so only the older entries are imported, in front of the log.
+def migrate_legacy_transactions(legacy_file, log_file, index_file):
+    if not os.path.exists(legacy_file):
+        return 0
+    try:
+        with open(legacy_file, "r") as f:
+            legacy = json.load(f)
+    except json.JSONDecodeError:
+        legacy = {}
+    if not isinstance(legacy, dict):
+        legacy = {}
+
+    logged = {}
+    if os.path.exists(log_file):
+        cut_torn_tail(log_file)
+        with open(log_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    user_id = str(json.loads(line)["user_id"])
+                except (json.JSONDecodeError, KeyError):
+                    continue
+                logged[user_id] = logged.get(user_id, 0) + 1
+
+    migrated_at = datetime.now().strftime(TIMESTAMP_FORMAT)
+    entries = ((user_id, description) for user_id, descriptions in legacy.items()
+               for description in descriptions[:max(len(descriptions) - logged.get(user_id, 0), 0)])
+    records = (TransactionRecord(migrated_at, str(user_id), "legacy", 0, 0, 0, f"legacy-{n}", description)
+               for n, (user_id, description) in enumerate(entries))
+    count = prepend_records(records, log_file, index_file)
+
+    # Keep the old file around but make sure we never import it twice
+    os.replace(legacy_file, legacy_file + ".migrated")
+    return count
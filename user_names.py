@@ -0,0 +1,78 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+import discord
+
+USER_NAME_TTL = 3600  # Seconds a resolved name is trusted
+USER_NAME_CACHE_SIZE = 10000
+USER_FETCH_CONCURRENCY = 8  # REST lookups in flight at once
+
+
+# User id -> display name cache with TTL and LRU eviction
+# The gateway cache (bot.get_user) is tried first since it costs nothing, only
+# users the bot can't see are fetched over REST, a few at a time.
+class UserNameCache:
+    def __init__(self, bot, ttl=USER_NAME_TTL, size=USER_NAME_CACHE_SIZE, concurrency=USER_FETCH_CONCURRENCY):
+        self.bot = bot
+        self.ttl = ttl
+        self.size = size
+        self.concurrency = concurrency
+        self._names = OrderedDict()  # user_id (int) -> (name or None, expires at)
+
+    def _store(self, user_id, name):
+        self._names[user_id] = (name, time.monotonic() + self.ttl)
+        self._names.move_to_end(user_id)
+        if len(self._names) > self.size:
+            self._names.popitem(last=False)
+
+    def _cached(self, user_id):
+        entry = self._names.get(user_id)
+        if entry is None:
+            return False, None
+        if entry[1] < time.monotonic():
+            del self._names[user_id]
+            return False, None
+        self._names.move_to_end(user_id)
+        return True, entry[0]
+
+    # Name without any network access, None if it isn't known yet
+    def get(self, user_id):
+        user_id = int(user_id)
+        found, name = self._cached(user_id)
+        if found:
+            return name
+        user = self.bot.get_user(user_id)
+        if user is None:
+            return None
+        self._store(user_id, user.name)
+        return user.name
+
+    def name(self, user_id, default="Unknown"):
+        return self.get(user_id) or default
+
+    async def _fetch(self, user_id, semaphore):
+        async with semaphore:
+            try:
+                user = await self.bot.fetch_user(user_id)
+            except discord.NotFound:
+                self._store(user_id, None)  # Deleted account, don't ask again until the TTL runs out
+                return
+            except discord.HTTPException as e:
+                print(f"⚠️ Couldn't fetch user {user_id}:", e)
+                return
+        self._store(user_id, user.name)
+
+    # Names for many users, missing ones fetched concurrently
+    async def resolve_many(self, user_ids, default="Unknown"):
+        user_ids = [int(user_id) for user_id in user_ids]
+        missing = []
+        for user_id in user_ids:
+            found, _ = self._cached(user_id)
+            if not found and self.get(user_id) is None:
+                missing.append(user_id)
+
+        if missing:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            await asyncio.gather(*[self._fetch(user_id, semaphore) for user_id in missing])
+        return {user_id: self._cached(user_id)[1] or default for user_id in user_ids}
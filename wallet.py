@@ -0,0 +1,112 @@
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
+
+
+class InsufficientFunds(Exception):
+    pass
+
+
+# Money taken for a bet that hasn't been resolved yet
+class Reservation:
+    def __init__(self, user_id, amount):
+        self.user_id = user_id
+        self.amount = amount
+        self.settled = False
+        self.payout = 0
+
+
+# Wallet service, every balance change goes through here
+# Each user has their own asyncio lock, so two players never wait on each
+# other while one player's concurrent clicks are handled one at a time. Bets
+# are taken up front with reserve() and paid out once with settle(), so a
+# balance can't be spent twice while a game is waiting on Discord.
+class Wallet:
+    def __init__(self, storage):
+        self.storage = storage
+        self._locks = {}  # user_id -> [lock, number of holders/waiters]
+
+    def balance(self, user_id):
+        return self.storage.balances.get(str(user_id), 0)
+
+    @asynccontextmanager
+    async def lock(self, user_id):
+        user_id = str(user_id)
+        entry = self._locks.get(user_id)
+        if entry is None:
+            entry = self._locks[user_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[user_id]  # Don't keep a lock around for every user that ever played
+
+    # Take a bet from the balance, raises InsufficientFunds if it isn't there
+    async def reserve(self, user_id, amount):
+        user_id = str(user_id)
+        async with self.lock(user_id):
+            if amount > self.balance(user_id):
+                raise InsufficientFunds()
+            self.storage.add_balance(user_id, -amount)
+        return Reservation(user_id, amount)
+
+    # Pay out a reserved bet (payout includes the stake, 0 for a loss)
+    # Returns False if the round was already settled, e.g. a double click
+    async def settle(self, reservation, payout):
+        async with self.lock(reservation.user_id):
+            if reservation.settled:
+                return False
+            reservation.settled = True
+            reservation.payout = payout
+            if payout:
+                self.storage.add_balance(reservation.user_id, payout)
+        return True
+
+    # Give a reserved bet back untouched
+    async def release(self, reservation):
+        return await self.settle(reservation, reservation.amount)
+
+    # Add money (or remove it without a balance check, for admin corrections)
+    async def credit(self, user_id, amount):
+        user_id = str(user_id)
+        async with self.lock(user_id):
+            return self.storage.add_balance(user_id, amount)
+
+    # Remove money, raises InsufficientFunds if it isn't there
+    async def debit(self, user_id, amount):
+        user_id = str(user_id)
+        async with self.lock(user_id):
+            if amount > self.balance(user_id):
+                raise InsufficientFunds()
+            return self.storage.add_balance(user_id, -amount)
+
+    # Apply many balance changes as one batch: [(user_id, delta), ...]
+    # Every player involved is locked first (in a fixed order, so two batches
+    # can't deadlock), then all changes are checked and made without awaiting in
+    # between. A debit that would take a balance below zero is skipped unless
+    # allow_negative is set. Returns whether each change could be applied; with
+    # atomic=True nothing is applied unless all of them can, with dry_run=True
+    # nothing is applied at all.
+    async def apply_batch(self, changes, atomic=False, allow_negative=False, dry_run=False):
+        changes = [(str(user_id), delta) for user_id, delta in changes]
+        async with AsyncExitStack() as stack:
+            for user_id in sorted({user_id for user_id, _ in changes}):
+                await stack.enter_async_context(self.lock(user_id))
+
+            balances = {}
+            applied = []
+            for user_id, delta in changes:
+                balance = balances.get(user_id, self.balance(user_id))
+                ok = allow_negative or delta >= 0 or -delta <= balance
+                if ok:
+                    balances[user_id] = balance + delta
+                applied.append(ok)
+            if dry_run or (atomic and not all(applied)):
+                return applied
+
+            for (user_id, delta), ok in zip(changes, applied):
+                if ok:
+                    self.storage.add_balance(user_id, delta)
+        return applied